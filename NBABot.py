@@ -1,38 +1,75 @@
+import asyncio
 from datetime import datetime
-import dateparser
+import functools
 import os
+import time
 from typing import Optional, Tuple, Union, List, Dict, Any
-import bs4
 import discord
-import requests
-from discord.ext.commands import Bot
+from discord.ext.commands import (AutoShardedBot, CheckFailure, check_any,
+                                  has_permissions, is_owner)
 from dotenv import load_dotenv
-from nba_api.stats.endpoints import playergamelog, drafthistory, \
-    playoffpicture, commonplayerinfo, leaguegamelog
 from nba_api.stats.library.parameters import SeasonAll, Season
-from nba_api.stats.static import players, teams
 from pandas import DataFrame
-import random
-from team_colors import TEAM_TO_COLORS
-
-BOT_PREFIX = "#"
-YEAR = str(datetime.now().year)
-ACTIVE_PLAYER_LIST = players.get_active_players()
-PLAYER_LIST = players.get_players()
-TEAM_LIST = teams.get_teams()
+import requests
 
+# Before the bot's own modules, which read their configuration when
+# imported.
 load_dotenv()
-TOKEN, GUILD = os.getenv('DISCORD_TOKEN'), os.getenv('DISCORD_GUILD')
-CHANNEL_ID = os.getenv('CHANNEL_ID')
 
-bot = Bot(command_prefix=BOT_PREFIX)
+from aggregate import compare_statistics, format_value, player_statistics
+from cache import (FOREVER, PLAYER_TEAM_TTL, GameLogCache, TTLCache,
+                   game_log_ttl)
+from draft import DraftStore
+from embeds import EmbedCache, embed_creator, list_embed
+from games import GameStore, season_for_date, season_string
+from images import NO_IMAGE, ImageCache
+from leaders import LeadersService
+from live import LiveTracker
+from lookup import Lookups, PlayerIndex
+from metrics import METRICS, METRICS_PORT, serve
+from prefetch import PREFETCH_TTL, Prefetcher
+from registry import Player, Team
+from standings import StandingsService
+from upstream import (GUARD, UPSTREAM, UPSTREAM_TIMEOUT, CircuitOpenError,
+                      SingleFlight, TokenBucket, fetch_or_stale)
+from warehouse import Warehouse
 
+BOT_PREFIX = "#"
+COMPARE_MAX_PLAYERS = 4
+DRAFT_TEAM_YEARS, DRAFT_TEAM_MAX_YEARS = 10, 30
+FUZZY_THRESHOLD, FUZZY_MARGIN = 0.75, 0.1
+YEAR = str(datetime.now().year)
 
-def get_game_df():
-    return leaguegamelog.LeagueGameLog(direction='DESC').get_data_frames()[0]
-
-#
-# GAME_DF = get_game_df()
+# Importing this module registers the commands but does not connect, fetch
+# or build anything; the lookup tables are built on first use and the heavy
+# nba_api endpoint and dateparser modules are imported by the functions that
+# need them. Run main() to connect, or shards.py to run several processes.
+bot = AutoShardedBot(command_prefix=BOT_PREFIX)
+LOOKUPS = Lookups()
+GAME_LOG_CACHE = GameLogCache()
+GAME_STORE = GameStore(disk=GAME_LOG_CACHE.disk)
+IMAGE_CACHE = ImageCache()
+STANDINGS = StandingsService()
+QUERIES = SingleFlight()
+WAREHOUSE = Warehouse()
+DRAFT = DraftStore()
+LEADERS = LeadersService(WAREHOUSE, disk=GAME_LOG_CACHE.disk)
+PLAYER_TEAMS = TTLCache()
+EMBEDS = EmbedCache()
+LIVE = LiveTracker()
+METRICS.register('game_log_cache', GAME_LOG_CACHE.stats)
+METRICS.register('image_cache', IMAGE_CACHE.stats)
+METRICS.register('warehouse', WAREHOUSE.stats)
+METRICS.register('queries', QUERIES.stats)
+METRICS.register('guard', GUARD.stats)
+METRICS.register('player_teams', PLAYER_TEAMS.stats)
+METRICS.register('embeds', EMBEDS.stats)
+METRICS.register('live', LIVE.stats)
+METRICS.register('draft', DRAFT.stats)
+METRICS.register('discord', lambda: {'latency_seconds': bot.latency})
+# Whether this process runs the background work that fills the caches. When
+# several processes share their caches, only one of them does.
+PRIMARY = True
 
 
 def playoff_verification(playoff: str) -> str:
@@ -86,87 +123,150 @@ def sort_helper(lst: Tuple[str], index: int) -> str:
         return 'Regular'
 
 
-def find_player(first_name: str, last_name: str, lst: list) -> Optional:
-    """Finds the player in the lst by first_name and last_name. lst should be
-    one of the lists given by the nba_api.
+def find_player(first_name: str, last_name: str,
+                index: PlayerIndex) -> Optional:
+    """Finds the player in index by first_name and last_name. index should be
+    built from one of the lists given by the nba_api.
     """
 
-    nba_player = None
+    return index.find(first_name, last_name)
 
-    for active_player in lst:
 
-        if active_player['first_name'].lower() == first_name and \
-                active_player['last_name'].lower() == last_name:
-            nba_player = active_player
+def resolve_player(first_name: str, last_name: str, index: PlayerIndex
+                   ) -> Tuple[Optional[Player], List[Player], bool]:
+    """Finds the player in index by name, falling back to the closest fuzzy
+    match when it is a near-exact one and clearly better than the rest.
+    Returns the player, or None and the closest candidates as suggestions,
+    and whether the player is a fuzzy match the reply should name.
+    """
 
-    return nba_player
+    nba_player = find_player(first_name, last_name, index)
+    if nba_player is not None:
+        return nba_player, [], False
 
+    candidates = index.search(first_name + ' ' + last_name)
+    if candidates and candidates[0][0] >= FUZZY_THRESHOLD and \
+            (len(candidates) == 1 or
+             candidates[0][0] - candidates[1][0] >= FUZZY_MARGIN):
+        return candidates[0][1], [], True
+    return None, [candidate for _, candidate in candidates], False
 
-def find_picture(player_team: str, id: int):
-    """Finds the picture for player/team based on the id by scraping off the
-    nba website.
-    """
 
-    search_url = 'https://stats.nba.com/' + player_team + '/' + str(id)
-    res = requests.get(search_url)
-    res.raise_for_status()
+def fuzzy_text(nba_player: Player) -> str:
+    """Tells the user which player a misspelled name was taken to mean."""
+    return f'No exact match, showing {nba_player.full_name}.'
 
-    soup = bs4.BeautifulSoup(res.text, 'html.parser')
-    image = soup.find("meta", property="og:image")
-    url = image["content"] if image else "No meta title given"
 
-    return url
+def suggestion_text(suggestions: List[dict]) -> str:
+    """Converts suggested players to a sentence the bot can send."""
+    if not suggestions:
+        return ''
+    return ' Did you mean ' + ', '.join(nba_player.full_name for nba_player
+                                        in suggestions) + '?'
 
 
-def load_player_dataframe(nba_player, year: str, season_type: str):
-    """Returns a data frame of the stats for nba_player in year for the regular
-    or post season, depending on the value of season.
+def find_picture(player_team: str, id: int) -> Optional[str]:
+    """Finds the picture for player/team based on the id, scraping off the
+    nba website only if it is not in IMAGE_CACHE. Returns None if there is
+    no picture or it cannot be fetched right now.
     """
 
-    player_id = nba_player['id']
+    url = IMAGE_CACHE.url(player_team, id)
+    return None if url == NO_IMAGE else url
+
+
+def fetch_player_log(player_id: int, year: str,
+                     season_type: str) -> DataFrame:
+    """Fetches player_id's game log for year and season_type from the API."""
+    from nba_api.stats.endpoints import playergamelog
+
     if season_type == 'Regular':
-        gamelog = playergamelog.PlayerGameLog(player_id=player_id, season=year)
+        gamelog = GUARD.fetch(playergamelog.PlayerGameLog,
+                              player_id=player_id, season=year,
+                              timeout=UPSTREAM_TIMEOUT)
     else:
-        gamelog = playergamelog.PlayerGameLog(player_id=player_id, season=year,
-                                              season_type_all_star='Playoffs')
-
+        gamelog = GUARD.fetch(
+            playergamelog.PlayerGameLog, player_id=player_id,
+            season=year, season_type_all_star='Playoffs',
+            timeout=UPSTREAM_TIMEOUT)
     return gamelog.get_data_frames()[0]
 
 
-def avg_values(df) -> dict:
-    avg_stats = ['PTS', 'MIN', 'FG_PCT', 'FT_PCT', 'AST', 'REB', 'STL',
-                 'BLK']
-    statistics = {}
-
-    for stat_name in avg_stats:
-        if stat_name.endswith('PCT'):
-            attempts = stat_name[0:2] + 'A'
-            made = stat_name[0:2] + 'M'
-            try:
-                percent = df[made].sum() / df[attempts].sum()
-                value = str(round(percent * 100, 1)) + '%'
-            except ZeroDivisionError:
-                value = 'nan'
-        else:
-            value = str(round(df[stat_name].mean(), 1))
-        statistics[stat_name] = value
-    return statistics
+def load_player_dataframe(nba_player, year: str, season_type: str):
+    """Returns a data frame of the stats for nba_player in year for the regular
+    or post season, depending on the value of season. Logs are served from
+    GAME_LOG_CACHE or WAREHOUSE when possible, and fetched from the API
+    otherwise. If the API cannot be reached, an expired cached log is
+    served rather than failing.
+    """
+
+    return load_player_log(nba_player, year, season_type)[0]
 
 
-def conference() -> List:
-    """Converts conference data frames to readable strings used by bot command.
+def load_player_log(nba_player, year: str,
+                    season_type: str) -> Tuple[DataFrame, bool]:
+    """Returns load_player_dataframe's data frame and whether it is an
+    expired log served because the API could not be reached.
+    """
+    player_id = nba_player.id
+    key = (player_id, year, season_type)
+    df = GAME_LOG_CACHE.get(key)
+    if df is not None:
+        METRICS.inc('nba_game_log_requests_total',
+                    source='prefetch' if PREFETCHER.claim(player_id, year,
+                                                          season_type)
+                    else 'cache')
+        return df, False
+
+    ttl = game_log_ttl(year, nba_player.is_active)
+    df = WAREHOUSE.player_log(player_id, year, season_type, max_age=ttl)
+    if df is not None:
+        METRICS.inc('nba_game_log_requests_total', source='warehouse')
+    else:
+        df, error = fetch_or_stale(
+            functools.partial(fetch_player_log, player_id, year,
+                              season_type),
+            functools.partial(GAME_LOG_CACHE.get_stale, key),
+            'PlayerGameLog')
+        if error is not None:
+            METRICS.inc('nba_game_log_requests_total', source='stale')
+            return df, True
+        METRICS.inc('nba_game_log_requests_total', source='api')
+
+    GAME_LOG_CACHE.set(key, df, ttl)
+    return df, False
+
+
+def prefetch_player(player_id: int, year: int) -> None:
+    """Fetches the season log, team and picture of a player who just played,
+    for PREFETCHER. The log cannot change before their next game, so it is
+    cached for PREFETCH_TTL.
     """
+    GAME_LOG_CACHE.set((player_id, str(year), 'Regular'),
+                       fetch_player_log(player_id, str(year), 'Regular'),
+                       PREFETCH_TTL)
+    fetch_player_team(player_id, refresh=True)
+    find_picture('player', player_id)
 
-    east, west = playoffpicture.PlayoffPicture().get_data_frames()[2], \
-                 playoffpicture.PlayoffPicture().get_data_frames()[3]
-    values = []
-    for conf in (east, west):
-        table = ''
-        for i in range(len(conf.CONFERENCE)):
-            team_value = '. '.join([str(conf['RANK'][i]), conf['TEAM'][i]])
-            table += team_value + '\n'
-        values.append(table)
-    return values
+
+PREFETCHER = Prefetcher(GAME_STORE, prefetch_player)
+METRICS.register('prefetch', PREFETCHER.stats)
+
+
+def share_caches(game_logs: TTLCache, player_teams: TTLCache,
+                 bucket: TokenBucket, pictures: Dict[str, str],
+                 primary: bool = True) -> None:
+    """Replaces the in-memory game log, player team and picture caches and
+    the stats.nba.com rate limit with ones shared between processes, such
+    as the proxies from shards.connect. Only the primary process writes the
+    pictures to IMAGE_CACHE_PATH.
+    """
+    global PLAYER_TEAMS
+    GAME_LOG_CACHE.memory = game_logs
+    PLAYER_TEAMS = player_teams
+    GUARD.bucket = bucket
+    IMAGE_CACHE.share(pictures, save=primary)
+    METRICS.register('player_teams', PLAYER_TEAMS.stats)
 
 
 def convert_year(year: str) -> str:
@@ -174,61 +274,98 @@ def convert_year(year: str) -> str:
     return str(int(year) + 1)
 
 
-def embed_creator(info: Tuple[str, Optional[str], Any],
-                  thumbnail: Optional[str], image: Optional[str],
-                  dict_fields: Dict[str, str]) -> discord.Embed:
-    """Creates an embed based on the information provided."""
-    embed = discord.Embed(title=info[0], description=info[1], color=info[2])
-
-    if thumbnail is not None:
-        embed.set_thumbnail(url=thumbnail)
-    if image is not None:
-        embed.set_image(url=image)
-    for field in dict_fields:
-        embed.add_field(name=field, value=dict_fields[field])
-    return embed
+BANNER = embed_creator((f"NBABot {YEAR} is online",
+                        "View stats for NBA players and teams.", 0x0000FF),
+                       None,
+                       "https://content.sportslogos.net/news/2017/07/"
+                       "New-NBA-Logo-1.png",
+                       {"NBA": 'Use **!player** or **!team** to find out more '
+                               'about the commands you can use to get '
+                               'information about both!'})
 
 
 @bot.event
 async def on_ready():
-    channel = bot.get_channel(int(CHANNEL_ID))
-    await channel.send('Connecting...')
-
-    await channel.send(embed=embed_creator((f"NBABot {YEAR} is online",
-                                            "View stats for NBA players and "
-                                            "teams.", 0x0000FF
-                                            ), None,
-                                           "https://content.sportslogos.net"
-                                           "/news/2017/07/"
-                                           "New-NBA-Logo-1.png",
-                                           {"NBA": 'Use **!player'
-                                                   f'** or **!team** to find out'
-                                                   f' more about 'f'the commands'
-                                                   f' you can use to 'f'get info'
-                                                   f'rmation about both!'}))
-    print(f'{bot.user} has connected to Discord!')
+    await UPSTREAM.call(LOOKUPS.load)
+    GAME_STORE.start()
+    LEADERS.start()
+    DRAFT.start()
+    if PRIMARY:
+        PREFETCHER.start()
+        IMAGE_CACHE.start_warming(
+            [('player', nba_player.id)
+             for nba_player in LOOKUPS.active_players]
+            + [('team', nba_team.id) for nba_team in LOOKUPS.teams])
+    # With several processes, the channel is only visible to the one running
+    # the shard of its guild.
+    channel_id = os.getenv('CHANNEL_ID')
+    channel = bot.get_channel(int(channel_id)) if channel_id else None
+    if channel is not None:
+        await channel.send('Connecting...')
+        await channel.send(embed=BANNER)
+    print(f'{bot.user} has connected to Discord with shards '
+          f'{bot.shard_ids or "all"}!')
+
+
+@bot.before_invoke
+async def start_timer(ctx):
+    ctx.started = time.perf_counter()
+
+
+@bot.after_invoke
+async def record_latency(ctx):
+    # discord.py calls this even when the command raised.
+    METRICS.observe('nba_command_seconds',
+                    time.perf_counter() - ctx.started,
+                    command=ctx.command.name,
+                    status='error' if ctx.command_failed else 'ok')
+
+
+@bot.event
+async def on_command_error(ctx, error):
+    original = getattr(error, 'original', None)
+    if isinstance(original, (asyncio.TimeoutError, requests.Timeout)):
+        await ctx.send('The NBA stats site is taking too long to respond. '
+                       'Please try again later.')
+    elif isinstance(original, CircuitOpenError):
+        await ctx.send('The NBA stats site is unavailable right now. '
+                       'Please try again in a minute.')
+    elif isinstance(error, CheckFailure):
+        await ctx.send('Only server administrators can use that command.')
+    else:
+        raise error
 
 
 @bot.command()
 async def pull(ctx):
     """Shows a random player from the current season."""
-    random_player = ACTIVE_PLAYER_LIST[random.randint(0,
-                                                      len(ACTIVE_PLAYER_LIST - 1))]
-    df_log = load_player_dataframe(random_player, '2019', 'Regular')
-    team_abb, team_name = season_helper(random_player, '2019', df_log)
-    statistics = {'GP': str(len(df_log))}
-    statistics.update(avg_values(df_log))
+    random_player = LOOKUPS.registry.random_active()
+    df_log = await UPSTREAM.call(load_player_dataframe, random_player, '2019',
+                                 'Regular')
+    nba_team = await UPSTREAM.call(season_helper, random_player, '2019',
+                                   df_log)
+    if nba_team is None:
+        await ctx.send(f'{random_player.full_name} did not play this '
+                       f'season.')
+        return
+    statistics = player_statistics(df_log)
     embed = embed_creator(('2019-2020 Season',
-                           ','.join([random_player['full_name'],
-                                     team_name.upper()]),
-                           TEAM_TO_COLORS[team_abb]),
-                          None, find_picture('player', random_player['id']),
+                           ','.join([random_player.full_name,
+                                     nba_team.full_name.upper()]),
+                           nba_team.color),
+                          None, await UPSTREAM.call(find_picture, 'player',
+                                                    random_player.id),
                           statistics)
     await ctx.send(embed=embed)
 
 @bot.command()
 async def player(ctx):
     """Shows commands that can access player statistics."""
+    await ctx.send(embed=PLAYER_HELP)
+
+
+def player_help_embed() -> discord.Embed:
+    """Builds the player help section, once."""
     embed = discord.Embed(title='Player Help', description='This is the player '
                                                            'help section.')
     embed.add_field(name='**!season**',
@@ -255,25 +392,89 @@ async def player(ctx):
                                              'Default year and draft are set to'
                                              ' 2019 and 1.\n'
                                              "Example: **!draft 2019 3**"'')
+    embed.add_field(name='**!draftround**', value='Use **!draftround** '
+                                                  'followed by the year and '
+                                                  'round to list every pick '
+                                                  'of that round.\n'
+                                                  'Example: **!draftround '
+                                                  '2003 1**')
+    embed.add_field(name='**!draftteam**', value='Use **!draftteam** followed'
+                                                 ' by a team and an optional '
+                                                 'range of years to list its '
+                                                 'picks, by default over the '
+                                                 f'last {DRAFT_TEAM_YEARS} '
+                                                 'drafts.\n'
+                                                 'Example: **!draftteam '
+                                                 'spurs 1990-1999**')
+    embed.add_field(name='**!draftslot**', value='Use **!draftslot** followed'
+                                                 ' by the player name to see '
+                                                 'where they were drafted.\n'
+                                                 'Example: **!draftslot '
+                                                 'manu ginobili**')
+    embed.add_field(name='**!leaders**', value='Use **!leaders** followed by a'
+                                               ' stat such as PTS, AST or '
+                                               'FG_PCT and an optional count '
+                                               'to see the league leaders this'
+                                               ' season.\n'
+                                               'Example: **!leaders AST 5**')
+    embed.add_field(name='**!compare**', value='Use **!compare** followed by '
+                                               'two to four players, each '
+                                               'with an optional year and '
+                                               'playoff condition, separated '
+                                               'by commas to see their stats '
+                                               'side by side.\n'
+                                               'Example: **!compare lebron '
+                                               'james 2019, kevin durant '
+                                               '2016 playoffs**')
+    return embed
 
-    await ctx.send(embed=embed)
 
+PLAYER_HELP = player_help_embed()
 
-def season_helper(nba_player, year, df_log):
-    team_abb, team_name = None, None
-    if year == '2019':
 
-        player_info = commonplayerinfo.CommonPlayerInfo(
-            player_id=nba_player['id'])
-        df_player = player_info.get_data_frames()[0]
-        team_abb, team_name = df_player['TEAM_ABBREVIATION'][0], \
-                              ' '.join([df_player['TEAM_CITY'][0],
-                                        df_player['TEAM_NAME'][0]])
+def fetch_player_team(player_id: int,
+                      refresh: bool = False) -> Tuple[str, str]:
+    """Returns the abbreviation and full name of player_id's current team,
+    cached in PLAYER_TEAMS unless refresh is set. If the API cannot be
+    reached, an expired cached team is returned rather than failing.
+    """
+    team = None if refresh else PLAYER_TEAMS.get(player_id)
+    if team is None:
+        team, error = fetch_or_stale(
+            functools.partial(load_player_team, player_id),
+            functools.partial(PLAYER_TEAMS.get_stale, player_id),
+            'CommonPlayerInfo')
+        if error is None:
+            PLAYER_TEAMS.set(player_id, team, PLAYER_TEAM_TTL)
+    return team
+
+
+def load_player_team(player_id: int) -> Tuple[str, str]:
+    """Fetches the abbreviation and full name of player_id's current team
+    from the API.
+    """
+    from nba_api.stats.endpoints import commonplayerinfo
+
+    player_info = GUARD.fetch(commonplayerinfo.CommonPlayerInfo,
+                              player_id=player_id, timeout=UPSTREAM_TIMEOUT)
+    df_player = player_info.get_data_frames()[0]
+    return df_player['TEAM_ABBREVIATION'][0], \
+        ' '.join([df_player['TEAM_CITY'][0], df_player['TEAM_NAME'][0]])
+
+
+def season_helper(nba_player, year, df_log) -> Optional[Team]:
+    """Returns the team nba_player played for in year: their current team
+    for the current season, otherwise the team of their latest game in
+    df_log. None if they have no team, e.g. they did not play in year.
+    """
+    abbreviation = None
+    if year == str(season_for_date(datetime.now())):
+        abbreviation, _ = fetch_player_team(nba_player.id)
     elif len(df_log['MATCHUP']) > 0:
-        team_abb = df_log['MATCHUP'][0][0:3]
-        team_name = [team for team in TEAM_LIST if team['abbreviation'] ==
-                     team_abb][0]['full_name']
-    return team_abb, team_name
+        abbreviation = df_log['MATCHUP'][0][0:3]
+    if not abbreviation:
+        return None
+    return LOOKUPS.registry.team_by_abbreviation(abbreviation)
 
 
 @bot.command()
@@ -289,37 +490,68 @@ async def season(ctx, *args):
         first_name, last_name = values[0], values[1]
         if values[2] is not None:
             last_name = last_name + ' ' + values[2]
-        year, nba_season, nba_player = values[3], values[4], \
-                                       find_player(first_name, last_name,
-                                                   ACTIVE_PLAYER_LIST)
+        year, nba_season = values[3], values[4]
+        nba_player, suggestions, fuzzy = resolve_player(
+            first_name, last_name, LOOKUPS.active_player_index)
         if nba_player is None:
             await ctx.send(
                 'The player you asked for is either inactive or your '
-                'query cannot be followed.')
+                'query cannot be followed.' + suggestion_text(suggestions))
         else:
-            df_log = load_player_dataframe(nba_player, year, nba_season)
-            team_abb, team_name = season_helper(nba_player, year, df_log)
-
-            if team_abb is None or team_name is None:
+            if fuzzy:
+                await ctx.send(fuzzy_text(nba_player))
+            key = ('season', nba_player.id, year, nba_season)
+            active = nba_player.is_active
+            embed = await EMBEDS.render(
+                key, data_version(year, active), game_log_ttl(year, active),
+                functools.partial(QUERIES.do, key, season_embed, nba_player,
+                                  year, nba_season))
+            if embed is None:
                 await ctx.send('Player did not play this season.')
             else:
-                embed = discord.Embed(
-                    title=year + '-' + convert_year(year) + ' ' +
-                          nba_season + ' Season Stats',
-                    description=', '.join(
-                        [nba_player['full_name'],
-                         team_name.upper()]),
-                    color=TEAM_TO_COLORS[team_abb])
-                embed.set_thumbnail(
-                    url=find_picture('player', nba_player['id']))
-                statistics = {'GP': str(len(df_log))}
-                statistics.update(avg_values(df_log))
-                for key in statistics:
-                    embed.add_field(name=key, value=statistics[key])
-
                 await ctx.send(embed=embed)
 
 
+def data_version(season: str, active: bool) -> Optional[str]:
+    """Returns the version of the data behind a stats embed for season.
+    Logs that change after every game are versioned by the latest game date
+    known for the current season, so new games invalidate their cached
+    embeds; everything else (including a season that is not loaded yet)
+    is None.
+    """
+    if game_log_ttl(season, active) == FOREVER:
+        return None
+    season_games = GAME_STORE.loaded(season_for_date(datetime.now()))
+    return season_games.last_date if season_games is not None else None
+
+
+async def season_embed(nba_player, year: str, nba_season: str
+                       ) -> Tuple[Optional[discord.Embed], bool]:
+    """Creates the embed for nba_player's stats in year and nba_season, or
+    None if the player did not play that season, and whether it is complete:
+    built from a fresh log. The picture is optional.
+    """
+    df_log, stale = await UPSTREAM.call(load_player_log, nba_player, year,
+                                        nba_season)
+    nba_team = await UPSTREAM.call(season_helper, nba_player, year, df_log)
+    if nba_team is None:
+        return None, not stale
+
+    embed = discord.Embed(
+        title=year + '-' + convert_year(year) + ' ' + nba_season +
+              ' Season Stats',
+        description=', '.join([nba_player.full_name,
+                               nba_team.full_name.upper()]),
+        color=nba_team.color)
+    picture = await UPSTREAM.call(find_picture, 'player', nba_player.id)
+    if picture is not None:
+        embed.set_thumbnail(url=picture)
+    statistics = player_statistics(df_log)
+    for key in statistics:
+        embed.add_field(name=key, value=statistics[key])
+    return embed, not stale
+
+
 @bot.command()
 async def career(ctx, *args):
     """Shows the player stats for their career.
@@ -332,7 +564,8 @@ async def career(ctx, *args):
     first_name, last_name, third, year, season_type = sort(args)
     if third is not None:
         last_name = last_name + ' ' + third
-    nba_player = find_player(first_name, last_name, PLAYER_LIST)
+    nba_player, suggestions, fuzzy = resolve_player(first_name, last_name,
+                                                    LOOKUPS.player_index)
     nba_season = season_type
 
     if season_type.lower() == 'playoff' or season_type.lower() == 'playoffs':
@@ -340,26 +573,104 @@ async def career(ctx, *args):
 
     if nba_player is None:
         await ctx.send('The player you asked for does not exist in the '
-                       'database.')
+                       'database.' + suggestion_text(suggestions))
 
     else:
-        df_log = load_player_dataframe(nba_player, SeasonAll.all, nba_season)
-        statistics = {'GP': str(len(df_log))}
-        statistics.update(avg_values(df_log))
-        playoffs = ''
-        if nba_season == 'Playoffs':
-            playoffs = ' ' + nba_season
-        embed = discord.Embed(title='Career' + playoffs + ' Stats',
-                              description=nba_player['full_name'],
-                              color=0x738ADB)
-        embed.set_thumbnail(url=find_picture('player', nba_player['id']))
-
-        for key in statistics:
-            embed.add_field(name=key, value=statistics[key])
-
+        if fuzzy:
+            await ctx.send(fuzzy_text(nba_player))
+        key = ('career', nba_player.id, nba_season)
+        active = nba_player.is_active
+        embed = await EMBEDS.render(
+            key, data_version(SeasonAll.all, active),
+            game_log_ttl(SeasonAll.all, active),
+            functools.partial(QUERIES.do, key, career_embed, nba_player,
+                              nba_season))
         await ctx.send(embed=embed)
 
 
+async def career_embed(nba_player,
+                       nba_season: str) -> Tuple[discord.Embed, bool]:
+    """Creates the embed for nba_player's career stats in nba_season, and
+    whether it is complete: built from a fresh log. The picture is optional.
+    """
+    df_log, stale = await UPSTREAM.call(load_player_log, nba_player,
+                                        SeasonAll.all, nba_season)
+    statistics = player_statistics(df_log)
+    playoffs = ''
+    if nba_season == 'Playoffs':
+        playoffs = ' ' + nba_season
+    embed = discord.Embed(title='Career' + playoffs + ' Stats',
+                          description=nba_player.full_name,
+                          color=0x738ADB)
+    picture = await UPSTREAM.call(find_picture, 'player', nba_player.id)
+    if picture is not None:
+        embed.set_thumbnail(url=picture)
+
+    for key in statistics:
+        embed.add_field(name=key, value=statistics[key])
+    return embed, not stale
+
+
+def split_comparison(args: Tuple[str, ...]) -> List[Tuple[str, ...]]:
+    """Splits the arguments of #compare into one group per player, at commas
+    or the word vs.
+    """
+    groups, current = [], []
+    for arg in args:
+        for i, part in enumerate(arg.split(',')):
+            if i > 0 or part.lower() in ('vs', 'vs.'):
+                groups.append(tuple(current))
+                current = []
+            if part and part.lower() not in ('vs', 'vs.'):
+                current.append(part)
+    groups.append(tuple(current))
+    return [group for group in groups if group]
+
+
+@bot.command()
+async def compare(ctx, *args):
+    """Shows the season stats of several players side by side. Every player
+    is resolved first, then all of their game logs are fetched at once, so
+    the command takes about as long as the slowest fetch.
+    """
+    groups = split_comparison(args)
+    if not 2 <= len(groups) <= COMPARE_MAX_PLAYERS or \
+            any(len(group) < 2 for group in groups):
+        await ctx.send(f'Please enter 2 to {COMPARE_MAX_PLAYERS} players '
+                       'separated by commas, e.g. **!compare lebron james '
+                       '2019, kevin durant 2016 playoffs**')
+        return
+
+    entries = []
+    for group in groups:
+        first_name, last_name, third, year, nba_season = sort(group)
+        if third is not None:
+            last_name = last_name + ' ' + third
+        nba_player, suggestions, fuzzy = resolve_player(
+            first_name, last_name, LOOKUPS.player_index)
+        if nba_player is None:
+            await ctx.send(f'Could not find {first_name} {last_name}.' +
+                           suggestion_text(suggestions))
+            return
+        if fuzzy:
+            await ctx.send(fuzzy_text(nba_player))
+        entries.append((nba_player, year, nba_season))
+
+    await ctx.send('Loading...')
+    logs = await asyncio.gather(*[
+        UPSTREAM.call(load_player_dataframe, nba_player, year, nba_season)
+        for nba_player, year, nba_season in entries])
+    embed = discord.Embed(title='Player Comparison', color=0x738ADB)
+    for (nba_player, year, nba_season), statistics in zip(
+            entries, compare_statistics(logs)):
+        value = '\n'.join(f'{key}: {statistics[key]}' for key in statistics) \
+            if statistics['GP'] != '0' else 'Did not play.'
+        embed.add_field(name=f"{nba_player.full_name}, "
+                             f"{year}-{convert_year(year)[2:]} {nba_season}",
+                        value=value)
+    await ctx.send(embed=embed)
+
+
 # @bot.command()
 # async def last_game(ctx, first_name, last_name):
 #     """Shows the player stats for their last game, along with the date and
@@ -394,10 +705,35 @@ async def career(ctx, *args):
 #         await ctx.send(embed=embed)
 
 
+@bot.command()
+async def leaders(ctx, stat='PTS', count='5'):
+    """Shows the league leaders in stat for the current season.
+    Default stat is points and default count is 5.
+    """
+    board = await LEADERS.get(season_for_date(datetime.now()))
+    stat = stat.upper()
+    if stat not in board.stat_set.labels or not count.isnumeric():
+        await ctx.send('Choose one of these stats: ' +
+                       ', '.join(board.stat_set.labels) + '.')
+        return
+
+    top = board.leaders(stat, int(count))
+    if not top:
+        await ctx.send(f'No qualified players in {stat} yet.')
+        return
+    kind = board.stat_set.kinds[board.stat_set.labels.index(stat)]
+    fields = {}
+    for rank, (_, name, value) in enumerate(top, 1):
+        fields[f'{rank}. {name}'] = format_value(value, kind)
+    info = ('League Leaders', stat + ', ' + season_string(
+        season_for_date(datetime.now())) + ' season', 0xC9082A)
+    await ctx.send(embed=embed_creator(info, None, None, fields))
+
+
 @bot.command()
 async def standings(ctx):
     """Shows the current league standings in each conference."""
-    east, west = conference()
+    east, west = await STANDINGS.get()
 
     url = 'https://www.gamblingsites.net/wp-content/uploads/2019/07/nba' \
           '-eastern-western-conference-winner-2020.jpg '
@@ -407,18 +743,66 @@ async def standings(ctx):
                                         'Eastern Conference': east}))
 
 
+def latency_summary(name: str, label: str) -> str:
+    """Returns a line with the count and p50/p95/p99 latencies of every
+    series of the histogram called name, by the value of label.
+    """
+    lines = []
+    for labels, histogram in sorted(METRICS.histograms(name),
+                                    key=lambda item: -item[1].count):
+        quantiles = '/'.join(f'{histogram.quantile(q) * 1000:.0f}'
+                             for q in (0.5, 0.95, 0.99))
+        status = labels.get('status', labels.get('outcome', 'ok'))
+        lines.append(f'{labels[label]}'
+                     f'{"" if status == "ok" else " (" + status + ")"}: '
+                     f'n={histogram.count} {quantiles}ms')
+    return '\n'.join(lines)[:1024] or 'Nothing recorded yet.'
+
+
+@bot.command()
+@check_any(is_owner(), has_permissions(administrator=True))
+async def botstats(ctx):
+    """Shows p50/p95/p99 latencies of commands and upstream requests, and
+    the cache hit rates. For administrators only.
+    """
+    game_logs = GAME_LOG_CACHE.stats()['memory']
+    images, guard = IMAGE_CACHE.stats(), GUARD.stats()
+    prefetch = PREFETCHER.stats()
+    with_prefetch, without = PREFETCHER.hit_rates(game_logs['hits'],
+                                                  game_logs['misses'])
+    await ctx.send(embed=embed_creator(
+        ('NBABot stats', 'Latencies are p50/p95/p99.', 0x808080), None, None,
+        {'Commands': latency_summary('nba_command_seconds', 'command'),
+         'Upstream': latency_summary('nba_upstream_request_seconds',
+                                     'endpoint'),
+         'Caches': f"game logs {game_logs['hits']} hits / "
+                   f"{game_logs['misses']} misses, pictures "
+                   f"{images['hits']} hits / {images['misses']} misses, "
+                   f"{QUERIES.stats()['coalesced']} queries coalesced",
+         'Prefetch': f"{prefetch['players']} players warmed, "
+                     f"{prefetch['useful']} used; game log hit rate "
+                     f"{with_prefetch:.0%}, {without:.0%} without "
+                     f"prefetching",
+         'stats.nba.com': f"circuit {guard['circuit']}, "
+                          f"{guard['retried']} retried, "
+                          f"{guard['rejected']} rejected",
+         'Discord': f'gateway latency {bot.latency * 1000:.0f}ms'}))
+
+
 @bot.command()
 async def team(ctx):
     """Shows commands that can be performed to access team statistics."""
+    await ctx.send(embed=TEAM_HELP)
+
+
+def team_help_embed() -> discord.Embed:
+    """Builds the team help section, once."""
     embed = discord.Embed(title='Teams Help Section')
-    embed.add_field(name='**!teams**', value='Use **!teams** to get a list of'
+    embed.add_field(name='**!teams**', value='Use **!teams** to get a list of '
                                              'all NBA teams in alphabetical '
                                              'order.')
     embed.add_field(name='**!standings**', value='Use **!standings** to get the'
-                                                 'current playoff rankings.')
-    embed.add_field(name='**!teams**', value='Use **!teams** to get a list of'
-                                             'the NBA teams in alphabetical '
-                                             'order.')
+                                                 ' current playoff rankings.')
     embed.add_field(name='**!get_games**', value='Use **!get_games**, followed '
                                                  'by an optional date, to get '
                                                  'all of the games that '
@@ -430,26 +814,33 @@ async def team(ctx):
                                             ' name to get the last game and '
                                             'score for the entered team. \n'
                                             'Example: !last miami heat')
-    await ctx.send(embed=embed)
+    embed.add_field(name='**!live**', value="Use **!live** to get the scores "
+                                            "of today's games as they are "
+                                            "played.")
+    embed.add_field(name='**!track**', value='Use **!track** to pin the live '
+                                             'scores in this channel and keep '
+                                             'them up to date, and '
+                                             '**!untrack** to stop. For '
+                                             'server administrators.')
+    return embed
+
+
+TEAM_HELP = team_help_embed()
 
 
 @bot.command()
 async def teams(ctx):
     """Shows a list of NBA teams in alphabetical order."""
+    await ctx.send(embed=teams_embed())
 
-    team_lst = []
-    for nba in TEAM_LIST:
-        team_lst.append(nba['full_name'])
-    embed = discord.Embed(title='NBA TEAMS', description=None, color=0x3354FF)
-    field_team = ''
-    for i in range(len(team_lst)):
-        if i != 0 and i % 10 == 0:
-            embed.add_field(name='_', value=field_team)
-            field_team = ''
-        else:
-            field_team += team_lst[i] + '\n'
-    embed.add_field(name='_', value=field_team)
-    await ctx.send(embed=embed)
+
+@functools.lru_cache(maxsize=None)
+def teams_embed() -> discord.Embed:
+    """Builds the list of teams, ten to a field, the first time it is
+    needed.
+    """
+    return list_embed(('NBA TEAMS', None, 0x3354FF),
+                      sorted(nba.full_name for nba in LOOKUPS.teams))
 
 
 @bot.command()
@@ -461,6 +852,8 @@ async def get_games(ctx, *args):
         today = datetime.now()
         date = datetime(today.year, today.month, today.day).strftime("%Y-%m-%d")
     else:
+        import dateparser
+
         value = ' '.join(args)
         try:
             today = dateparser.parse(date_string=value)
@@ -470,37 +863,19 @@ async def get_games(ctx, *args):
         except AttributeError:
             await ctx.send('Improper date format. Please try again.')
             return
-    if today.year == 2020 or (today.year == 2019 and today.month > 7):
-        game_df = GAME_DF  # this saves time, don't have to retrieve the game_df
-    elif today.month > 7:
-        game_df = get_game_df(str(today.year))
-    else:
-        game_df = get_game_df(str(today.year - 1))
+    season_games = await GAME_STORE.get(season_for_date(today))
 
-    selected = game_df[game_df['GAME_DATE'] == date]
-    game_ids = []
+    selected = season_games.games_on(date)
     fields = {}
-    for i in range(len(selected)):
-        row = selected.iloc[i, :]
-        if row['GAME_ID'] not in game_ids:
-            game_ids.append(row['GAME_ID'])
-            first, second = game_finder(game_df, row['GAME_ID'], row)
-            fields[first['MATCHUP']] = '-'.join([str(first.PTS),
-                                                 str(second.PTS)])
+    for matchup, home_pts, away_pts in zip(selected.MATCHUP_HOME,
+                                           selected.PTS_HOME,
+                                           selected.PTS_AWAY):
+        fields[matchup] = '-'.join([str(home_pts), str(away_pts)])
     info = ('**Get Games**', 'Games occuring on ' + date + ':', 0xBEC0C2)
     embed = embed_creator(info, None, None, fields)
     await ctx.send(embed=embed)
 
 
-def game_finder(game_df: DataFrame, game_id: int, first: DataFrame):
-    game = game_df[game_df['GAME_ID'] == game_id]
-
-    second = game.iloc[0, :]
-    if first.TEAM_ID == second.TEAM_ID:
-        second = game.iloc[1, :]
-    return first, second
-
-
 @bot.command()
 async def next(ctx, *args):
     """Gets the next game for a certain team."""
@@ -508,16 +883,36 @@ async def next(ctx, *args):
     pass
 
 
-def team_finder(df: DataFrame, team_name: str):
-    """Helps find teams from data frame."""
-    name = team_name.lower()
-    team_dict = [team for team in TEAM_LIST if (team['full_name'].lower() ==
-                                                name or team[
-                                                    'abbreviation'] == name or
-                                                team['nickname'] ==
-                                                name or team['city'] == name)][
-        0]
-    return df[df['TEAM_ID'] == team_dict['id']]
+@bot.command()
+async def live(ctx):
+    """Shows the scores of today's games from the live tracker, which polls
+    stats.nba.com on its own schedule however often this is used.
+    """
+    await ctx.send(embed=await LIVE.scores())
+
+
+@bot.command()
+@check_any(is_owner(), has_permissions(administrator=True))
+async def track(ctx):
+    """Pins the live scores in this channel and keeps editing them as the
+    games go on. For administrators only.
+    """
+    await LIVE.subscribe(ctx.channel)
+
+
+@bot.command()
+@check_any(is_owner(), has_permissions(administrator=True))
+async def untrack(ctx):
+    """Stops updating the live scores in this channel and unpins them."""
+    message = LIVE.unsubscribe(ctx.channel.id)
+    if message is None:
+        await ctx.send('The live scores are not tracked in this channel.')
+        return
+    try:
+        await message.unpin()
+    except discord.HTTPException:
+        pass
+    await ctx.send('Stopped tracking the live scores.')
 
 
 @bot.command()
@@ -528,22 +923,28 @@ async def last(ctx, *args):
         values.append(value.lower())
     team_name = ' '.join(values)
 
-    first = team_finder(GAME_DF, team_name).iloc[0, :]
+    nba_team = LOOKUPS.team_index.find(team_name)
 
-    if len(first) == 0:
+    if nba_team is None:
         await ctx.send('The team you are looking for does not exist.')
+        return
 
-    else:
-
-        first, second = game_finder(GAME_DF, first.GAME_ID, first)
+    season_games = await GAME_STORE.get(season_for_date(datetime.now()))
+    team_games = season_games.team_games(nba_team.id)
+    if len(team_games) == 0:
+        await ctx.send('The team you are looking for has not played this '
+                       'season.')
 
-        info, fields = (first.GAME_DATE, first.MATCHUP,
-                        TEAM_TO_COLORS[first.MATCHUP[:3]]), \
-                       {first.TEAM_NAME: first.PTS,
-                        second.TEAM_NAME: second.PTS}
-        pic_url = f'https://a.espncdn.com/i/teamlogos/nba/500' \
-                  f'/{first.MATCHUP[:3]}.png'
-        embed = embed_creator(info, pic_url, None, fields)
+    else:
+        game = team_games.iloc[0, :]
+        side, other = ('_HOME', '_AWAY') if \
+            game.TEAM_ID_HOME == nba_team.id else ('_AWAY', '_HOME')
+        matchup = game['MATCHUP' + side]
+
+        info, fields = (game.GAME_DATE, matchup, nba_team.color), \
+                       {game['TEAM_NAME' + side]: game['PTS' + side],
+                        game['TEAM_NAME' + other]: game['PTS' + other]}
+        embed = embed_creator(info, nba_team.logo, None, fields)
         await ctx.send(embed=embed)
 
 
@@ -552,22 +953,127 @@ async def draft(ctx, year='2019', pick='1'):
     """Get the indicated draft pick for year.
     Default year is 2019 and default pick is set to 1.
     """
-    await ctx.send('Loading...')
-    drafting = drafthistory.DraftHistory(season_year_nullable=year,
-                                         overall_pick_nullable=pick)
-    df_draft = drafting.get_data_frames()[0]
-    if len(df_draft) == 0:
+    table = await DRAFT.get()
+    nba_pick = table.pick(int(year), int(pick)) \
+        if year.isnumeric() and pick.isnumeric() else None
+    if nba_pick is None:
         await ctx.send('The draft pick you entered does not exist in the '
                        'databases.')
         return
-    embed = discord.Embed(title=year + ' NBA Draft', description='Pick No. ' +
-                                                                 pick)
-    embed.add_field(name=df_draft.PLAYER_NAME[0], value=df_draft.TEAM_CITY[0] +
-                                                        ' ' +
-                                                        df_draft.TEAM_NAME[0])
-    embed.set_thumbnail(url=find_picture('player', df_draft['PERSON_ID'][0]))
+    await ctx.send(embed=await pick_embed(nba_pick))
+
+
+async def pick_embed(nba_pick) -> discord.Embed:
+    """Creates the embed for one row of the draft history."""
+    embed = discord.Embed(title=f'{nba_pick.SEASON} NBA Draft',
+                          description=f'Pick No. {nba_pick.OVERALL_PICK}')
+    embed.add_field(name=nba_pick.PLAYER_NAME, value=nba_pick.TEAM_CITY +
+                                                     ' ' + nba_pick.TEAM_NAME)
+    picture = await UPSTREAM.call(find_picture, 'player',
+                                  int(nba_pick.PERSON_ID))
+    if picture is not None:
+        embed.set_thumbnail(url=picture)
+    return embed
 
-    await ctx.send(embed=embed)
+
+@bot.command()
+async def draftround(ctx, year='2019', round_number='1'):
+    """Lists every pick of a round of the draft in year.
+    Default year is 2019 and default round is set to 1.
+    """
+    table = await DRAFT.get()
+    picks = table.round(int(year), int(round_number)) \
+        if year.isnumeric() and round_number.isnumeric() else table.df[:0]
+    if len(picks) == 0:
+        await ctx.send('The draft round you entered does not exist in the '
+                       'databases.')
+        return
+    await ctx.send(embed=list_embed(
+        (f'{year} NBA Draft', f'Round {round_number}', 0x738ADB),
+        [f'{number}. {name} ({abbreviation})' for number, name, abbreviation
+         in zip(picks.OVERALL_PICK, picks.PLAYER_NAME,
+                picks.TEAM_ABBREVIATION)]))
+
+
+@bot.command()
+async def draftteam(ctx, *args):
+    """Lists a team's draft picks over a range of years, such as
+    1990-1999. Default is the last DRAFT_TEAM_YEARS drafts.
+    """
+    table = await DRAFT.get()
+    words = list(args)
+    last_year = table.years().stop - 1
+    years = (last_year - DRAFT_TEAM_YEARS + 1, last_year)
+    if words and words[-1].replace('-', '').isnumeric():
+        first, _, last = words.pop().partition('-')
+        last = last or first
+        if not first.isnumeric() or not last.isnumeric() or \
+                int(first) > int(last):
+            await ctx.send('Please enter one year or a range of years such '
+                           'as 1990-1999.')
+            return
+        years = (int(first), int(last))
+    nba_team = LOOKUPS.team_index.find(' '.join(words).lower())
+    if nba_team is None:
+        await ctx.send('The team you are looking for does not exist.')
+        return
+    if years[1] - years[0] >= DRAFT_TEAM_MAX_YEARS:
+        await ctx.send(f'Please enter at most {DRAFT_TEAM_MAX_YEARS} years.')
+        return
+
+    picks = table.team(nba_team.id, *years)
+    if len(picks) == 0:
+        await ctx.send(f'The {nba_team.full_name} did not draft anyone from '
+                       f'{years[0]} to {years[1]}.')
+        return
+    await ctx.send(embed=list_embed(
+        (f'{nba_team.full_name} Draft Picks', f'{years[0]}-{years[1]}',
+         nba_team.color),
+        [f'{season}: {number}. {name}' for season, number, name
+         in zip(picks.SEASON, picks.OVERALL_PICK, picks.PLAYER_NAME)]))
+
+
+@bot.command()
+async def draftslot(ctx, *args):
+    """Shows where a player was drafted."""
+    if len(args) < 2:
+        await ctx.send("Please enter the player's full name.")
+        return
+    first_name, last_name, third, _, _ = sort(args)
+    if third is not None:
+        last_name = last_name + ' ' + third
+    nba_player, suggestions, fuzzy = resolve_player(first_name, last_name,
+                                                    LOOKUPS.player_index)
+    if nba_player is None:
+        await ctx.send('The player you asked for does not exist in the '
+                       'database.' + suggestion_text(suggestions))
+        return
+    if fuzzy:
+        await ctx.send(fuzzy_text(nba_player))
+    nba_pick = (await DRAFT.get()).player(nba_player.id)
+    if nba_pick is None:
+        await ctx.send(f'{nba_player.full_name} was not drafted.')
+        return
+    await ctx.send(embed=await pick_embed(nba_pick))
 
 
-bot.run(TOKEN)
+def main(shard_ids: Optional[List[int]] = None,
+         shard_count: Optional[int] = None, primary: bool = True,
+         metrics_port: Optional[int] = None) -> None:
+    """Reads the configuration from the environment and connects the bot.
+    By default it runs every shard Discord recommends; shards.py passes each
+    process its shard_ids out of shard_count instead, and which process is
+    primary.
+    """
+    global PRIMARY
+    PRIMARY = primary
+    bot.shard_ids, bot.shard_count = shard_ids, shard_count
+    if metrics_port is None and METRICS_PORT:
+        metrics_port = int(METRICS_PORT)
+    if metrics_port is not None:
+        serve(METRICS, metrics_port)
+    bot.run(os.getenv('DISCORD_TOKEN'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from pandas import DataFrame, concat, factorize
+
+AVERAGE, PERCENTAGE, TOTAL, PER_36 = 'average', 'percentage', 'total', 'per_36'
+
+
+class StatSet:
+    """An ordered set of statistics to compute from a game log. Each stat is
+    a (label, kind, column) triple, where kind is one of AVERAGE (per game),
+    PERCENTAGE (column is a shot type such as 'FG', made over attempted),
+    TOTAL or PER_36 (per 36 minutes played).
+
+    The game-log columns each stat needs are worked out once up front, so
+    computing a StatSet is a handful of vectorized NumPy operations no matter
+    how many stats it has.
+    """
+
+    def __init__(self, stats: Sequence[Tuple[str, str, str]]) -> None:
+        self.labels = [label for label, _, _ in stats]
+        self.kinds = [kind for _, kind, _ in stats]
+        columns = []
+
+        def position(column: str) -> int:
+            if column not in columns:
+                columns.append(column)
+            return columns.index(column)
+
+        numerators, denominators = [], []
+        for _, kind, column in stats:
+            if kind == PERCENTAGE:
+                numerators.append(position(column + 'M'))
+                denominators.append(position(column + 'A'))
+            else:
+                numerators.append(position(column))
+                denominators.append(position('MIN') if kind == PER_36 else -1)
+        self.columns = columns
+        self._numerators = np.array(numerators)
+        self._denominators = np.array(denominators)
+        kinds = np.array(self.kinds)
+        self._is_average = kinds == AVERAGE
+        self._is_percentage = kinds == PERCENTAGE
+        self._is_per_36 = kinds == PER_36
+
+    def compute(self, sums: np.ndarray, games: np.ndarray) -> np.ndarray:
+        """Returns an array with a row of stats for every row of column sums
+        in sums, given how many games each row covers.
+        """
+        numerators = sums[:, self._numerators]
+        denominators = np.where(self._denominators >= 0,
+                                sums[:, self._denominators], 1.0)
+        denominators[:, self._is_average] = games[:, np.newaxis]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = numerators / denominators
+        values[:, self._is_percentage] *= 100
+        values[:, self._is_per_36] *= 36
+        return values
+
+
+BASIC_STATS = StatSet([('PTS', AVERAGE, 'PTS'), ('MIN', AVERAGE, 'MIN'),
+                       ('FG_PCT', PERCENTAGE, 'FG'),
+                       ('FT_PCT', PERCENTAGE, 'FT'),
+                       ('AST', AVERAGE, 'AST'), ('REB', AVERAGE, 'REB'),
+                       ('STL', AVERAGE, 'STL'), ('BLK', AVERAGE, 'BLK')])
+FULL_STATS = StatSet([('PTS', AVERAGE, 'PTS'), ('MIN', AVERAGE, 'MIN'),
+                      ('FG_PCT', PERCENTAGE, 'FG'),
+                      ('FG3_PCT', PERCENTAGE, 'FG3'),
+                      ('FT_PCT', PERCENTAGE, 'FT'),
+                      ('AST', AVERAGE, 'AST'), ('REB', AVERAGE, 'REB'),
+                      ('STL', AVERAGE, 'STL'), ('BLK', AVERAGE, 'BLK'),
+                      ('TOV', AVERAGE, 'TOV'), ('PTS_TOTAL', TOTAL, 'PTS'),
+                      ('PTS_36', PER_36, 'PTS'), ('REB_36', PER_36, 'REB'),
+                      ('AST_36', PER_36, 'AST')])
+
+
+def column_matrix(df: DataFrame, columns: Sequence[str]) -> np.ndarray:
+    """Returns the given columns of df as one float array. Stacking the
+    columns avoids the much slower df[columns] block copy.
+    """
+    if len(df) == 0:
+        return np.zeros((0, len(columns)))
+    return np.column_stack([df[column].to_numpy(dtype=float)
+                            for column in columns])
+
+
+def aggregate(df: DataFrame, stat_set: StatSet = BASIC_STATS) -> np.ndarray:
+    """Returns the stats in stat_set over every game in df."""
+    values = column_matrix(df, stat_set.columns)
+    return stat_set.compute(values.sum(axis=0)[np.newaxis, :],
+                            np.array([float(len(df))]))[0]
+
+
+def aggregate_by(df: DataFrame, key: str,
+                 stat_set: StatSet = BASIC_STATS) -> Tuple[np.ndarray,
+                                                           np.ndarray,
+                                                           np.ndarray]:
+    """Groups the games in df by the key column (e.g. 'PLAYER_ID') and returns
+    the keys, how many games each played and a row of stats for each.
+    """
+    codes, keys = factorize(df[key])
+    values = column_matrix(df, stat_set.columns)
+    # Sorting by group lets reduceat sum every group's rows in one call.
+    order = np.argsort(codes, kind='stable')
+    games = np.bincount(codes, minlength=len(keys)).astype(float)
+    starts = np.concatenate(([0], np.cumsum(games)[:-1])).astype(int)
+    sums = np.add.reduceat(values[order], starts, axis=0) if len(df) else \
+        np.zeros((0, len(stat_set.columns)))
+    return np.asarray(keys), games, stat_set.compute(sums, games)
+
+
+def aggregate_logs(logs: Sequence[DataFrame],
+                   stat_set: StatSet = BASIC_STATS) -> Tuple[np.ndarray,
+                                                             np.ndarray]:
+    """Returns how many games each log in logs covers and a row of stats for
+    each, computed together in a single aggregate_by. Empty logs get 0
+    games and NaN stats.
+    """
+    games = np.zeros(len(logs))
+    values = np.full((len(logs), len(stat_set.labels)), np.nan)
+    df = concat([log.assign(LOG=i) for i, log in enumerate(logs)],
+                ignore_index=True)
+    if len(df):
+        keys, log_games, log_values = aggregate_by(df, 'LOG', stat_set)
+        games[keys.astype(int)] = log_games
+        values[keys.astype(int)] = log_values
+    return games, values
+
+
+def format_value(value: float, kind: str) -> str:
+    """Converts a stat of the given kind to the string shown in an embed."""
+    if np.isnan(value):
+        return 'nan'
+    elif kind == PERCENTAGE:
+        return str(round(float(value), 1)) + '%'
+    elif kind == TOTAL:
+        return str(int(value))
+    return str(round(float(value), 1))
+
+
+def format_statistics(values: np.ndarray, games: int,
+                      stat_set: StatSet = BASIC_STATS) -> Dict[str, str]:
+    """Converts a row of stats to the strings shown in an embed, starting
+    with the number of games played.
+    """
+    statistics = {'GP': str(games)}
+    for label, kind, value in zip(stat_set.labels, stat_set.kinds, values):
+        statistics[label] = format_value(value, kind)
+    return statistics
+
+
+def compare_statistics(logs: Sequence[DataFrame],
+                       stat_set: StatSet = BASIC_STATS) -> List[Dict[str,
+                                                                     str]]:
+    """Returns the embed fields for each game log in logs, with the best
+    value of every stat in bold.
+    """
+    games, values = aggregate_logs(logs, stat_set)
+    best = np.where(np.isnan(values), -np.inf, values).max(axis=0)
+    statistics = []
+    for log_games, row in zip(games, values):
+        fields = format_statistics(row, int(log_games), stat_set)
+        for label, value, top in zip(stat_set.labels, row, best):
+            if value == top:
+                fields[label] = f'**{fields[label]}**'
+        statistics.append(fields)
+    return statistics
+
+
+def player_statistics(df: DataFrame,
+                      stat_set: StatSet = BASIC_STATS) -> Dict[str, str]:
+    """Returns the embed fields for the games in a player's game log."""
+    return format_statistics(aggregate(df, stat_set), len(df), stat_set)
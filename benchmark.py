@@ -0,0 +1,1473 @@
+"""Offline benchmarks for NBABot. Nothing here touches the network; every
+upstream call is replaced with a stub that sleeps for a fixed latency, or
+sent to a fake stats server on localhost.
+
+Usage: python benchmark.py season --requests 50 --latency 0.2
+
+The commands benchmark replays stats.nba.com responses recorded under
+--fixtures. Record them once with --record on a machine with network
+access; missing fixtures fall back to synthetic defaults, written with
+--synthesize, or on the first run when the directory does not exist. The
+fixtures directory is not checked in.
+"""
+import argparse
+import asyncio
+import bisect
+import contextlib
+import difflib
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import tracemalloc
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+from unittest import mock
+
+import discord
+import numpy as np
+import requests
+from nba_api.stats.endpoints import (boxscoresummaryv2, commonplayerinfo,
+                                     drafthistory, leaguegamelog,
+                                     playergamelog, playoffpicture,
+                                     scoreboardv2)
+from nba_api.stats.library.http import NBAStatsHTTP
+from pandas import DataFrame, concat
+
+import NBABot
+from aggregate import FULL_STATS, aggregate_by, player_statistics
+from cache import DiskCache, GameLogCache, TTLCache
+import draft
+from draft import DraftStore, DraftTable
+from embeds import EmbedCache
+import fixtures
+from games import GameStore, SeasonGames, api_date, season_for_date
+from images import ImageCache
+from leaders import Leaderboard
+import live
+from prefetch import Prefetcher
+from registry import Registry
+import shards
+from standings import StandingsService
+from lookup import PlayerIndex
+from metrics import METRICS, Metrics
+from upstream import (CircuitBreaker, CircuitOpenError, Guard, SingleFlight,
+                      TokenBucket, Upstream)
+import warehouse
+
+
+class FakeContext:
+    """Stands in for a discord.py Context and records what was sent."""
+
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def send(self, content=None, embed=None):
+        self.sent.append(embed if embed is not None else content)
+
+
+class StubEndpoint:
+    """Mimics an nba_api endpoint that takes latency seconds to respond."""
+
+    def __init__(self, frames: List[DataFrame], latency: float) -> None:
+        time.sleep(latency)
+        self._frames = frames
+
+    def get_data_frames(self) -> List[DataFrame]:
+        return self._frames
+
+
+class StubResponse:
+    text = '<html><head><meta property="og:image" ' \
+           'content="https://example.com/player.png"></head><body>' + \
+           'x' * 100000 + '</body></html>'
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def iter_content(self, chunk_size: int = 1):
+        content = self.text.encode()
+        for i in range(0, len(content), chunk_size):
+            yield content[i:i + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+class InlineUpstream:
+    """Runs calls directly on the event loop, like the bot used to."""
+
+    async def call(self, func: Callable, *args, timeout=None, **kwargs):
+        return func(*args, **kwargs)
+
+
+def sample_game_log(games: int = 70) -> DataFrame:
+    """Returns a player game log shaped like PlayerGameLog's first frame."""
+    return DataFrame({
+        'SEASON_ID': ['22019'] * games,
+        'Game_ID': [str(21900001 + i) for i in range(games)],
+        'GAME_DATE': ['MAR 10, 2020'] * games,
+        'MATCHUP': ['LAL vs. MIL'] * games,
+        'MIN': [35] * games, 'PTS': [25] * games, 'AST': [10] * games,
+        'REB': [8] * games, 'STL': [1] * games, 'BLK': [1] * games,
+        'FGM': [10] * games, 'FGA': [20] * games, 'FTM': [4] * games,
+        'FTA': [5] * games, 'FG3M': [2] * games, 'FG3A': [6] * games,
+        'OREB': [1] * games, 'DREB': [7] * games, 'TOV': [4] * games,
+        'PF': [2] * games, 'PLUS_MINUS': [5] * games})
+
+
+def sample_league_game_log(games: int = 1230,
+                           games_per_day: int = 8) -> DataFrame:
+    """Returns a league game log shaped like LeagueGameLog's first frame,
+    with two rows (home and away) per game, most recent first.
+    """
+    team_ids = [team.id for team in NBABot.LOOKUPS.teams]
+    abbreviations = [team.abbreviation for team in NBABot.LOOKUPS.teams]
+    rows = {'SEASON_ID': [], 'TEAM_ID': [], 'TEAM_ABBREVIATION': [],
+            'TEAM_NAME': [], 'GAME_ID': [], 'GAME_DATE': [], 'MATCHUP': [],
+            'WL': [], 'PTS': []}
+    for game in range(games):
+        day = game // games_per_day
+        date = f'2020-{1 + day // 28:02d}-{1 + day % 28:02d}'
+        home, away = game % 30, (game * 7 + 1 + game // 30) % 30
+        if home == away:
+            away = (away + 1) % 30
+        for team, opponent, separator, pts in ((home, away, ' vs. ', 110),
+                                               (away, home, ' @ ', 100)):
+            rows['SEASON_ID'].append('22019')
+            rows['TEAM_ID'].append(team_ids[team])
+            rows['TEAM_ABBREVIATION'].append(abbreviations[team])
+            rows['TEAM_NAME'].append(NBABot.LOOKUPS.teams[team].full_name)
+            rows['GAME_ID'].append(f'{21900001 + game:010d}')
+            rows['GAME_DATE'].append(date)
+            rows['MATCHUP'].append(abbreviations[team] + separator +
+                                   abbreviations[opponent])
+            rows['WL'].append('W' if pts > 100 else 'L')
+            rows['PTS'].append(pts + game % 7)
+    return DataFrame(rows).iloc[::-1].reset_index(drop=True)
+
+
+def sample_player_info() -> DataFrame:
+    return DataFrame({'TEAM_ABBREVIATION': ['LAL'], 'TEAM_CITY': ['Los Angeles'],
+                      'TEAM_NAME': ['Lakers']})
+
+
+def sample_draft_history(first_year: int = 1947,
+                          last_year: int = 2019) -> DataFrame:
+    """Returns a DraftHistory data frame with two rounds of 30 picks a
+    year, most recent first like the API, drafted by the current teams and
+    drafting the players with the lowest ids first.
+    """
+    NBABot.LOOKUPS.load()
+    teams = NBABot.LOOKUPS.teams
+    players = sorted(NBABot.LOOKUPS.players, key=lambda player: player.id)
+    rows = []
+    for year in range(first_year, last_year + 1):
+        for pick in range(1, 61):
+            nba_team = teams[(pick - 1 + year) % len(teams)]
+            nba_player = players[((year - first_year) * 60 + pick - 1) %
+                                 len(players)]
+            rows.append({'PERSON_ID': nba_player.id,
+                         'PLAYER_NAME': nba_player.full_name,
+                         'SEASON': str(year),
+                         'ROUND_NUMBER': (pick - 1) // 30 + 1,
+                         'ROUND_PICK': (pick - 1) % 30 + 1,
+                         'OVERALL_PICK': pick, 'DRAFT_TYPE': 'Draft',
+                         'TEAM_ID': nba_team.id, 'TEAM_CITY': nba_team.city,
+                         'TEAM_NAME': nba_team.nickname,
+                         'TEAM_ABBREVIATION': nba_team.abbreviation,
+                         'ORGANIZATION': '', 'ORGANIZATION_TYPE': ''})
+    return DataFrame(rows[::-1])
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def report(name: str, latencies: List[float], wall: float,
+           extra: Dict[str, str] = None) -> None:
+    line = f'{name}: n={len(latencies)} wall={wall:.3f}s ' \
+           f'p50={percentile(latencies, 0.5) * 1000:.1f}ms ' \
+           f'p95={percentile(latencies, 0.95) * 1000:.1f}ms ' \
+           f'max={max(latencies) * 1000:.1f}ms'
+    for key in extra or {}:
+        line += f' {key}={extra[key]}'
+    print(line)
+
+
+async def _loop_lag(stop: asyncio.Event, lags: List[float]) -> None:
+    """Measures how late a 10ms sleep wakes up, i.e. how long the loop (and
+    with it, discord.py's heartbeat) was blocked.
+    """
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - start - 0.01)
+
+
+async def _run_season(requests: int, upstream) -> None:
+    stop, lags = asyncio.Event(), [0.0]
+    lag_task = asyncio.ensure_future(_loop_lag(stop, lags))
+
+    async def one() -> float:
+        start = time.perf_counter()
+        await NBABot.season.callback(FakeContext(), 'lebron', 'james')
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*[one() for _ in range(requests)])
+    wall = time.perf_counter() - start
+    stop.set()
+    await lag_task
+    report(type(upstream).__name__, list(latencies), wall,
+           {'max_loop_lag': f'{max(lags) * 1000:.1f}ms',
+            'coalesced': str(NBABot.QUERIES.coalesced)})
+
+
+async def _no_coalescing(key, func, *args, **kwargs):
+    return await func(*args, **kwargs)
+
+
+def bench_season(requests: int, latency: float, workers: int,
+                 concurrency: int, inline: bool, coalesce: bool) -> None:
+    """Runs requests concurrent #season invocations against stubbed
+    upstream endpoints that each take latency seconds. Unless coalesce is
+    set, every invocation gets its own upstream fetch. The stubs are not
+    rate limited.
+    """
+    log, info = sample_game_log(), sample_player_info()
+    upstream = InlineUpstream() if inline else \
+        Upstream(max_workers=workers, max_concurrent=concurrency)
+    with mock.patch.object(playergamelog, 'PlayerGameLog',
+                           lambda **kwargs: StubEndpoint([log], latency)), \
+            mock.patch.object(commonplayerinfo, 'CommonPlayerInfo',
+                              lambda **kwargs: StubEndpoint([info], latency)), \
+            mock.patch.object(NBABot.IMAGE_CACHE.session, 'get',
+                              lambda *args, **kwargs: (time.sleep(latency),
+                                                       StubResponse())[1]), \
+            mock.patch.object(NBABot, 'IMAGE_CACHE', ImageCache(None)), \
+            mock.patch.object(NBABot, 'QUERIES', SingleFlight()), \
+            mock.patch.object(NBABot, 'UPSTREAM', upstream), \
+            mock.patch.object(NBABot.GUARD, 'bucket', TokenBucket(1e9)), \
+            mock.patch.object(NBABot, 'GAME_LOG_CACHE',
+                              GameLogCache(TTLCache(maxsize=0),
+                                           DiskCache(None))):
+        # on_ready builds the lookup tables off the loop before any command.
+        NBABot.LOOKUPS.load()
+        if not coalesce:
+            NBABot.QUERIES.do = _no_coalescing
+        asyncio.run(_run_season(requests, upstream))
+
+
+def linear_find_player(first_name: str, last_name: str, lst: list):
+    """The linear scan find_player used before the name index."""
+    nba_player = None
+    for active_player in lst:
+        if active_player.first_name.lower() == first_name and \
+                active_player.last_name.lower() == last_name:
+            nba_player = active_player
+    return nba_player
+
+
+def linear_find_team(name: str) -> dict:
+    """The list comprehension team_finder used before the name index."""
+    return [team for team in NBABot.LOOKUPS.teams if (
+        team.full_name.lower() == name or team.abbreviation == name or
+        team.nickname == name or team.city == name)][0]
+
+
+def bench_names(number: int) -> None:
+    """Compares the precomputed name indexes with the linear scans."""
+    cases = {
+        'linear find_player': lambda: linear_find_player(
+            'lebron', 'james', NBABot.LOOKUPS.players),
+        'index find_player': lambda: NBABot.find_player(
+            'lebron', 'james', NBABot.LOOKUPS.player_index),
+        'linear team_finder': lambda: linear_find_team('miami heat'),
+        'index team_finder': lambda: NBABot.LOOKUPS.team_index.find('miami heat'),
+        'trigram fuzzy search': lambda: NBABot.LOOKUPS.player_index.search(
+            'giannis antetokounpo'),
+        'difflib fuzzy sweep': lambda: difflib.get_close_matches(
+            'giannis antetokounpo', NBABot.LOOKUPS.player_index.fuzzy.names, n=5),
+    }
+    for name in cases:
+        total = timeit.timeit(cases[name], number=number)
+        print(f'{name}: {total / number * 1e6:.2f}us per lookup')
+
+    start = time.perf_counter()
+    PlayerIndex(NBABot.LOOKUPS.players)
+    print(f'PlayerIndex build: {(time.perf_counter() - start) * 1000:.1f}ms '
+          f'for {len(NBABot.LOOKUPS.players)} players')
+
+
+def legacy_games_on(game_df: DataFrame, date: str) -> Dict[str, str]:
+    """The row-by-row pairing get_games used before pair_games."""
+    selected = game_df[game_df['GAME_DATE'] == date]
+    game_ids = []
+    fields = {}
+    for i in range(len(selected)):
+        row = selected.iloc[i, :]
+        if row['GAME_ID'] not in game_ids:
+            game_ids.append(row['GAME_ID'])
+            game = game_df[game_df['GAME_ID'] == row['GAME_ID']]
+            second = game.iloc[0, :]
+            if row.TEAM_ID == second.TEAM_ID:
+                second = game.iloc[1, :]
+            fields[row['MATCHUP']] = '-'.join([str(row.PTS), str(second.PTS)])
+    return fields
+
+
+def bench_pairing(games: int) -> None:
+    """Pairs every date of a full season log, first row by row as get_games
+    used to, then with a single grouped pass.
+    """
+    df = sample_league_game_log(games)
+    dates = list(df['GAME_DATE'].unique())
+
+    start = time.perf_counter()
+    for date in dates:
+        legacy_games_on(df, date)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    season_games = SeasonGames(df)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    for date in dates:
+        selected = season_games.games_on(date)
+        dict(zip(selected.MATCHUP_HOME, selected.PTS_HOME))
+    lookups = time.perf_counter() - start
+
+    print(f'{len(df)} rows, {len(dates)} dates')
+    print(f'legacy pairing: {legacy * 1000:.1f}ms total, '
+          f'{legacy / len(dates) * 1000:.2f}ms per date')
+    print(f'SeasonGames build (once): {build * 1000:.1f}ms')
+    print(f'indexed pairing: {lookups * 1000:.1f}ms total, '
+          f'{lookups / len(dates) * 1000:.3f}ms per date')
+
+
+def bench_startup(runs: int, target: float) -> None:
+    """Times a cold import of NBABot (everything that happens before the
+    bot connects) in a fresh interpreter, and the first player lookup after
+    it, against a target in seconds.
+    """
+    code = ('import time; start = time.perf_counter(); import NBABot; '
+            'imported = time.perf_counter(); '
+            'NBABot.LOOKUPS.player_index.find(\'lebron\', \'james\'); '
+            'print(imported - start, time.perf_counter() - imported)')
+    imports, lookups = [], []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], check=True,
+                                capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(
+                                    __file__))).stdout
+        imported, looked_up = output.split()
+        imports.append(float(imported))
+        lookups.append(float(looked_up))
+    startup = percentile(imports, 0.5)
+    print(f'import NBABot: p50={startup * 1000:.0f}ms '
+          f'max={max(imports) * 1000:.0f}ms')
+    print(f'first lookup: p50={percentile(lookups, 0.5) * 1000:.0f}ms')
+    print(f'target {target * 1000:.0f}ms: '
+          f'{"met" if startup <= target else "MISSED"}')
+
+
+def legacy_avg_values(df) -> dict:
+    """The per-column loop player statistics were computed with before
+    the aggregation engine.
+    """
+    avg_stats = ['PTS', 'MIN', 'FG_PCT', 'FT_PCT', 'AST', 'REB', 'STL',
+                 'BLK']
+    statistics = {}
+    for stat_name in avg_stats:
+        if stat_name.endswith('PCT'):
+            attempts = stat_name[0:2] + 'A'
+            made = stat_name[0:2] + 'M'
+            percent = df[made].sum() / df[attempts].sum()
+            value = str(round(percent * 100, 1)) + '%'
+        else:
+            value = str(round(df[stat_name].mean(), 1))
+        statistics[stat_name] = value
+    return statistics
+
+
+def bench_aggregate(games: int, number: int) -> None:
+    """Compares the aggregation engine with the old avg_values on a career
+    length game log, and on a league log of many players at once.
+    """
+    career_log = sample_game_log(games)
+    for name, func in (('legacy avg_values', legacy_avg_values),
+                       ('player_statistics', player_statistics)):
+        total = timeit.timeit(lambda: func(career_log), number=number)
+        print(f'{name} ({games} games): {total / number * 1e6:.0f}us')
+
+    league_log = concat([sample_game_log(70).assign(PLAYER_ID=player_id)
+                         for player_id in range(450)], ignore_index=True)
+    start = time.perf_counter()
+    for _, df in league_log.groupby('PLAYER_ID'):
+        legacy_avg_values(df)
+    print(f'legacy avg_values per player ({len(league_log)} rows): '
+          f'{(time.perf_counter() - start) * 1000:.1f}ms')
+    start = time.perf_counter()
+    aggregate_by(league_log, 'PLAYER_ID', FULL_STATS)
+    print(f'aggregate_by, {len(FULL_STATS.labels)} stats '
+          f'({len(league_log)} rows): '
+          f'{(time.perf_counter() - start) * 1000:.1f}ms')
+
+
+def sample_player_league_log(players: int = 450,
+                             games: int = 70) -> DataFrame:
+    """Returns a player-level league game log like LeagueGameLog's with
+    player_or_team_abbreviation='P'.
+    """
+    return concat([sample_game_log(games).rename(
+        columns={'Game_ID': 'GAME_ID'}).drop(columns='Player_ID',
+                                             errors='ignore').assign(
+        PLAYER_ID=player_id, PLAYER_NAME=f'Player {player_id}')
+        for player_id in range(players)], ignore_index=True)
+
+
+def bench_warehouse(players: int, number: int) -> None:
+    """Ingests a synthetic season into a temporary warehouse and times
+    player-season lookups from it.
+    """
+    df = sample_player_league_log(players)
+    with tempfile.TemporaryDirectory() as directory, \
+            mock.patch.object(warehouse, 'fetch_player_games',
+                              lambda year, season_type: df):
+        store = warehouse.Warehouse(directory)
+        start = time.perf_counter()
+        rows = store.ingest(2019, 'Regular')
+        print(f'ingest {rows} rows: '
+              f'{(time.perf_counter() - start) * 1000:.1f}ms')
+
+        start = time.perf_counter()
+        store.partition(2019, 'Regular')
+        print(f'open partition: {(time.perf_counter() - start) * 1000:.1f}ms')
+
+        total = timeit.timeit(lambda: store.player_log(
+            players // 2, '2019', 'Regular'), number=number)
+        print(f'player season lookup: {total / number * 1000:.3f}ms')
+
+
+def randomize_stats(df: DataFrame, seed: int) -> DataFrame:
+    """Returns df with random box score numbers, so rankings are not ties."""
+    random_state = np.random.RandomState(seed)
+    columns = {column: random_state.randint(0, 12, len(df)) for column in
+               ('AST', 'REB', 'STL', 'BLK', 'FTM', 'FG3M', 'TOV')}
+    columns['FGM'] = random_state.randint(0, 15, len(df))
+    columns['FGA'] = columns['FGM'] + random_state.randint(0, 15, len(df))
+    columns['FTA'] = columns['FTM'] + random_state.randint(0, 4, len(df))
+    columns['FG3A'] = columns['FG3M'] + random_state.randint(0, 6, len(df))
+    columns['PTS'] = 2 * columns['FGM'] + columns['FG3M'] + columns['FTM']
+    columns['MIN'] = random_state.randint(5, 45, len(df))
+    return df.assign(**columns)
+
+
+def bench_leaders(players: int, number: int) -> None:
+    """Times adding one night of games to a leaderboard built from a full
+    season, against recomputing every player's stats and ranking them.
+    """
+    season = randomize_stats(sample_player_league_log(players), 1)
+    night = randomize_stats(season.sample(200, random_state=2), 3).assign(
+        GAME_DATE='2020-07-01')
+
+    start = time.perf_counter()
+    board = Leaderboard()
+    board.update(season)
+    print(f'build from {len(season)} rows: '
+          f'{(time.perf_counter() - start) * 1000:.1f}ms')
+
+    def incremental() -> None:
+        board._seen.difference_update(zip(night['GAME_ID'],
+                                          night['PLAYER_ID']))
+        board.update(night)
+
+    def full() -> None:
+        _, _, values = aggregate_by(concat([season, night]), 'PLAYER_ID',
+                                    board.stat_set)
+        np.argsort(-values, axis=0)[:board.k]
+
+    for name, func in (('incremental update', incremental),
+                       ('full recompute', full)):
+        total = timeit.timeit(func, number=number)
+        print(f'{name} ({len(night)} new rows): '
+              f'{total / number * 1000:.2f}ms')
+    lookup = timeit.timeit(lambda: board.leaders('PTS', 10), number=number)
+    print(f'leaders lookup: {lookup / number * 1e6:.1f}us')
+
+
+class FakeStatsServer(ThreadingHTTPServer):
+    """A local stand-in for stats.nba.com that answers every request with
+    body. Every response takes latency seconds; a throttle fraction of
+    requests get a 429, drawn from a seeded generator, and while down is
+    set every request gets a 503.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: float, throttle: float,
+                 body: str = '{}') -> None:
+        super().__init__(('127.0.0.1', 0), FakeStatsHandler)
+        self.latency = latency
+        self.throttle = throttle
+        self.body = body.encode()
+        self.down = False
+        self.requests = 0
+        self.random = random.Random(0)
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}/'
+
+
+class FakeStatsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        server = self.server
+        server.requests += 1
+        time.sleep(server.latency)
+        # Errors have HTML bodies, as stats.nba.com's do.
+        body = b'<html>Service Unavailable</html>'
+        if server.down:
+            self.send_response(503)
+        elif server.random.random() < server.throttle:
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+        else:
+            self.send_response(200)
+            body = server.body
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def bench_resilience(requests_count: int, latency: float, workers: int,
+                     throttle: float, rate: float) -> None:
+    """Loads the current season's game logs of requests_count players with
+    the bot's load_player_dataframe, through nba_api and a Guard, from a
+    fake stats.nba.com in three phases: throttled, down and recovered. The
+    logs are cached with no time to live, so every load goes to the server
+    and a failed load is answered with the expired log.
+    """
+    log = randomize_stats(sample_game_log(), 0)
+    server = FakeStatsServer(latency, throttle, fixtures.endpoint_body(
+        playergamelog.PlayerGameLog, {'PlayerGameLog': log}))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    guard = Guard(TokenBucket(rate, burst=workers),
+                  CircuitBreaker(threshold=5, cooldown=0.5),
+                  retries=3, backoff_base=0.05, backoff_cap=0.5, deadline=5)
+    game_logs = GameLogCache(TTLCache(), DiskCache(None))
+    NBABot.LOOKUPS.load()
+    nba_players = NBABot.LOOKUPS.active_players[:requests_count]
+    year = str(season_for_date(datetime.now()))
+
+    def query(nba_player) -> str:
+        stale_hits = game_logs.memory.stale_hits
+        try:
+            NBABot.load_player_dataframe(nba_player, year, 'Regular')
+        except CircuitOpenError:
+            return 'rejected'
+        except requests.RequestException:
+            return 'failed'
+        return 'stale' if game_logs.memory.stale_hits > stale_hits \
+            else 'fresh'
+
+    async def phase(name: str) -> None:
+        upstream = Upstream(max_workers=workers, max_concurrent=workers)
+        before = dict(guard.stats(), requests=server.requests)
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*(upstream.call(query, nba_player)
+                                          for nba_player in nba_players))
+        wall = time.perf_counter() - start
+        upstream.shutdown()
+        after = dict(guard.stats(), requests=server.requests)
+        counts = {outcome: outcomes.count(outcome)
+                  for outcome in sorted(set(outcomes))}
+        print(f'{name}: {wall:.2f}s, {counts}, server requests '
+              f'{after["requests"] - before["requests"]}, retried '
+              f'{after["retried"] - before["retried"]}, rejected '
+              f'{after["rejected"] - before["rejected"]}, circuit '
+              f'{after["circuit"]}')
+
+    async def run() -> None:
+        await phase(f'{throttle:.0%} throttled')
+        server.down = True
+        await phase('down')
+        server.down = False
+        await asyncio.sleep(guard.breaker.cooldown)
+        # The half-open circuit lets a single trial request through. It is
+        # not throttled, so the recovered phase always starts closed.
+        server.throttle, throttle_rate = 0.0, server.throttle
+        print(f'trial after cooldown: {query(nba_players[0])}')
+        server.throttle = throttle_rate
+        await phase('recovered')
+
+    try:
+        with mock.patch.object(NBAStatsHTTP, 'base_url',
+                               server.url + '{endpoint}'), \
+                mock.patch.object(NBAStatsHTTP, '_session',
+                                  requests.Session()), \
+                mock.patch.object(NBABot, 'GUARD', guard), \
+                mock.patch.object(NBABot, 'GAME_LOG_CACHE', game_logs), \
+                mock.patch.object(NBABot, 'WAREHOUSE',
+                                  warehouse.Warehouse(None)), \
+                mock.patch('cache.CURRENT_SEASON_TTL', 0):
+            asyncio.run(run())
+    finally:
+        server.shutdown()
+    print(f'circuit opened {guard.breaker.opens} time(s); '
+          f'stale logs served {game_logs.memory.stale_hits}')
+
+
+def bench_metrics(number: int) -> None:
+    """Measures the cost of recording a latency, which is paid by every
+    command and upstream request, and checks the quantile estimates.
+    """
+    metrics = Metrics()
+    observe = timeit.timeit(lambda: metrics.observe(
+        'nba_command_seconds', 0.2, command='season', status='ok'),
+        number=number)
+    print(f'observe: {observe / number * 1e6:.2f}us')
+
+    def timed() -> None:
+        with metrics.timer('nba_command_seconds', command='season',
+                           status='ok'):
+            pass
+
+    timer = timeit.timeit(timed, number=number)
+    print(f'timer: {timer / number * 1e6:.2f}us')
+
+    latencies = np.random.default_rng(0).lognormal(-1.5, 0.8, 10000)
+    metrics = Metrics()
+    for latency in latencies:
+        metrics.observe('nba_upstream_request_seconds', latency,
+                        endpoint='PlayerGameLog', outcome='ok')
+    (_, histogram), = metrics.histograms('nba_upstream_request_seconds')
+    for q in (0.5, 0.95, 0.99):
+        print(f'p{q * 100:g}: estimated {histogram.quantile(q) * 1000:.0f}ms,'
+              f' exact {np.quantile(latencies, q) * 1000:.0f}ms')
+    render = timeit.timeit(metrics.render, number=100)
+    print(f'render: {render / 100 * 1000:.2f}ms')
+
+
+def synthesize_fixtures(directory: str) -> None:
+    """Writes default fixtures for every endpoint the commands use, with
+    typical stats.nba.com response times.
+    """
+    NBABot.LOOKUPS.load()
+    log = randomize_stats(sample_game_log(), 0).assign(Player_ID=2544)
+    info = sample_player_info().assign(PERSON_ID=2544)
+    teams = [team.full_name for team in NBABot.LOOKUPS.teams]
+    east, west = (DataFrame({'RANK': range(1, 16), 'TEAM': half})
+                  for half in (teams[:15], teams[15:]))
+    page = '<html><head><meta property="og:image" ' \
+           'content="https://example.com/player.png"></head>'
+    fixtures.write_defaults(directory, [
+        ('playergamelog', {},
+         fixtures.endpoint_body(playergamelog.PlayerGameLog,
+                                {'PlayerGameLog': log}), 0.25),
+        ('commonplayerinfo', {},
+         fixtures.endpoint_body(commonplayerinfo.CommonPlayerInfo,
+                                {'CommonPlayerInfo': info},
+                                order=['CommonPlayerInfo']), 0.2),
+        ('leaguegamelog', {'PlayerOrTeam': 'T'},
+         fixtures.endpoint_body(leaguegamelog.LeagueGameLog,
+                                {'LeagueGameLog': sample_league_game_log()}),
+         0.6),
+        ('drafthistory', {},
+         fixtures.endpoint_body(drafthistory.DraftHistory,
+                                {'DraftHistory': sample_draft_history()}),
+         1.2),
+        ('playoffpicture', {},
+         fixtures.endpoint_body(playoffpicture.PlayoffPicture,
+                                {'EastConfStandings': east,
+                                 'WestConfStandings': west},
+                                order=['EastConfPlayoffPicture',
+                                       'WestConfPlayoffPicture',
+                                       'EastConfStandings',
+                                       'WestConfStandings']), 0.3),
+        (fixtures.PAGES, {}, page, 0.15)])
+
+
+COMMAND_MIX = {'season': 30, 'career': 20, 'pull': 10, 'get_games': 10,
+               'last': 10, 'draft': 10, 'draftround': 3, 'draftteam': 3,
+               'draftslot': 3, 'standings': 10}
+
+
+def command_workload(requests: int, seed: int = 0) -> List[tuple]:
+    """Returns requests random (command, args) pairs drawn from COMMAND_MIX,
+    with arguments a user could have typed.
+    """
+    rng = random.Random(seed)
+    NBABot.LOOKUPS.load()
+
+    def names(players: list) -> List[List[str]]:
+        return [player.full_name.split() for player in players
+                if len(player.full_name.split()) == 2]
+
+    active, everyone = names(NBABot.LOOKUPS.active_players), \
+        names(NBABot.LOOKUPS.players)
+    arguments = {
+        'season': lambda: rng.choice(active) + [
+            rng.choice(['2019', '2018', '2017']),
+            rng.choice(['Regular', 'Regular', 'Playoffs'])],
+        'career': lambda: rng.choice(everyone) + rng.choice(
+            [[], ['playoffs']]),
+        'pull': lambda: [],
+        'get_games': lambda: [f'2020-{rng.randint(1, 5):02d}-'
+                              f'{rng.randint(1, 28):02d}'],
+        'last': lambda: rng.choice(NBABot.LOOKUPS.teams).full_name.split(),
+        'draft': lambda: [str(rng.randint(2000, 2019)),
+                          str(rng.randint(1, 30))],
+        'draftround': lambda: [str(rng.randint(1990, 2019)),
+                               rng.choice(['1', '2'])],
+        'draftteam': lambda: rng.choice(NBABot.LOOKUPS.teams).nickname.split()
+        + rng.choice([[], [f'{year}-{year + 9}' for year
+                           in (1980, 1990, 2000, 2010)]]),
+        'draftslot': lambda: rng.choice(everyone),
+        'standings': lambda: []}
+    commands = rng.choices(list(COMMAND_MIX), weights=COMMAND_MIX.values(),
+                           k=requests)
+    return [(command, arguments[command]()) for command in commands]
+
+
+async def _run_commands(workload: List[tuple],
+                        clients: int) -> Tuple[Dict[str, List[float]],
+                                               Dict[str, List[str]], float]:
+    latencies = {command: [] for command in COMMAND_MIX}
+    errors = {command: [] for command in COMMAND_MIX}
+    pending = iter(workload)
+
+    async def client() -> None:
+        for command, args in pending:
+            start = time.perf_counter()
+            try:
+                await getattr(NBABot, command).callback(FakeContext(), *args)
+            except Exception as error:
+                errors[command].append(f'{args}: {error!r}')
+            latencies[command].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(clients)])
+    return latencies, errors, time.perf_counter() - start
+
+
+@contextlib.contextmanager
+def replayed_bot(source, upstream: Upstream, cold: bool = False):
+    """Points the bot at source (a fixtures Replayer or Recorder) and
+    upstream, with fresh, memory-only caches and no rate limit.
+    """
+    memory = TTLCache(maxsize=0) if cold else TTLCache()
+    game_store = GameStore(upstream)
+    with mock.patch.object(NBAStatsHTTP, 'send_api_request',
+                           source.send_api_request), \
+            mock.patch.object(NBABot, 'UPSTREAM', upstream), \
+            mock.patch.object(NBABot.GUARD, 'bucket', TokenBucket(1e9)), \
+            mock.patch.object(NBABot.GUARD, 'breaker', CircuitBreaker()), \
+            mock.patch.object(NBABot, 'QUERIES', SingleFlight()), \
+            mock.patch.object(NBABot, 'IMAGE_CACHE',
+                              ImageCache(None, session=source)), \
+            mock.patch.object(NBABot, 'GAME_LOG_CACHE',
+                              GameLogCache(memory, DiskCache(None))), \
+            mock.patch.object(NBABot, 'PLAYER_TEAMS', TTLCache()), \
+            mock.patch.object(NBABot, 'EMBEDS', EmbedCache()), \
+            mock.patch.object(NBABot, 'WAREHOUSE', warehouse.Warehouse(None)), \
+            mock.patch.object(NBABot, 'GAME_STORE', game_store), \
+            mock.patch.object(NBABot, 'PREFETCHER',
+                              Prefetcher(game_store, NBABot.prefetch_player,
+                                         upstream)), \
+            mock.patch.object(NBABot, 'STANDINGS',
+                              StandingsService(upstream)), \
+            mock.patch.object(NBABot, 'DRAFT', DraftStore(None, upstream)):
+        yield
+
+
+def bench_commands(requests_count: int, clients: int, workers: int,
+                   concurrency: int, directory: str, scale: float,
+                   cold: bool, record: bool) -> None:
+    """Drives a random mix of commands through FakeContexts, clients at a
+    time, against replayed (or, with record, live and recorded) upstream
+    responses, and reports latency and throughput per command.
+    """
+    if record:
+        source = fixtures.Recorder(directory)
+        clients = 1
+    else:
+        source = fixtures.Replayer(directory, scale)
+    workload = command_workload(requests_count)
+    upstream = Upstream(max_workers=workers, max_concurrent=concurrency)
+    with replayed_bot(source, upstream, cold):
+        latencies, errors, wall = asyncio.run(_run_commands(workload,
+                                                            clients))
+    upstream.shutdown()
+
+    for command in COMMAND_MIX:
+        if latencies[command]:
+            report(command, latencies[command], wall,
+                   {'p99': f'{percentile(latencies[command], 0.99) * 1000:.1f}ms',
+                    'errors': str(len(errors[command]))})
+        for error in errors[command][:3]:
+            print(f'  {error}')
+    print(f'total: {requests_count} commands in {wall:.2f}s, '
+          f'{requests_count / wall:.1f} commands/s with {clients} clients')
+    for labels, histogram in sorted(
+            METRICS.histograms('nba_upstream_request_seconds'),
+            key=lambda item: item[0]['endpoint']):
+        print(f'upstream {labels["endpoint"]} ({labels["outcome"]}): '
+              f'n={histogram.count} '
+              f'p50={histogram.quantile(0.5) * 1000:.0f}ms '
+              f'p95={histogram.quantile(0.95) * 1000:.0f}ms')
+    if record:
+        print(f'recorded {len(source.recorded)} fixtures in {directory}')
+    else:
+        print(f'fixtures: {source.stats()}')
+
+
+def bench_prefetch(requests_count: int, clients: int, workers: int,
+                   concurrency: int, directory: str, scale: float,
+                   rate: float) -> None:
+    """Replays the night after the last game date of the fixtures season:
+    requests_count #season queries, mostly for players who just played, with
+    and without prefetching their rosters first. Rosters are made up from
+    the active players.
+    """
+    NBABot.LOOKUPS.load()
+    players = [player for player in NBABot.LOOKUPS.active_players
+               if len(player.full_name.split()) == 2]
+    team_ids = [team.id for team in NBABot.LOOKUPS.teams]
+    rosters = {team_id: [player.id for player in players[i::30]]
+               for i, team_id in enumerate(team_ids)}
+    rng = random.Random(0)
+
+    async def run(prefetch: bool) -> None:
+        prefetcher = NBABot.PREFETCHER
+        prefetcher.roster = lambda team_id, year: rosters[team_id]
+        prefetcher.bucket = TokenBucket(rate, burst=concurrency)
+        year = 2019
+        season_games = await NBABot.GAME_STORE.get(year)
+        games = season_games.games_on(season_games.last_date)
+        teams = set(games['TEAM_ID_HOME']) | set(games['TEAM_ID_AWAY'])
+        played_ids = {player_id for team in teams
+                      for player_id in rosters[team]}
+        played = [player for player in players if player.id in played_ids]
+        start = time.perf_counter()
+        if prefetch:
+            await prefetcher.prefetch(year)
+        prefetch_seconds = time.perf_counter() - start
+
+        queries = [(rng.choice(played if rng.random() < 0.8 else players))
+                   .full_name.split() for _ in range(requests_count)]
+        latencies = []
+        pending = iter(queries)
+
+        async def client() -> None:
+            for names in pending:
+                begin = time.perf_counter()
+                await NBABot.season.callback(FakeContext(), *names)
+                latencies.append(time.perf_counter() - begin)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[client() for _ in range(clients)])
+        wall = time.perf_counter() - start
+        memory = NBABot.GAME_LOG_CACHE.stats()['memory']
+        with_prefetch, without = prefetcher.hit_rates(memory['hits'],
+                                                      memory['misses'])
+        report('with prefetch' if prefetch else 'without prefetch',
+               latencies, wall,
+               {'hit_rate': f'{with_prefetch:.0%}',
+                'hit_rate_without_prefetched': f'{without:.0%}',
+                'prefetched': str(prefetcher.players),
+                'prefetch_time': f'{prefetch_seconds:.1f}s'})
+
+    for prefetch in (False, True):
+        upstream = Upstream(max_workers=workers, max_concurrent=concurrency)
+        with replayed_bot(fixtures.Replayer(directory, scale), upstream):
+            asyncio.run(run(prefetch))
+        upstream.shutdown()
+
+
+def bench_embeds(number: int, directory: str) -> None:
+    """Measures repeated #season and #career queries, whose game logs are
+    already cached, with and without the embed cache, and the static help
+    embeds.
+    """
+    NBABot.LOOKUPS.load()
+    queries = [(NBABot.season, ('lebron', 'james', '2019')),
+               (NBABot.career, ('allen', 'iverson')),
+               (NBABot.player, ()), (NBABot.team, ()), (NBABot.teams, ())]
+
+    async def run() -> None:
+        for command, args in queries:
+            await command.callback(FakeContext(), *args)
+            start = time.perf_counter()
+            for _ in range(number):
+                await command.callback(FakeContext(), *args)
+            elapsed = (time.perf_counter() - start) / number
+            print(f'{label} {command.name}: {elapsed * 1e6:.0f}us')
+
+    upstream = InlineUpstream()
+    for label, embeds in (('uncached', EmbedCache(maxsize=0)),
+                          ('cached', EmbedCache())):
+        with replayed_bot(fixtures.Replayer(directory, latency=0), upstream), \
+                mock.patch.object(NBABot, 'EMBEDS', embeds):
+            asyncio.run(run())
+
+
+def bench_compare(number: int, workers: int, concurrency: int,
+                  directory: str, scale: float) -> None:
+    """Compares three players with one #compare and with three #season
+    commands in a row, from cold caches, against replayed response times.
+    """
+    players = [('lebron', 'james', '2019'), ('kevin', 'durant', '2018'),
+               ('stephen', 'curry', '2017')]
+    NBABot.LOOKUPS.load()
+
+    async def sequential() -> None:
+        for args in players:
+            await NBABot.season.callback(FakeContext(), *args)
+
+    async def together() -> None:
+        ctx = FakeContext()
+        await NBABot.compare.callback(ctx, *[word for args in players
+                                             for word in args + (',',)])
+        assert isinstance(ctx.sent[-1], discord.Embed), ctx.sent
+
+    for name, run in (('3 x #season', sequential), ('#compare', together)):
+        latencies = []
+        for _ in range(number):
+            upstream = Upstream(max_workers=workers,
+                                max_concurrent=concurrency)
+            with replayed_bot(fixtures.Replayer(directory, scale), upstream,
+                              cold=True):
+                start = time.perf_counter()
+                asyncio.run(run())
+                latencies.append(time.perf_counter() - start)
+            upstream.shutdown()
+        report(name, latencies, sum(latencies))
+
+
+LIVE_DATE = '2020-03-10'
+# Real seconds each part of a synthetic game takes, as (status, text, period,
+# length), with the game clock running down during the periods.
+LIVE_PHASES = [(live.SCHEDULED, '7:30 pm ET', 0, 600),
+               (live.LIVE, '', 1, 1800), (live.LIVE, 'End of 1st Qtr', 1, 150),
+               (live.LIVE, '', 2, 1800), (live.LIVE, 'Halftime', 2, 900),
+               (live.LIVE, '', 3, 1800), (live.LIVE, 'End of 3rd Qtr', 3, 150),
+               (live.LIVE, '', 4, 1800), (live.FINAL, 'Final', 4, 1800)]
+
+
+def game_timeline(seed: int, step: float = 10.0) -> List[Tuple[float, tuple]]:
+    """Returns a synthetic game as (offset, (status, text, period, clock,
+    home_pts, away_pts)) every step seconds, with about 110 points a side.
+    """
+    rng = random.Random(seed)
+    timeline, offset, home_pts, away_pts = [], 0.0, 0, 0
+    for status, text, period, length in LIVE_PHASES:
+        for elapsed in np.arange(0, length, step):
+            clock = ''
+            if status == live.LIVE and not text:
+                seconds = 720 * (1 - elapsed / length)
+                clock = f'{int(seconds // 60)}:{int(seconds % 60):02d}'
+                home_pts += rng.choice([0] * 12 + [1, 2, 2, 3])
+                away_pts += rng.choice([0] * 12 + [1, 2, 2, 3])
+            timeline.append((offset + elapsed, (status, text or clock, period,
+                                                clock, home_pts, away_pts)))
+        offset += length
+    return timeline
+
+
+def synthesize_live_feed(directory: str, games: int) -> Dict[str, list]:
+    """Writes the scoreboard of LIVE_DATE and the summaries of its games,
+    which start ten minutes apart, as feeds. Every team plays at most once,
+    so games is capped at half the teams. Returns the timeline of each game
+    by id.
+    """
+    NBABot.LOOKUPS.load()
+    teams = NBABot.LOOKUPS.teams
+    games = min(games, len(teams) // 2)
+    timelines = {}
+    for i in range(games):
+        timeline = game_timeline(i)
+        start = 600.0 * i
+        timelines[f'{21900901 + i:010d}'] = \
+            [(0.0, timeline[0][1])] + [(offset + start, state)
+                                       for offset, state in timeline[1:]]
+
+    def frames(states: Dict[str, tuple]) -> Dict[str, DataFrame]:
+        header, line_score = [], []
+        for i, (game_id, state) in enumerate(states.items()):
+            status, text, period, clock, home_pts, away_pts = state
+            home, away = teams[2 * i], teams[2 * i + 1]
+            header.append({'GAME_ID': game_id, 'GAME_STATUS_ID': status,
+                           'GAME_STATUS_TEXT': text, 'LIVE_PERIOD': period,
+                           'LIVE_PC_TIME': clock, 'HOME_TEAM_ID': home.id,
+                           'VISITOR_TEAM_ID': away.id})
+            for nba_team, pts in ((home, home_pts), (away, away_pts)):
+                line_score.append({'GAME_ID': game_id, 'TEAM_ID': nba_team.id,
+                                   'TEAM_ABBREVIATION': nba_team.abbreviation,
+                                   'PTS': pts if status != live.SCHEDULED
+                                   else None})
+        return {'header': DataFrame(header),
+                'line_score': DataFrame(line_score)}
+
+    def state_at(timeline: list, offset: float) -> tuple:
+        i = max(0, bisect.bisect_right([at for at, _ in timeline], offset) - 1)
+        return timeline[i][1]
+
+    offsets = sorted({at for timeline in timelines.values()
+                      for at, _ in timeline})
+    scoreboard = []
+    for offset in offsets:
+        frame = frames({game_id: state_at(timeline, offset)
+                        for game_id, timeline in timelines.items()})
+        scoreboard.append((offset, fixtures.endpoint_body(
+            scoreboardv2.ScoreboardV2, {'GameHeader': frame['header'],
+                                        'LineScore': frame['line_score']})))
+    fixtures.write_feed(directory, 'scoreboardv2',
+                        {'GameDate': api_date(LIVE_DATE)}, scoreboard)
+    for i, (game_id, timeline) in enumerate(timelines.items()):
+        summaries = []
+        for offset, state in timeline:
+            frame = frames({game_id: state})
+            # Each summary describes one game, paired with its own teams.
+            frame['line_score']['TEAM_ID'] = [teams[2 * i].id,
+                                              teams[2 * i + 1].id]
+            frame['line_score']['TEAM_ABBREVIATION'] = [
+                teams[2 * i].abbreviation, teams[2 * i + 1].abbreviation]
+            frame['header'][['HOME_TEAM_ID', 'VISITOR_TEAM_ID']] = \
+                [teams[2 * i].id, teams[2 * i + 1].id]
+            summaries.append((offset, fixtures.endpoint_body(
+                boxscoresummaryv2.BoxScoreSummaryV2,
+                {'GameSummary': frame['header'],
+                 'LineScore': frame['line_score']})))
+        fixtures.write_feed(directory, 'boxscoresummaryv2',
+                            {'GameID': game_id}, summaries)
+    return timelines
+
+
+class FakeMessage:
+    """Stands in for a pinned discord.py Message and records, at every
+    edit, the replay offset and the scores it showed.
+    """
+
+    def __init__(self, tracker: live.LiveTracker, replayer) -> None:
+        self.tracker = tracker
+        self.replayer = replayer
+        self.edits = []
+
+    async def edit(self, embed=None) -> None:
+        self.edits.append((self.replayer.offset(),
+                           {game_id: game.home_pts + game.away_pts
+                            for game_id, game in self.tracker.games.items()}))
+
+    async def pin(self) -> None:
+        pass
+
+
+class FakeChannel:
+    def __init__(self, id: int, tracker: live.LiveTracker, replayer) -> None:
+        self.id = id
+        self.message = FakeMessage(tracker, replayer)
+
+    async def send(self, content=None, embed=None) -> FakeMessage:
+        return self.message
+
+
+def score_delays(timelines: Dict[str, list],
+                 edits: List[Tuple[float, Dict[str, int]]]) -> List[float]:
+    """Returns how many seconds of game time passed between each change of
+    a score in timelines and the first edit that showed it.
+    """
+    delays = []
+    for game_id, timeline in timelines.items():
+        shown = 0
+        for offset, state in timeline:
+            total = state[4] + state[5]
+            if total <= shown:
+                continue
+            shown = total
+            for at, totals in edits:
+                if at >= offset and totals.get(game_id, 0) >= total:
+                    delays.append(at - offset)
+                    break
+    return delays
+
+
+def bench_live(users: int, channels: int, games: int, speed: float,
+               workers: int, concurrency: int, directory: str) -> None:
+    """Replays the scoreboard feed of a synthetic game night speed times
+    faster than real time, with channels pinned score messages and users
+    asking for #live at random moments. Reports the upstream requests, which
+    should not grow with users or channels, and how long a score change
+    takes to reach the pinned messages, with adaptive and with fixed poll
+    intervals.
+    """
+    directory = os.path.join(directory, 'live')
+    timelines = synthesize_live_feed(directory, games)
+    end = max(timeline[-1][0] for timeline in timelines.values())
+
+    async def run(label: str, users: int, intervals: Dict[str, float]) -> None:
+        replayer = fixtures.FeedReplayer(directory, speed)
+        upstream = Upstream(max_workers=workers, max_concurrent=concurrency)
+        tracker = live.LiveTracker(
+            upstream, now=lambda: datetime(2020, 3, 10, 20),
+            **{name: seconds / speed for name, seconds in intervals.items()})
+        with replayed_bot(replayer, upstream), \
+                mock.patch.object(NBABot, 'LIVE', tracker):
+            replayer.started = time.monotonic()
+            pinned = [FakeChannel(i, tracker, replayer)
+                      for i in range(channels)]
+            for channel in pinned:
+                await tracker.subscribe(channel)
+            rng = random.Random(0)
+            moments = sorted(rng.uniform(0, end / speed)
+                             for _ in range(users))
+            latencies = []
+            for moment in moments:
+                await asyncio.sleep(max(0.0, moment -
+                                        replayer.offset() / speed))
+                start = time.perf_counter()
+                await NBABot.live.callback(FakeContext())
+                latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(max(0.0, (end - replayer.offset()) / speed +
+                                    intervals['break_interval'] / speed))
+            tracker.stop()
+        upstream.shutdown()
+        stats = tracker.stats()
+        delays = score_delays(timelines, pinned[0].message.edits)
+        report(label, latencies or [0.0], end / speed,
+               {'scoreboard_polls': str(stats['scoreboard_polls']),
+                'game_polls': str(stats['game_polls']),
+                'edits_per_channel': str(stats['edits'] // max(1, channels)),
+                'delay_p50': f'{percentile(delays, 0.5):.0f}s',
+                'delay_p95': f'{percentile(delays, 0.95):.0f}s'})
+
+    adaptive = {'scoreboard_interval': live.LIVE_SCOREBOARD_INTERVAL,
+                'live_interval': live.LIVE_INTERVAL,
+                'clutch_interval': live.LIVE_CLUTCH_INTERVAL,
+                'break_interval': live.LIVE_BREAK_INTERVAL,
+                'edit_interval': live.LIVE_EDIT_INTERVAL}
+    fixed = dict(adaptive, live_interval=live.LIVE_CLUTCH_INTERVAL,
+                 break_interval=live.LIVE_CLUTCH_INTERVAL)
+    for label, count, intervals in (('adaptive, 1 user', 1, adaptive),
+                                    (f'adaptive, {users} users', users,
+                                     adaptive),
+                                    (f'fixed {live.LIVE_CLUTCH_INTERVAL:g}s, '
+                                     f'{users} users', users, fixed)):
+        asyncio.run(run(label, count, intervals))
+
+
+def allocated(build: Callable) -> Tuple[object, int]:
+    """Returns build() and how many bytes it allocated."""
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def bench_draft(number: int, requests_count: int, workers: int,
+                concurrency: int, directory: str, scale: float) -> None:
+    """Times the draft queries against the indexed DraftTable and against
+    boolean masks over the same data frame, and how long the table takes
+    to build and to load from its snapshot. Then runs requests_count #draft
+    commands against replayed responses, which should make one upstream
+    request in total rather than one each.
+    """
+    df = sample_draft_history()
+    start = time.perf_counter()
+    table = DraftTable(df)
+    build = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        path = os.path.join(snapshot_dir, 'draft_history.pickle')
+        draft.save_draft_table(table, path)
+        start = time.perf_counter()
+        draft.load_draft_table(path)
+        load = time.perf_counter() - start
+    print(f'{len(table)} picks: build={build * 1000:.1f}ms '
+          f'snapshot load={load * 1000:.1f}ms')
+
+    rng = random.Random(0)
+    team_ids = df.TEAM_ID.unique().tolist()
+    person_ids = df.PERSON_ID.unique().tolist()
+    frame = table.df
+    cases = {
+        'pick': (lambda: table.pick(rng.randint(1950, 2019),
+                                    rng.randint(1, 60)),
+                 lambda: frame[(frame.SEASON == rng.randint(1950, 2019)) &
+                               (frame.OVERALL_PICK == rng.randint(1, 60))]),
+        'round': (lambda: table.round(rng.randint(1950, 2019),
+                                      rng.randint(1, 2)),
+                  lambda: frame[(frame.SEASON == rng.randint(1950, 2019)) &
+                                (frame.ROUND_NUMBER == rng.randint(1, 2))]),
+        'team decade': (lambda: table.team(rng.choice(team_ids), 2000, 2009),
+                        lambda: frame[(frame.TEAM_ID == rng.choice(team_ids)) &
+                                      frame.SEASON.between(2000, 2009)]),
+        'player slot': (lambda: table.player(rng.choice(person_ids)),
+                        lambda: frame[frame.PERSON_ID ==
+                                      rng.choice(person_ids)]),
+    }
+    for name, (indexed, scan) in cases.items():
+        indexed_time = timeit.timeit(indexed, number=number) / number
+        scan_time = timeit.timeit(scan, number=number) / number
+        print(f'{name}: table={indexed_time * 1e6:.1f}us '
+              f'mask={scan_time * 1e6:.1f}us')
+
+    synthesize_fixtures(directory)
+    replayer = fixtures.Replayer(directory, scale)
+    upstream = Upstream(max_workers=workers, max_concurrent=concurrency)
+    workload = [('draft', [str(rng.randint(1950, 2019)),
+                           str(rng.randint(1, 60))])
+                for _ in range(requests_count)]
+    with replayed_bot(replayer, upstream), \
+            mock.patch.object(draft, 'fetch_draft_history',
+                              wraps=draft.fetch_draft_history) as fetch:
+        latencies, errors, wall = asyncio.run(_run_commands(workload, 10))
+    upstream.shutdown()
+    report('#draft', latencies['draft'], wall,
+           {'errors': str(len(errors['draft'])),
+            'draft_history_requests': str(fetch.call_count)})
+
+
+def bench_registry(number: int) -> None:
+    """Compares the Registry's records with the lists of dicts and the
+    separate color table they replace, in memory and lookup speed.
+    """
+    from nba_api.stats.static import players, teams
+    from team_colors import TEAM_TO_COLORS
+
+    player_list, team_list = players.get_players(), teams.get_teams()
+    # Copies, so both sides allocate their containers and share the strings.
+    dicts, dict_bytes = allocated(lambda: (
+        [dict(nba_player) for nba_player in player_list],
+        [dict(nba_player) for nba_player in player_list
+         if nba_player['is_active']],
+        [dict(nba_team) for nba_team in team_list]))
+    registry, registry_bytes = allocated(lambda: Registry(player_list,
+                                                          team_list))
+    print(f'dicts: {dict_bytes / 1024:.0f}KiB, registry: '
+          f'{registry_bytes / 1024:.0f}KiB for {len(player_list)} players '
+          f'and {len(team_list)} teams')
+
+    all_players, active_players, team_dicts = dicts
+    by_id = {nba_player['id']: nba_player for nba_player in all_players}
+    by_abbreviation = {nba_team['abbreviation']: nba_team
+                       for nba_team in team_dicts}
+    rng = random.Random(0)
+
+    def registry_team(abbreviation: str) -> Tuple[str, int]:
+        nba_team = registry.team_by_abbreviation(abbreviation)
+        return nba_team.full_name, nba_team.color
+
+    cases = {
+        'dict player by id': lambda: by_id[2544]['full_name'],
+        'registry player by id': lambda: registry.player(2544).full_name,
+        'dict team color': lambda: (
+            by_abbreviation['LAL']['full_name'], TEAM_TO_COLORS['LAL']),
+        'registry team color': lambda: registry_team('LAL'),
+        'list random active': lambda: rng.choice(active_players),
+        'registry random active': lambda: registry.random_active(rng),
+    }
+    for name in cases:
+        total = timeit.timeit(cases[name], number=number)
+        print(f'{name}: {total / number * 1e9:.0f}ns')
+
+
+def _shard_process(address, workload: List[tuple], clients: int,
+                   workers: int, concurrency: int, directory: str,
+                   scale: float, barrier, results) -> None:
+    upstream = Upstream(max_workers=workers, max_concurrent=concurrency)
+    with replayed_bot(fixtures.Replayer(directory, scale), upstream):
+        NBABot.share_caches(**shards.connect(address))
+        barrier.wait()
+        latencies, errors, wall = asyncio.run(_run_commands(workload,
+                                                            clients))
+    upstream.shutdown()
+    results.put((sum(map(len, latencies.values())),
+                 sum(map(len, errors.values())), wall))
+
+
+def bench_shards(requests_count: int, guilds: int, shard_count: int,
+                 max_processes: int, clients: int, workers: int,
+                 concurrency: int, directory: str, scale: float) -> None:
+    """Load-tests the sharded deployment: requests_count commands from
+    guilds simulated guilds are routed to the process running their shard,
+    for 1, 2, 4... up to max_processes processes sharing one cache process,
+    and the throughput of each is reported. With --scale 0 the commands are
+    CPU-bound, so throughput should grow with the number of cores.
+    """
+    rng = random.Random(0)
+    guild_ids = [rng.getrandbits(63) for _ in range(guilds)]
+    workload = [(rng.choice(guild_ids), command) for command
+                in command_workload(requests_count)]
+    counts = sorted({min(2 ** i, max_processes)
+                     for i in range(max_processes.bit_length() + 1)})
+    baseline = None
+    for processes in counts:
+        groups = shards.split_shards(list(range(shard_count)), processes)
+        owner = {shard_id: i for i, group in enumerate(groups)
+                 for shard_id in group}
+        parts = [[] for _ in groups]
+        for guild_id, command in workload:
+            parts[owner[shards.shard_for_guild(guild_id,
+                                               shard_count)]].append(command)
+
+        manager = shards.start_cache_process(rate=1e9, pictures_path=None)
+        barrier = multiprocessing.Barrier(len(parts) + 1)
+        results = multiprocessing.Queue()
+        children = [multiprocessing.Process(
+            target=_shard_process,
+            args=(manager.address, part, clients, workers, concurrency,
+                  directory, scale, barrier, results)) for part in parts]
+        for child in children:
+            child.start()
+        barrier.wait()
+        start = time.perf_counter()
+        finished = [results.get() for _ in children]
+        wall = time.perf_counter() - start
+        for child in children:
+            child.join()
+        shared = shards.connect(manager.address)['game_logs'].stats()
+        manager.shutdown()
+
+        throughput = sum(done for done, _, _ in finished) / wall
+        baseline = baseline or throughput
+        print(f'{processes} processes: {requests_count} commands in '
+              f'{wall:.2f}s, {throughput:.1f} commands/s '
+              f'({throughput / baseline:.2f}x), '
+              f'errors={sum(errors for _, errors, _ in finished)}, '
+              f'per process={[len(part) for part in parts]}, '
+              f'shared game logs {shared["hits"]} hits / '
+              f'{shared["misses"]} misses')
+    print(f'{os.cpu_count()} cores available')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('benchmark', choices=['season', 'names', 'pairing',
+                                              'startup', 'aggregate',
+                                              'warehouse', 'leaders',
+                                              'resilience', 'metrics',
+                                              'commands', 'prefetch',
+                                              'embeds', 'compare', 'shards',
+                                              'registry', 'live',
+                                              'draft'])
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--number', type=int, default=1000,
+                        help='iterations for microbenchmarks')
+    parser.add_argument('--games', type=int, default=1230,
+                        help='games in a synthetic season log')
+    parser.add_argument('--players', type=int, default=450,
+                        help='players in a synthetic league log')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='fresh interpreters for the startup benchmark')
+    parser.add_argument('--target', type=float, default=0.75,
+                        help='startup target in seconds')
+    parser.add_argument('--throttle', type=float, default=0.2,
+                        help='fraction of fake server responses that are 429')
+    parser.add_argument('--rate', type=float, default=50,
+                        help='token bucket rate for the resilience benchmark')
+    parser.add_argument('--clients', type=int, default=8,
+                        help='concurrent users for the commands benchmark')
+    parser.add_argument('--fixtures', default=fixtures.FIXTURES_DIR,
+                        help='directory of recorded responses')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiplies the recorded response times')
+    parser.add_argument('--cold', action='store_true',
+                        help='do not cache game logs between commands')
+    parser.add_argument('--record', action='store_true',
+                        help='send the commands to stats.nba.com and '
+                             'record the responses')
+    parser.add_argument('--synthesize', action='store_true',
+                        help='write synthetic default fixtures first')
+    parser.add_argument('--guilds', type=int, default=500,
+                        help='simulated guilds for the shards benchmark')
+    parser.add_argument('--shards', type=int, default=16,
+                        help='shard count for the shards benchmark')
+    parser.add_argument('--processes', type=int,
+                        default=os.cpu_count() or 1,
+                        help='most processes for the shards benchmark')
+    parser.add_argument('--speed', type=float, default=600,
+                        help='how much faster than real time to replay a '
+                             'live game')
+    parser.add_argument('--inline', action='store_true',
+                        help='run upstream calls on the event loop')
+    parser.add_argument('--coalesce', action='store_true',
+                        help='share fetches between identical queries')
+    args = parser.parse_args()
+
+    if args.benchmark == 'season':
+        bench_season(args.requests, args.latency, args.workers,
+                     args.concurrency, args.inline, args.coalesce)
+    elif args.benchmark == 'names':
+        bench_names(args.number)
+    elif args.benchmark == 'pairing':
+        bench_pairing(args.games)
+    elif args.benchmark == 'startup':
+        bench_startup(args.runs, args.target)
+    elif args.benchmark == 'aggregate':
+        bench_aggregate(args.games, args.number)
+    elif args.benchmark == 'warehouse':
+        bench_warehouse(args.players, args.number)
+    elif args.benchmark == 'leaders':
+        bench_leaders(args.players, args.number)
+    elif args.benchmark == 'resilience':
+        bench_resilience(args.requests, args.latency, args.workers,
+                         args.throttle, args.rate)
+    elif args.benchmark == 'metrics':
+        bench_metrics(args.number)
+    elif args.benchmark == 'commands':
+        if args.synthesize or not args.record and \
+                not os.path.isdir(args.fixtures):
+            synthesize_fixtures(args.fixtures)
+        bench_commands(args.requests, args.clients, args.workers,
+                       args.concurrency, args.fixtures, args.scale,
+                       args.cold, args.record)
+    elif args.benchmark == 'prefetch':
+        if args.synthesize or not os.path.isdir(args.fixtures):
+            synthesize_fixtures(args.fixtures)
+        bench_prefetch(args.requests, args.clients, args.workers,
+                       args.concurrency, args.fixtures, args.scale, args.rate)
+    elif args.benchmark == 'compare':
+        if args.synthesize or not os.path.isdir(args.fixtures):
+            synthesize_fixtures(args.fixtures)
+        bench_compare(args.number, args.workers, args.concurrency,
+                      args.fixtures, args.scale)
+    elif args.benchmark == 'embeds':
+        if args.synthesize or not os.path.isdir(args.fixtures):
+            synthesize_fixtures(args.fixtures)
+        bench_embeds(args.number, args.fixtures)
+    elif args.benchmark == 'live':
+        bench_live(args.requests, args.clients, args.games, args.speed,
+                   args.workers, args.concurrency, args.fixtures)
+    elif args.benchmark == 'draft':
+        bench_draft(args.number, args.requests, args.workers,
+                    args.concurrency, args.fixtures, args.scale)
+    elif args.benchmark == 'registry':
+        bench_registry(args.number)
+    elif args.benchmark == 'shards':
+        if args.synthesize or not os.path.isdir(args.fixtures):
+            synthesize_fixtures(args.fixtures)
+        bench_shards(args.requests, args.guilds, args.shards,
+                     args.processes, args.clients, args.workers,
+                     args.concurrency, args.fixtures, args.scale)
+
+
+if __name__ == '__main__':
+    main()
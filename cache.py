@@ -0,0 +1,174 @@
+import importlib.util
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from pandas import DataFrame, read_feather
+
+from games import season_for_date
+
+FOREVER = float('inf')
+CURRENT_SEASON_TTL = float(os.getenv('CURRENT_SEASON_TTL', '300'))
+PLAYER_TEAM_TTL = float(os.getenv('PLAYER_TEAM_TTL', '3600'))
+CACHE_SIZE = int(os.getenv('CACHE_SIZE', '512'))
+CACHE_DIR = os.getenv('CACHE_DIR')
+HAS_FEATHER = importlib.util.find_spec('pyarrow') is not None
+
+
+class TTLCache:
+    """A thread-safe LRU cache where every entry has its own time to live.
+
+    Holds at most maxsize entries; the least recently used entry is evicted
+    first. Entries with a ttl of FOREVER never expire.
+    """
+
+    def __init__(self, maxsize: int = CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        self.stale_hits = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the value stored under key, or None if it is missing or
+        has expired. Expired entries are kept for get_stale until evicted.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """Returns the value stored under key even if it has expired, for
+        when fresh data cannot be fetched.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            self.stale_hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: float = FOREVER) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {'size': len(self._data), 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions,
+                'expirations': self.expirations,
+                'stale_hits': self.stale_hits}
+
+
+class DiskCache:
+    """Stores data frames as Feather files in directory so they survive
+    restarts. Does nothing if directory is None or pyarrow is not installed.
+    """
+
+    def __init__(self, directory: Optional[str] = CACHE_DIR) -> None:
+        self.enabled = directory is not None and HAS_FEATHER
+        self.directory = directory
+        self.hits = self.misses = 0
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: Tuple) -> str:
+        return os.path.join(self.directory,
+                            '_'.join(str(part) for part in key) + '.feather')
+
+    def get(self, key: Tuple) -> Optional[DataFrame]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return read_feather(path)
+
+    def set(self, key: Tuple, df: DataFrame) -> None:
+        if self.enabled:
+            # Write then rename so a crash never leaves a partial file. The
+            # temporary file has a name of its own, so two processes saving
+            # the same key cannot write over each other's.
+            descriptor, temporary = tempfile.mkstemp(suffix='.tmp',
+                                                     dir=self.directory)
+            os.close(descriptor)
+            try:
+                df.reset_index(drop=True).to_feather(temporary)
+                os.replace(temporary, self._path(key))
+            except BaseException:
+                os.remove(temporary)
+                raise
+
+    def stats(self) -> Dict[str, int]:
+        return {'enabled': int(self.enabled), 'hits': self.hits,
+                'misses': self.misses}
+
+
+def game_log_ttl(season: str, active: bool) -> float:
+    """Returns how long a game log for season may be cached. Logs of
+    completed seasons never change; the current season and the career logs
+    of active players change after every game.
+    """
+    if season[:4].isnumeric():
+        completed = int(season[:4]) < season_for_date(datetime.now())
+    else:
+        completed = not active
+    return FOREVER if completed else CURRENT_SEASON_TTL
+
+
+class GameLogCache:
+    """Game logs keyed by (player_id, season, season_type), backed by an
+    in-memory TTLCache and, for logs that never expire, a DiskCache.
+    """
+
+    def __init__(self, memory: TTLCache = None, disk: DiskCache = None) -> None:
+        self.memory = memory if memory is not None else TTLCache()
+        self.disk = disk if disk is not None else DiskCache()
+
+    def get(self, key: Tuple[int, str, str]) -> Optional[DataFrame]:
+        df = self.memory.get(key)
+        if df is None:
+            df = self.disk.get(key)
+            if df is not None:
+                self.memory.set(key, df)
+        return df
+
+    def get_stale(self, key: Tuple[int, str, str]) -> Optional[DataFrame]:
+        """Returns the cached log even if it has expired."""
+        df = self.memory.get_stale(key)
+        return df if df is not None else self.disk.get(key)
+
+    def set(self, key: Tuple[int, str, str], df: DataFrame,
+            ttl: float) -> None:
+        self.memory.set(key, df, ttl)
+        if ttl == FOREVER:
+            self.disk.set(key, df)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {'memory': self.memory.stats(), 'disk': self.disk.stats()}
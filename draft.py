@@ -0,0 +1,185 @@
+import asyncio
+import os
+import pickle
+import sys
+import time
+from typing import Dict, Optional
+
+import numpy as np
+from pandas import DataFrame, Series
+
+from upstream import (GUARD, UPSTREAM, UPSTREAM_TIMEOUT, SingleFlight,
+                      Upstream, fetch_or_stale)
+
+DRAFT_HISTORY = os.getenv('DRAFT_HISTORY', 'draft_history.pickle')
+# A draft is added every June, so a copy older than this is fetched again.
+DRAFT_MAX_AGE = float(os.getenv('DRAFT_MAX_AGE', str(7 * 24 * 3600)))
+DRAFT_VERSION = 1
+
+
+def fetch_draft_history() -> DataFrame:
+    """Returns every pick of every draft, in one DraftHistory request."""
+    from nba_api.stats.endpoints import drafthistory
+
+    return GUARD.fetch(drafthistory.DraftHistory,
+                       timeout=UPSTREAM_TIMEOUT).get_data_frames()[0]
+
+
+class DraftTable:
+    """The draft history sorted by season and overall pick. Each season is
+    a contiguous row range, as is each round within it, and the rows of every
+    team and player are indexed, so a query is a slice or a lookup of row
+    positions.
+    """
+
+    def __init__(self, df: DataFrame) -> None:
+        df = df.astype({'SEASON': int, 'ROUND_NUMBER': int,
+                        'OVERALL_PICK': int, 'TEAM_ID': int,
+                        'PERSON_ID': int})
+        self.df = df.sort_values(['SEASON', 'OVERALL_PICK'],
+                                 kind='mergesort').reset_index(drop=True)
+        self._season_of_row = self.df.SEASON.to_numpy()
+        self._round_of_row = self.df.ROUND_NUMBER.to_numpy()
+        unique, starts, counts = np.unique(self._season_of_row,
+                                           return_index=True,
+                                           return_counts=True)
+        self._seasons = dict(zip(unique.tolist(),
+                                 zip(starts.tolist(), counts.tolist())))
+        self._picks = {pick: row for row, pick in enumerate(zip(
+            self._season_of_row.tolist(), self.df.OVERALL_PICK.tolist()))}
+        self._teams = {team_id: np.asarray(rows) for team_id, rows
+                       in self.df.groupby('TEAM_ID').indices.items()}
+        self._players = {person_id: row for row, person_id
+                         in enumerate(self.df.PERSON_ID.tolist())}
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def pick(self, year: int, pick: int) -> Optional[Series]:
+        """Returns the overall pick number pick of the draft in year, or None
+        if there was no such pick.
+        """
+        row = self._picks.get((year, pick))
+        return None if row is None else self.df.iloc[row]
+
+    def season(self, year: int) -> DataFrame:
+        """Returns every pick of the draft in year, in order."""
+        start, count = self._seasons.get(year, (0, 0))
+        return self.df.iloc[start:start + count]
+
+    def round(self, year: int, round_number: int) -> DataFrame:
+        """Returns the picks of one round of the draft in year, in order."""
+        start, count = self._seasons.get(year, (0, 0))
+        rounds = self._round_of_row[start:start + count]
+        first, last = np.searchsorted(rounds, [round_number,
+                                               round_number + 1])
+        return self.df.iloc[start + first:start + last]
+
+    def team(self, team_id: int, first_year: int,
+             last_year: int) -> DataFrame:
+        """Returns team_id's picks in the drafts from first_year to
+        last_year inclusive, in order. Relocated franchises keep their id.
+        """
+        rows = self._teams.get(team_id, np.empty(0, dtype=np.intp))
+        seasons = self._season_of_row[rows]
+        first, last = np.searchsorted(seasons, [first_year, last_year + 1])
+        return self.df.iloc[rows[first:last]]
+
+    def player(self, person_id: int) -> Optional[Series]:
+        """Returns the pick person_id was drafted with, the latest one if
+        they were drafted more than once, or None if they were not drafted.
+        """
+        row = self._players.get(person_id)
+        return None if row is None else self.df.iloc[row]
+
+    def years(self) -> range:
+        return range(min(self._seasons, default=0),
+                     max(self._seasons, default=-1) + 1)
+
+
+def load_draft_table(path: Optional[str] = DRAFT_HISTORY,
+                     max_age: float = DRAFT_MAX_AGE) -> DraftTable:
+    """Returns the table saved at path, fetching and saving the draft history
+    first if the file is missing, older than max_age seconds or of another
+    version. A stale file is still used when the fetch fails, and a file
+    that cannot be unpickled is treated as missing.
+    """
+    saved = None
+    if path is not None and os.path.exists(path):
+        try:
+            with open(path, 'rb') as file:
+                saved = pickle.load(file)
+        except Exception as error:
+            print(f'Reading {path} failed: {error!r}')
+        if not isinstance(saved, dict) or \
+                saved.get('version') != DRAFT_VERSION:
+            saved = None
+        elif time.time() - os.path.getmtime(path) <= max_age:
+            return saved['table']
+    table, error = fetch_or_stale(
+        lambda: DraftTable(fetch_draft_history()),
+        lambda: saved['table'] if saved is not None else None, 'DraftHistory')
+    if error is None and path is not None:
+        save_draft_table(table, path)
+    return table
+
+
+def save_draft_table(table: DraftTable, path: str = DRAFT_HISTORY) -> None:
+    with open(path + '.tmp', 'wb') as file:
+        pickle.dump({'version': DRAFT_VERSION, 'table': table}, file,
+                    pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
+
+
+class DraftStore:
+    """Holds the DraftTable, loading it at most once. Every query after that
+    is answered from memory.
+    """
+
+    def __init__(self, path: Optional[str] = DRAFT_HISTORY,
+                 upstream: Upstream = UPSTREAM) -> None:
+        self.path = path
+        self.upstream = upstream
+        self._table = None
+        self._loading = SingleFlight()
+        self.queries = 0
+
+    async def get(self) -> DraftTable:
+        """Returns the table. Concurrent callers while it is still loading
+        share a single load.
+        """
+        self.queries += 1
+        if self._table is None:
+            await self._loading.do('draft', self._load)
+        return self._table
+
+    async def _load(self) -> None:
+        self._table = await self.upstream.call(load_draft_table, self.path)
+
+    async def _preload(self) -> None:
+        try:
+            await self._loading.do('draft', self._load)
+        except Exception as error:
+            print(f'Loading the draft history failed: {error!r}')
+
+    def start(self) -> None:
+        """Loads the table in the background, so the first command does not
+        wait for it. A command during the load shares it.
+        """
+        if self._table is None:
+            asyncio.ensure_future(self._preload())
+
+    def stats(self) -> Dict[str, int]:
+        return {'picks': len(self._table) if self._table is not None else 0,
+                'queries': self.queries}
+
+
+if __name__ == '__main__':
+    # Fetches the draft history ahead of a deploy. Imported by name so the
+    # pickle refers to draft.DraftTable rather than __main__.DraftTable.
+    import draft
+
+    path = sys.argv[1] if len(sys.argv) > 1 else draft.DRAFT_HISTORY
+    draft_table = draft.DraftTable(draft.fetch_draft_history())
+    draft.save_draft_table(draft_table, path)
+    print(f'Wrote {len(draft_table)} picks to {path}')
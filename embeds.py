@@ -0,0 +1,69 @@
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, \
+    Tuple
+
+import discord
+
+from cache import TTLCache
+
+EMBED_CACHE_SIZE = int(os.getenv('EMBED_CACHE_SIZE', '1024'))
+
+
+def embed_creator(info: Tuple[str, Optional[str], Any],
+                  thumbnail: Optional[str], image: Optional[str],
+                  dict_fields: Dict[str, str]) -> discord.Embed:
+    """Creates an embed based on the information provided."""
+    embed = discord.Embed(title=info[0], description=info[1], color=info[2])
+
+    if thumbnail is not None:
+        embed.set_thumbnail(url=thumbnail)
+    if image is not None:
+        embed.set_image(url=image)
+    for field in dict_fields:
+        embed.add_field(name=field, value=dict_fields[field])
+    return embed
+
+
+def list_embed(info: Tuple[str, Optional[str], Any], items: List[str],
+               per_field: int = 10) -> discord.Embed:
+    """Creates an embed listing items, per_field to a field."""
+    embed = discord.Embed(title=info[0], description=info[1], color=info[2])
+    for start in range(0, len(items), per_field):
+        embed.add_field(name='_', value='\n'.join(
+            items[start:start + per_field]))
+    return embed
+
+
+class EmbedCache:
+    """Rendered embeds keyed by the resolved query and the version of the
+    data they were rendered from, so a repeated query is a dict lookup and a
+    new version (e.g. new games) is a miss. Entries also expire after the
+    ttl they were stored with, like the data itself.
+
+    Embeds are shared between sends, so they must not be changed after they
+    are cached. Embeds built from degraded data, such as an expired log, are
+    not cached, so the next query builds them again.
+    """
+
+    def __init__(self, maxsize: int = EMBED_CACHE_SIZE) -> None:
+        self._cache = TTLCache(maxsize)
+
+    async def render(self, key: Hashable, version: Hashable, ttl: float,
+                     build: Callable[[], Awaitable[
+                         Tuple[Optional[discord.Embed], bool]]]
+                     ) -> Optional[discord.Embed]:
+        """Returns the embed cached for key and version, or awaits build(),
+        which returns an embed (or None) and whether it is complete, and
+        caches the embed if it is.
+        """
+        # Entries are wrapped in a tuple so that a cached None is a hit.
+        entry = self._cache.get((key, version))
+        if entry is None:
+            embed, complete = await build()
+            entry = (embed,)
+            if complete:
+                self._cache.set((key, version), entry, ttl)
+        return entry[0]
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
@@ -0,0 +1,328 @@
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote, unquote, urlparse
+
+import requests
+from pandas import DataFrame
+
+from metrics import params_hash
+
+FIXTURES_DIR = os.getenv('FIXTURES_DIR', 'fixtures')
+PAGES = 'pages'
+DEFAULT = 'default'
+FEED = 'feed'
+
+
+def result_set(name: str, df: DataFrame) -> dict:
+    """Converts df to one entry of the resultSets list in a stats.nba.com
+    response.
+    """
+    split = json.loads(df.to_json(orient='split', index=False))
+    return {'name': name, 'headers': split['columns'],
+            'rowSet': split['data']}
+
+
+def endpoint_body(endpoint_class, frames: Dict[str, DataFrame],
+                  order: Sequence[str] = ()) -> str:
+    """Returns a stats.nba.com response body for endpoint_class holding
+    frames by data set name. Data sets the endpoint expects but that are not
+    in frames are sent empty. order lists the data sets that come first, as
+    get_data_frames returns them in response order.
+    """
+    names = list(order) + [name for name in endpoint_class.expected_data
+                           if name not in order]
+    return json.dumps({'resultSets': [
+        result_set(name, frames[name]) if name in frames else
+        {'name': name, 'headers': endpoint_class.expected_data[name],
+         'rowSet': []} for name in names]})
+
+
+def default_name(match: Dict[str, str], prefix: str = DEFAULT) -> str:
+    """Returns the file name of a default fixture that answers every request
+    whose parameters include match, e.g. default-PlayerOrTeam=P.json. Values
+    are quoted, as dates have slashes in them.
+    """
+    return '-'.join([prefix] + [f'{key}={quote(str(value), safe="")}'
+                                for key, value
+                                in sorted(match.items())]) + '.json'
+
+
+def best_match(directory: str, prefix: str,
+               parameters: Dict[str, str]) -> Optional[str]:
+    """Returns the path of the file in directory named by default_name
+    with prefix whose match has the most parameters in common with
+    parameters, or None if none matches.
+    """
+    if not os.path.isdir(directory):
+        return None
+    best, best_size = None, -1
+    for name in os.listdir(directory):
+        if not name.startswith(prefix):
+            continue
+        match = dict(map(unquote, part.split('=', 1)) for part in
+                     name[:-len('.json')].split('-')[1:])
+        if len(match) > best_size and all(
+                str(parameters.get(key)) == value
+                for key, value in match.items()):
+            best, best_size = name, len(match)
+    return os.path.join(directory, best) if best else None
+
+
+def write_fixture(path: str, body: str, elapsed: float, url: str = '',
+                  status: int = 200) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump({'url': url, 'status': status, 'elapsed': elapsed,
+                   'body': body}, file)
+
+
+class MissingFixture(LookupError):
+    """Raised when nothing was recorded for a request."""
+
+
+class FixtureResponse:
+    """The parts of a streamed requests.Response that scrape_image uses."""
+
+    def __init__(self, content: bytes, status: int, url: str) -> None:
+        self.content = content
+        self.status_code = status
+        self.url = url
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            response = requests.Response()
+            response.status_code, response.url = self.status_code, self.url
+            raise requests.HTTPError(f'{self.status_code} for {self.url}',
+                                     response=response)
+
+    def iter_content(self, chunk_size: int = 1) -> Iterator[bytes]:
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def __enter__(self) -> 'FixtureResponse':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+def page_name(url: str) -> str:
+    """Converts 'https://stats.nba.com/player/2544' to 'player_2544.json'."""
+    return urlparse(url).path.strip('/').replace('/', '_') + '.json'
+
+
+class Replayer:
+    """Answers stats.nba.com requests from fixtures recorded under directory,
+    one JSON file per endpoint and parameters hash. Requests nothing was
+    recorded for get the most specific matching default fixture.
+
+    Each response is delayed by its recorded elapsed time times scale, or
+    by latency if that is given. Install it with mock.patch.object on
+    NBAStatsHTTP.send_api_request, and use it as the session of an
+    ImageCache to replay pages.
+    """
+
+    def __init__(self, directory: str = FIXTURES_DIR, scale: float = 1.0,
+                 latency: Optional[float] = None) -> None:
+        self.directory = directory
+        self.scale = scale
+        self.latency = latency
+        self.hits = self.defaults = self.misses = 0
+        self._fixtures = {}
+        self._lock = threading.Lock()
+
+    def _load(self, path: str) -> Optional[dict]:
+        with self._lock:
+            if path not in self._fixtures:
+                fixture = None
+                if os.path.exists(path):
+                    with open(path) as file:
+                        fixture = json.load(file)
+                self._fixtures[path] = fixture
+            return self._fixtures[path]
+
+    def _default(self, endpoint: str,
+                 parameters: Dict[str, str]) -> Optional[dict]:
+        path = best_match(os.path.join(self.directory, endpoint), DEFAULT,
+                          parameters)
+        return self._load(path) if path else None
+
+    def fixture(self, endpoint: str, parameters: Dict[str, str]) -> dict:
+        endpoint = endpoint.lower()
+        fixture = self._load(os.path.join(self.directory, endpoint,
+                                          params_hash(parameters) + '.json'))
+        if fixture is not None:
+            self.hits += 1
+            return fixture
+        fixture = self._default(endpoint, parameters)
+        if fixture is not None:
+            self.defaults += 1
+            return fixture
+        self.misses += 1
+        raise MissingFixture(f'No fixture for {endpoint} {parameters}')
+
+    def _wait(self, fixture: dict) -> None:
+        time.sleep(self.latency if self.latency is not None else
+                   fixture['elapsed'] * self.scale)
+
+    def send_api_request(self, endpoint: str, parameters: Dict[str, str],
+                         **kwargs):
+        from nba_api.stats.library.http import NBAStatsResponse
+
+        fixture = self.fixture(endpoint, parameters)
+        self._wait(fixture)
+        return NBAStatsResponse(response=fixture['body'],
+                                status_code=fixture['status'],
+                                url=fixture['url'])
+
+    def get(self, url: str, **kwargs) -> FixtureResponse:
+        """Replays a page for scrape_image, like requests.Session.get."""
+        fixture = self._load(os.path.join(self.directory, PAGES,
+                                          page_name(url)))
+        if fixture is not None:
+            self.hits += 1
+        else:
+            fixture = self._load(os.path.join(self.directory, PAGES,
+                                              default_name({})))
+            if fixture is None:
+                self.misses += 1
+                return FixtureResponse(b'', 404, url)
+            self.defaults += 1
+        self._wait(fixture)
+        return FixtureResponse(fixture['body'].encode(), fixture['status'],
+                               url)
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'defaults': self.defaults,
+                'misses': self.misses}
+
+
+class Recorder:
+    """Sends requests to stats.nba.com and records every response under
+    directory in the format Replayer reads. Install it the same way.
+    """
+
+    def __init__(self, directory: str = FIXTURES_DIR,
+                 session: Optional[requests.Session] = None) -> None:
+        from nba_api.stats.library.http import NBAStatsHTTP
+
+        self.directory = directory
+        self.session = session if session is not None else requests.Session()
+        self.recorded = []
+        self._send = NBAStatsHTTP.send_api_request
+        self._http = NBAStatsHTTP()
+
+    def send_api_request(self, endpoint: str, parameters: Dict[str, str],
+                         **kwargs):
+        start = time.perf_counter()
+        response = self._send(self._http, endpoint, parameters, **kwargs)
+        path = os.path.join(self.directory, endpoint.lower(),
+                            params_hash(parameters) + '.json')
+        write_fixture(path, response.get_response(),
+                      time.perf_counter() - start, response.get_url())
+        self.recorded.append(path)
+        return response
+
+    def get(self, url: str, **kwargs) -> FixtureResponse:
+        """Fetches a page and records its <head>, which is all
+        scrape_image reads.
+        """
+        kwargs.pop('stream', None)
+        start = time.perf_counter()
+        response = self.session.get(url, **kwargs)
+        text = response.text
+        end = text.find('</head>')
+        text = text[:end + len('</head>')] if end != -1 else text
+        path = os.path.join(self.directory, PAGES, page_name(url))
+        write_fixture(path, text, time.perf_counter() - start, url,
+                      response.status_code)
+        self.recorded.append(path)
+        return FixtureResponse(text.encode(), response.status_code, url)
+
+
+class FeedReplayer(Replayer):
+    """Replays feeds that change over time, such as a scoreboard during a
+    game. A feed is a timeline of responses at offsets in seconds from the
+    start of the replay, and a request gets the latest response at or before
+    the current offset; the replay runs speed times faster than real time.
+    Requests no feed matches are answered like a Replayer would.
+    """
+
+    def __init__(self, directory: str = FIXTURES_DIR, speed: float = 1.0,
+                 latency: float = 0.0) -> None:
+        super().__init__(directory, latency=latency)
+        self.speed = speed
+        self.started = time.monotonic()
+
+    def offset(self) -> float:
+        return (time.monotonic() - self.started) * self.speed
+
+    def fixture(self, endpoint: str, parameters: Dict[str, str]) -> dict:
+        path = best_match(os.path.join(self.directory, endpoint.lower()),
+                          FEED, parameters)
+        if path is None:
+            return super().fixture(endpoint, parameters)
+        feed = self._load(path)
+        i = bisect.bisect_right(feed['offsets'], self.offset())
+        self.hits += 1
+        return {'url': '', 'status': 200, 'elapsed': 0.0,
+                'body': feed['bodies'][max(0, i - 1)]}
+
+
+class FeedRecorder(Recorder):
+    """Records the responses of the endpoints in keys as feeds that a
+    FeedReplayer can replay, one per value of the parameter keys names,
+    e.g. one per GameID. Everything else is recorded like a Recorder does.
+    Feeds are kept in memory until save is called.
+    """
+
+    def __init__(self, keys: Dict[str, str], directory: str = FIXTURES_DIR,
+                 session: Optional[requests.Session] = None) -> None:
+        super().__init__(directory, session)
+        self.keys = keys
+        self.started = time.monotonic()
+        self._feeds = {}
+
+    def send_api_request(self, endpoint: str, parameters: Dict[str, str],
+                         **kwargs):
+        key = self.keys.get(endpoint.lower())
+        if key is None:
+            return super().send_api_request(endpoint, parameters, **kwargs)
+        response = self._send(self._http, endpoint, parameters, **kwargs)
+        feed = self._feeds.setdefault(
+            (endpoint.lower(), key, str(parameters.get(key))), [])
+        feed.append((time.monotonic() - self.started,
+                     response.get_response()))
+        return response
+
+    def save(self) -> None:
+        for (endpoint, key, value), timeline in self._feeds.items():
+            write_feed(self.directory, endpoint, {key: value}, timeline)
+            self.recorded.append(f'{endpoint} {key}={value}')
+
+
+def write_feed(directory: str, endpoint: str, match: Dict[str, str],
+               timeline: List[Tuple[float, str]]) -> None:
+    """Writes a feed of (offset, body) responses, in offset order, that
+    answers every request to endpoint whose parameters include match.
+    """
+    path = os.path.join(directory, endpoint, default_name(match, FEED))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as file:
+        json.dump({'offsets': [offset for offset, _ in timeline],
+                   'bodies': [body for _, body in timeline]}, file)
+    os.replace(path + '.tmp', path)
+
+
+def write_defaults(directory: str,
+                   fixtures: List[Tuple[str, Dict[str, str], str, float]]) -> None:
+    """Writes (endpoint, match, body, elapsed) default fixtures. Pages are
+    written under the endpoint PAGES.
+    """
+    for endpoint, match, body, elapsed in fixtures:
+        write_fixture(os.path.join(directory, endpoint, default_name(match)),
+                      body, elapsed)
@@ -0,0 +1,213 @@
+import asyncio
+import functools
+import os
+from datetime import datetime
+from typing import Dict, Optional
+
+from pandas import DataFrame, concat
+
+from upstream import (GUARD, UPSTREAM, UPSTREAM_TIMEOUT, SingleFlight,
+                      Upstream, fetch_or_stale)
+
+GAME_REFRESH_INTERVAL = float(os.getenv('GAME_REFRESH_INTERVAL', '600'))
+
+
+def season_for_date(date: datetime) -> int:
+    """Returns the starting year of the season date falls in, or of the most
+    recent one in the offseason. A season starts in October, e.g. 2019 for
+    the 2019-20 season.
+    """
+    return date.year if date.month >= 10 else date.year - 1
+
+
+def season_string(year: int) -> str:
+    """Converts the starting year of a season to the nba_api format, e.g.
+    2019 to '2019-20'.
+    """
+    return f'{year}-{str(year + 1)[2:]}'
+
+
+def api_date(date: str) -> str:
+    """Converts a 'YYYY-MM-DD' date to the 'MM/DD/YYYY' format the nba_api
+    date filters expect.
+    """
+    return datetime.strptime(date, '%Y-%m-%d').strftime('%m/%d/%Y')
+
+
+def fetch_season_games(year: int, date_from: Optional[str] = None) -> DataFrame:
+    """Returns the league game log for the season starting in year, with one
+    row per team per game. date_from is an optional 'YYYY-MM-DD' date to
+    only fetch games on or after.
+    """
+    from nba_api.stats.endpoints import leaguegamelog
+
+    return GUARD.fetch(
+        leaguegamelog.LeagueGameLog,
+        season=season_string(year), direction='DESC',
+        date_from_nullable=api_date(date_from) if date_from else '',
+        timeout=UPSTREAM_TIMEOUT).get_data_frames()[0]
+
+
+def pair_games(df: DataFrame) -> DataFrame:
+    """Converts a league game log with one row per team per game into one
+    row per game, with the home team's columns suffixed _HOME and the away
+    team's suffixed _AWAY. Games with only one team's row are left out.
+    """
+    home = df['MATCHUP'].str.contains(' vs. ', regex=False)
+    keys = [key for key in ('SEASON_ID', 'GAME_ID', 'GAME_DATE')
+            if key in df.columns]
+    return df[home].merge(df[~home], on=keys, suffixes=('_HOME', '_AWAY'),
+                          sort=False).reset_index(drop=True)
+
+
+class SeasonGames:
+    """A season's league game log, most recent games first, with row indexes
+    by GAME_DATE, GAME_ID and TEAM_ID built once up front. games holds the
+    same log paired into one home/away row per game, indexed the same way.
+
+    Instances are never modified; extend returns a new one, so readers on
+    the event loop always see a consistent frame and indexes.
+    """
+
+    def __init__(self, df: DataFrame) -> None:
+        self.df = df.sort_values(['GAME_DATE', 'GAME_ID'], ascending=False,
+                                 kind='mergesort').reset_index(drop=True)
+        self._by_date = self.df.groupby('GAME_DATE').indices
+        self._by_game = self.df.groupby('GAME_ID').indices
+        self._by_team = self.df.groupby('TEAM_ID').indices
+        self.last_date = self.df['GAME_DATE'].iloc[0] if len(self.df) else None
+
+        self.games = pair_games(self.df)
+        self._games_by_date = self.games.groupby('GAME_DATE').indices
+        self._game_positions = dict(zip(self.games['GAME_ID'],
+                                        range(len(self.games))))
+
+    def _rows(self, index: Dict, key) -> DataFrame:
+        positions = index.get(key)
+        if positions is None:
+            return self.df.iloc[0:0]
+        return self.df.iloc[positions]
+
+    def on_date(self, date: str) -> DataFrame:
+        """Returns the rows for games played on date ('YYYY-MM-DD')."""
+        return self._rows(self._by_date, date)
+
+    def game(self, game_id: str) -> DataFrame:
+        """Returns both teams' rows for the game with game_id."""
+        return self._rows(self._by_game, game_id)
+
+    def team(self, team_id: int) -> DataFrame:
+        """Returns the rows for every game team_id played, latest first."""
+        return self._rows(self._by_team, team_id)
+
+    def games_on(self, date: str) -> DataFrame:
+        """Returns the paired games played on date ('YYYY-MM-DD')."""
+        positions = self._games_by_date.get(date)
+        if positions is None:
+            return self.games.iloc[0:0]
+        return self.games.iloc[positions]
+
+    def team_games(self, team_id: int) -> DataFrame:
+        """Returns the paired games team_id played, latest first."""
+        game_ids = self.team(team_id)['GAME_ID']
+        return self.games.iloc[[self._game_positions[game_id]
+                                for game_id in game_ids
+                                if game_id in self._game_positions]]
+
+    def extend(self, new_df: DataFrame) -> 'SeasonGames':
+        """Returns a copy with the rows of new_df added. Rows for a game and
+        team that are already present are replaced.
+        """
+        if len(new_df) == 0:
+            return self
+        merged = concat([self.df, new_df], ignore_index=True)
+        return SeasonGames(merged.drop_duplicates(['GAME_ID', 'TEAM_ID'],
+                                                  keep='last'))
+
+
+class GameStore:
+    """Holds one SeasonGames per season, loading each at most once. The
+    current season is refreshed in the background by fetching only the
+    games since its last known date.
+
+    If disk is a DiskCache, every season is also stored there, and loaded
+    from it when the API cannot be reached.
+    """
+
+    def __init__(self, upstream: Upstream = UPSTREAM,
+                 refresh_interval: float = GAME_REFRESH_INTERVAL,
+                 disk=None) -> None:
+        self.upstream = upstream
+        self.refresh_interval = refresh_interval
+        self.disk = disk
+        self._seasons = {}
+        self._loading = SingleFlight()
+        self._refresher = None
+
+    def loaded(self, year: int) -> Optional[SeasonGames]:
+        """Returns the games of the season starting in year if they are
+        loaded, without fetching them.
+        """
+        return self._seasons.get(year)
+
+    async def get(self, year: int) -> SeasonGames:
+        """Returns the games of the season starting in year. Concurrent
+        callers for a season that is still loading share a single fetch.
+        """
+        if year in self._seasons:
+            return self._seasons[year]
+        return await self._loading.do(year, self._load, year)
+
+    async def _load(self, year: int) -> SeasonGames:
+        df, error = await self.upstream.call(
+            fetch_or_stale, functools.partial(fetch_season_games, year),
+            functools.partial(self._stored, year), 'LeagueGameLog')
+        self._seasons[year] = SeasonGames(df)
+        if error is None:
+            await self.upstream.call(self._store, year, self._seasons[year])
+        return self._seasons[year]
+
+    def _stored(self, year: int) -> Optional[DataFrame]:
+        return self.disk.get(('season_games', year)) \
+            if self.disk is not None else None
+
+    def _store(self, year: int, season_games: SeasonGames) -> None:
+        if self.disk is not None:
+            self.disk.set(('season_games', year), season_games.df)
+
+    async def refresh(self, year: int) -> SeasonGames:
+        """Fetches the games on or after the last known date of the season
+        starting in year and adds them to it, or the whole season if none
+        were known.
+        """
+        season_games = self._seasons.get(year)
+        if season_games is None:
+            return await self.get(year)
+        if season_games.last_date is None:
+            # No game had been played when the season was loaded, so there is
+            # no date to fetch from and the whole log is fetched again.
+            df = await self.upstream.call(fetch_season_games, year)
+            self._seasons[year] = SeasonGames(df)
+        else:
+            df = await self.upstream.call(fetch_season_games, year,
+                                          season_games.last_date)
+            self._seasons[year] = season_games.extend(df)
+        if len(df):
+            await self.upstream.call(self._store, year, self._seasons[year])
+        return self._seasons[year]
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            year = season_for_date(datetime.now())
+            if year in self._seasons:
+                try:
+                    await self.refresh(year)
+                except Exception as error:
+                    print(f'Refreshing the {season_string(year)} game log '
+                          f'failed: {error!r}')
+
+    def start(self) -> None:
+        """Starts the background refresh task if it is not already running."""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.ensure_future(self._refresh_forever())
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+import bs4
+import requests
+from requests.adapters import HTTPAdapter
+
+from upstream import (GUARD, UPSTREAM, UPSTREAM_TIMEOUT, UPSTREAM_WORKERS,
+                      CircuitOpenError, Upstream)
+
+IMAGE_CACHE_PATH = os.getenv('IMAGE_CACHE_PATH', 'image_cache.json')
+NO_IMAGE = 'No meta title given'
+# Pages without a picture are scraped again after this many seconds, in case
+# one was added since.
+NO_IMAGE_TTL = float(os.getenv('NO_IMAGE_TTL', str(24 * 3600)))
+
+
+def create_session(pool_size: int = UPSTREAM_WORKERS) -> requests.Session:
+    """Returns a session that keeps up to pool_size connections to each host
+    open, so scraping does not pay for a new TLS handshake every time.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['User-Agent'] = 'Mozilla/5.0 (compatible; NBABot)'
+    return session
+
+
+SESSION = create_session()
+
+
+def scrape_image(session: requests.Session, player_team: str, id: int,
+                 timeout: float = UPSTREAM_TIMEOUT) -> str:
+    """Finds the picture for player/team based on the id by reading the
+    og:image meta tag of its page on the nba website. Only the page's <head>
+    is downloaded and parsed.
+    """
+
+    search_url = 'https://stats.nba.com/' + player_team + '/' + str(id)
+    head = b''
+    with session.get(search_url, stream=True, timeout=timeout) as res:
+        res.raise_for_status()
+        for chunk in res.iter_content(chunk_size=8192):
+            # Only search the new chunk plus enough of the old to catch a
+            # tag split across the two.
+            start = max(0, len(head) - 6)
+            head += chunk
+            end = head.find(b'</head>', start)
+            if end != -1:
+                head = head[:end + 7]
+                break
+
+    soup = bs4.BeautifulSoup(head, 'html.parser')
+    image = soup.find("meta", property="og:image")
+    return image["content"] if image else NO_IMAGE
+
+
+def load_urls(path: str) -> Dict[str, str]:
+    """Returns the urls saved by ImageCache.save at path, if any."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+class ImageCache:
+    """Picture urls by player/team id, kept in a JSON file at path so that
+    they survive restarts. Misses are scraped with scrape_image. Pages that
+    turned out to have no picture are remembered in memory for no_image_ttl
+    seconds.
+    """
+
+    def __init__(self, path: Optional[str] = IMAGE_CACHE_PATH,
+                 session: requests.Session = SESSION,
+                 no_image_ttl: float = NO_IMAGE_TTL) -> None:
+        self.path = path
+        self.session = session
+        self.no_image_ttl = no_image_ttl
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._urls = {}
+        self._no_image = {}
+        self._warmer = None
+        if path is not None:
+            self._urls = load_urls(path)
+
+    def share(self, urls: Dict[str, str], save: bool) -> None:
+        """Replaces the urls with a mapping shared between processes, such
+        as the proxy from shards.connect. Only one process should save it to
+        the file.
+        """
+        self._urls = urls
+        if not save:
+            self.path = None
+
+    def has(self, player_team: str, id: int) -> bool:
+        return f'{player_team}/{id}' in self._urls
+
+    def url(self, player_team: str, id: int, save: bool = True) -> str:
+        """Returns the picture url for player/team id, scraping it if it is
+        not cached yet. Blocks, so call it through the upstream executor.
+        Pictures are optional, so NO_IMAGE is returned when the page has
+        none or cannot be fetched right now.
+        """
+        key = f'{player_team}/{id}'
+        url = self._urls.get(key)
+        if url is not None:
+            self.hits += 1
+            return url
+        if self._no_image.get(key, 0.0) > time.monotonic():
+            self.hits += 1
+            return NO_IMAGE
+
+        self.misses += 1
+        try:
+            url = GUARD.fetch(scrape_image, self.session, player_team, id,
+                              timeout=UPSTREAM_TIMEOUT)
+        except CircuitOpenError:
+            return NO_IMAGE
+        except requests.RequestException as error:
+            print(f'Could not find the picture for {key}: {error!r}')
+            return NO_IMAGE
+        if url == NO_IMAGE:
+            self._no_image[key] = time.monotonic() + self.no_image_ttl
+        else:
+            with self._lock:
+                self._urls[key] = url
+            if save:
+                self.save()
+        return url
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        # Write then rename so a crash never leaves a partial file. The
+        # temporary file has a name of its own, so saves from other
+        # processes cannot replace it, and the lock keeps the threads of
+        # this one from renaming an older copy over a newer one.
+        with self._lock:
+            with tempfile.NamedTemporaryFile(
+                    'w', dir=os.path.dirname(os.path.abspath(self.path)),
+                    suffix='.tmp', delete=False) as file:
+                json.dump(self._urls.copy(), file)
+            os.replace(file.name, self.path)
+
+    async def warm(self, targets: Iterable[Tuple[str, int]],
+                   upstream: Upstream = UPSTREAM) -> None:
+        """Scrapes every (player/team, id) in targets that is not cached yet.
+        Pictures are fetched one at a time so commands keep most of the
+        upstream capacity.
+        """
+        for player_team, id in targets:
+            if self.has(player_team, id):
+                continue
+            try:
+                await upstream.call(self.url, player_team, id, save=False)
+            except Exception as error:
+                print(f'Could not find the picture for {player_team} {id}: '
+                      f'{error!r}')
+        self.save()
+
+    def start_warming(self, targets: Iterable[Tuple[str, int]]) -> None:
+        """Starts warm in the background if it is not already running."""
+        if self._warmer is None or self._warmer.done():
+            self._warmer = asyncio.ensure_future(self.warm(targets))
+
+    def stats(self) -> Dict[str, int]:
+        return {'size': len(self._urls), 'hits': self.hits,
+                'misses': self.misses}
+
+
+if __name__ == '__main__':
+    # Builds the cache file ahead of a deploy.
+    from nba_api.stats.static import players, teams
+
+    cache = ImageCache()
+    asyncio.run(cache.warm(
+        [('player', nba_player['id']) for nba_player in
+         players.get_active_players()] +
+        [('team', nba_team['id']) for nba_team in teams.get_teams()]))
+    print(f"Cached {cache.stats()['size']} pictures in {cache.path}")
@@ -0,0 +1,234 @@
+import asyncio
+import functools
+import os
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+from pandas import DataFrame
+
+from aggregate import (AVERAGE, PER_36, PERCENTAGE, TOTAL, StatSet,
+                       column_matrix)
+from games import GAME_REFRESH_INTERVAL, season_for_date, season_string
+from upstream import UPSTREAM, SingleFlight, Upstream, fetch_or_stale
+from warehouse import Warehouse, fetch_player_games
+
+LEADERS_SIZE = int(os.getenv('LEADERS_SIZE', '10'))
+LEADERS_MIN_GAMES = int(os.getenv('LEADERS_MIN_GAMES', '10'))
+# Attempts over a full season needed to rank in a percentage, prorated by the
+# most games anyone has played so far out of SEASON_GAMES.
+LEADERS_MIN_ATTEMPTS = {
+    'FG_PCT': ('FGA', int(os.getenv('LEADERS_MIN_FGA', '300'))),
+    'FG3_PCT': ('FG3A', int(os.getenv('LEADERS_MIN_FG3A', '82'))),
+    'FT_PCT': ('FTA', int(os.getenv('LEADERS_MIN_FTA', '125')))}
+# Minutes over a full season needed to rank in a per-36 stat, prorated the
+# same way, so a few minutes off the bench do not lead the league.
+LEADERS_MIN_MINUTES = int(os.getenv('LEADERS_MIN_MINUTES', '1000'))
+SEASON_GAMES = 82
+
+# The stats that can be led. Turnovers are left out, since the most
+# turnovers is not an achievement.
+LEADER_STATS = StatSet([('PTS', AVERAGE, 'PTS'), ('MIN', AVERAGE, 'MIN'),
+                        ('FG_PCT', PERCENTAGE, 'FG'),
+                        ('FG3_PCT', PERCENTAGE, 'FG3'),
+                        ('FT_PCT', PERCENTAGE, 'FT'),
+                        ('AST', AVERAGE, 'AST'), ('REB', AVERAGE, 'REB'),
+                        ('STL', AVERAGE, 'STL'), ('BLK', AVERAGE, 'BLK'),
+                        ('PTS_TOTAL', TOTAL, 'PTS'),
+                        ('PTS_36', PER_36, 'PTS'), ('REB_36', PER_36, 'REB'),
+                        ('AST_36', PER_36, 'AST')])
+
+
+class Leaderboard:
+    """Running per-player season totals for the columns of a StatSet, the
+    stats computed from them, and the top k players for every stat.
+
+    update only touches the players that appear in the new rows, and each
+    top-k list is rebuilt from its current members plus those players. A
+    full scan is only needed when one of the current leaders got worse.
+    Players with fewer than min_games games are not ranked, nor are players
+    below the prorated min_attempts of a percentage or the prorated
+    min_minutes of a per-36 stat. Those qualifiers rise as the season goes
+    on, so the stats that have one are always ranked by a full scan.
+    """
+
+    def __init__(self, stat_set: StatSet = LEADER_STATS,
+                 k: int = LEADERS_SIZE, min_games: int = LEADERS_MIN_GAMES,
+                 min_attempts: Dict[str, Tuple[str, int]] = (
+                     LEADERS_MIN_ATTEMPTS),
+                 min_minutes: int = LEADERS_MIN_MINUTES) -> None:
+        self.stat_set = stat_set
+        self.k = k
+        self.min_games = min_games
+        min_attempts = dict(min_attempts)
+        for label, kind in zip(stat_set.labels, stat_set.kinds):
+            if kind == PER_36:
+                min_attempts[label] = ('MIN', min_minutes)
+        self._qualifiers = [(stat_set.labels.index(label),
+                             stat_set.columns.index(column), total)
+                            for label, (column, total) in min_attempts.items()
+                            if label in stat_set.labels]
+        self.player_ids, self.names = [], []
+        self.last_date = None
+        self._rows = {}
+        self._seen = set()
+        self._sums = np.zeros((0, len(stat_set.columns)))
+        self._games = np.zeros(0)
+        self._raw = np.zeros((0, len(stat_set.labels)))
+        self._values = np.zeros((0, len(stat_set.labels)))
+        self._top = [np.zeros(0, dtype=int) for _ in stat_set.labels]
+
+    def _row(self, player_id: int, name: str) -> int:
+        row = self._rows.get(player_id)
+        if row is None:
+            row = self._rows[player_id] = len(self.player_ids)
+            self.player_ids.append(player_id)
+            self.names.append(name)
+        return row
+
+    def update(self, df: DataFrame) -> int:
+        """Adds the rows of a player-level league game log that have not been
+        seen before. Returns how many rows were added.
+        """
+        new = [(game_id, player_id) not in self._seen for game_id, player_id
+               in zip(df['GAME_ID'], df['PLAYER_ID'])]
+        df = df[new]
+        if len(df) == 0:
+            return 0
+        self._seen.update(zip(df['GAME_ID'], df['PLAYER_ID']))
+
+        rows = np.array([self._row(player_id, name) for player_id, name in
+                         zip(df['PLAYER_ID'], df['PLAYER_NAME'])])
+        added = len(self.player_ids) - len(self._games)
+        if added:
+            self._sums = np.vstack([self._sums,
+                                    np.zeros((added, self._sums.shape[1]))])
+            self._games = np.concatenate([self._games, np.zeros(added)])
+            self._raw = np.vstack([self._raw, np.full(
+                (added, self._raw.shape[1]), -np.inf)])
+            self._values = np.vstack([self._values, np.full(
+                (added, self._values.shape[1]), -np.inf)])
+
+        np.add.at(self._sums, rows, column_matrix(df, self.stat_set.columns))
+        np.add.at(self._games, rows, 1)
+        changed = np.unique(rows)
+        previous = self._values[changed]
+        values = self.stat_set.compute(self._sums[changed],
+                                       self._games[changed])
+        values[self._games[changed] < self.min_games] = -np.inf
+        self._raw[changed] = np.nan_to_num(values, nan=-np.inf,
+                                           neginf=-np.inf)
+        self._values[changed] = self._raw[changed]
+        self._refresh_top(changed, previous, self._qualify())
+
+        last_date = df['GAME_DATE'].max()
+        if self.last_date is None or last_date > self.last_date:
+            self.last_date = last_date
+        return len(df)
+
+    def _qualify(self) -> List[int]:
+        """Hides the percentages and per-36 stats of the players below their
+        prorated qualifier. Returns the stats that has applied to.
+        """
+        progress = min(1.0, self._games.max(initial=0) / SEASON_GAMES)
+        for stat, column, total in self._qualifiers:
+            self._values[:, stat] = np.where(
+                self._sums[:, column] >= total * progress,
+                self._raw[:, stat], -np.inf)
+        return [stat for stat, _, _ in self._qualifiers]
+
+    def _refresh_top(self, changed: np.ndarray, previous: np.ndarray,
+                     rescan: List[int]) -> None:
+        for stat in range(len(self._top)):
+            column = self._values[:, stat]
+            top = self._top[stat]
+            worse = np.isin(changed, top) & (column[changed] <
+                                             previous[:, stat])
+            if stat in rescan or worse.any() or len(top) < self.k:
+                candidates = np.arange(len(column))
+            else:
+                candidates = np.union1d(top, changed)
+            best = candidates[np.argsort(-column[candidates],
+                                         kind='stable')[:self.k]]
+            self._top[stat] = best[np.isfinite(column[best])]
+
+    def leaders(self, label: str, count: int) -> List[Tuple[int, str, float]]:
+        """Returns up to count (player_id, name, value) triples for the
+        leaders in the stat called label, best first.
+        """
+        stat = self.stat_set.labels.index(label)
+        return [(self.player_ids[row], self.names[row],
+                 self._values[row, stat]) for row in self._top[stat][:count]]
+
+
+class LeadersService:
+    """One Leaderboard per season, built from the warehouse when the season
+    was ingested and from the API otherwise. The current season is updated
+    in the background with the games since its last known date.
+
+    If disk is a DiskCache, the game logs fetched from the API are also
+    stored there, and loaded from it when the API cannot be reached.
+    """
+
+    def __init__(self, warehouse: Warehouse, upstream: Upstream = UPSTREAM,
+                 refresh_interval: float = GAME_REFRESH_INTERVAL,
+                 disk=None) -> None:
+        self.warehouse = warehouse
+        self.disk = disk
+        self.upstream = upstream
+        self.refresh_interval = refresh_interval
+        self._boards = {}
+        self._loading = SingleFlight()
+        self._refresher = None
+
+    async def get(self, year: int) -> Leaderboard:
+        if year in self._boards:
+            return self._boards[year]
+        return await self._loading.do(year, self._load, year)
+
+    def _build(self, year: int) -> Leaderboard:
+        partition = self.warehouse.partition(year, 'Regular')
+        if partition is not None:
+            df = partition.players()
+        else:
+            key = ('player_games', year, 'Regular')
+            df, error = fetch_or_stale(
+                functools.partial(fetch_player_games, year, 'Regular'),
+                lambda: self.disk.get(key) if self.disk is not None else None,
+                'LeagueGameLog')
+            if error is None and self.disk is not None:
+                self.disk.set(key, df)
+        board = Leaderboard()
+        board.update(df)
+        return board
+
+    async def _load(self, year: int) -> Leaderboard:
+        self._boards[year] = await self.upstream.call(self._build, year)
+        return self._boards[year]
+
+    async def refresh(self, year: int) -> int:
+        """Adds the games since the last known date of the season starting
+        in year. Returns how many player rows were new.
+        """
+        board = await self.get(year)
+        df = await self.upstream.call(fetch_player_games, year, 'Regular',
+                                      board.last_date)
+        # Updating touches only the new rows, so it is cheap enough to run
+        # on the loop, where no command can read the board half updated.
+        return board.update(df)
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            year = season_for_date(datetime.now())
+            if year in self._boards:
+                try:
+                    await self.refresh(year)
+                except Exception as error:
+                    print(f'Refreshing the {season_string(year)} leaders '
+                          f'failed: {error!r}')
+
+    def start(self) -> None:
+        """Starts the background refresh task if it is not already running."""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.ensure_future(self._refresh_forever())
@@ -0,0 +1,335 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import discord
+from pandas import DataFrame, isna
+
+from games import api_date
+from upstream import GUARD, UPSTREAM, UPSTREAM_TIMEOUT, SingleFlight, Upstream
+
+# Seconds between polls of the day's scoreboard, which finds games that
+# started, and of each game that is in progress.
+LIVE_SCOREBOARD_INTERVAL = float(os.getenv('LIVE_SCOREBOARD_INTERVAL', '120'))
+LIVE_INTERVAL = float(os.getenv('LIVE_INTERVAL', '30'))
+LIVE_CLUTCH_INTERVAL = float(os.getenv('LIVE_CLUTCH_INTERVAL', '10'))
+LIVE_BREAK_INTERVAL = float(os.getenv('LIVE_BREAK_INTERVAL', '120'))
+# Discord allows about five edits of a message every five seconds.
+LIVE_EDIT_INTERVAL = float(os.getenv('LIVE_EDIT_INTERVAL', '5'))
+# Games in the last CLUTCH_MINUTES of the fourth quarter or overtime, within
+# CLUTCH_MARGIN points, are polled every LIVE_CLUTCH_INTERVAL.
+CLUTCH_MINUTES, CLUTCH_MARGIN = 5, 8
+# Games that end after midnight still belong to the previous day's slate.
+DAY_STARTS_AT = timedelta(hours=6)
+SCHEDULED, LIVE, FINAL = 1, 2, 3
+
+
+class GameSnapshot(NamedTuple):
+    """The state of one game at one poll. Snapshots compare equal when
+    nothing a viewer can see has changed.
+    """
+    game_id: str
+    status: int
+    status_text: str
+    period: int
+    clock: str
+    home: str
+    away: str
+    home_pts: int
+    away_pts: int
+
+
+def parse_snapshots(header: DataFrame,
+                    line_score: DataFrame) -> Dict[str, GameSnapshot]:
+    """Converts ScoreboardV2's GameHeader and LineScore data sets, or
+    BoxScoreSummaryV2's GameSummary and LineScore, to snapshots by game id.
+    """
+    teams = {(game_id, team_id): (abbreviation, pts)
+             for game_id, team_id, abbreviation, pts in zip(
+                 line_score['GAME_ID'], line_score['TEAM_ID'],
+                 line_score['TEAM_ABBREVIATION'], line_score['PTS'])}
+    snapshots = {}
+    for game_id, status, text, period, clock, home_id, away_id in zip(
+            header['GAME_ID'], header['GAME_STATUS_ID'],
+            header['GAME_STATUS_TEXT'], header['LIVE_PERIOD'],
+            header['LIVE_PC_TIME'], header['HOME_TEAM_ID'],
+            header['VISITOR_TEAM_ID']):
+        home, home_pts = teams.get((game_id, home_id), ('?', None))
+        away, away_pts = teams.get((game_id, away_id), ('?', None))
+        # Games that have not started have no points yet.
+        snapshots[game_id] = GameSnapshot(
+            game_id, int(status), str(text).strip(), int(period or 0),
+            str(clock or '').strip(), home, away,
+            0 if isna(home_pts) else int(home_pts),
+            0 if isna(away_pts) else int(away_pts))
+    return snapshots
+
+
+def game_day(now: datetime) -> str:
+    """Returns the 'YYYY-MM-DD' date of the slate of games being played at
+    now.
+    """
+    return (now - DAY_STARTS_AT).strftime('%Y-%m-%d')
+
+
+def fetch_scoreboard(date: str) -> Dict[str, GameSnapshot]:
+    """Returns a snapshot of every game on date ('YYYY-MM-DD')."""
+    from nba_api.stats.endpoints import scoreboardv2
+
+    scoreboard = GUARD.fetch(scoreboardv2.ScoreboardV2,
+                             game_date=api_date(date),
+                             timeout=UPSTREAM_TIMEOUT)
+    return parse_snapshots(scoreboard.game_header.get_data_frame(),
+                           scoreboard.line_score.get_data_frame())
+
+
+def fetch_game(game_id: str) -> Optional[GameSnapshot]:
+    """Returns a snapshot of the game with game_id, or None if there is no
+    such game.
+    """
+    from nba_api.stats.endpoints import boxscoresummaryv2
+
+    summary = GUARD.fetch(boxscoresummaryv2.BoxScoreSummaryV2,
+                          game_id=game_id, timeout=UPSTREAM_TIMEOUT)
+    return parse_snapshots(summary.game_summary.get_data_frame(),
+                           summary.line_score.get_data_frame()).get(game_id)
+
+
+def changed_games(old: Dict[str, GameSnapshot],
+                  new: Dict[str, GameSnapshot]) -> List[str]:
+    """Returns the ids of the games that differ between two sets of
+    snapshots, including games only one of them has.
+    """
+    return [game_id for game_id in new.keys() | old.keys()
+            if old.get(game_id) != new.get(game_id)]
+
+
+def clock_minutes(clock: str) -> float:
+    """Converts a game clock like '4:32' or '38.2' to minutes left."""
+    minutes, _, seconds = clock.rpartition(':')
+    try:
+        return float(minutes or 0) + float(seconds) / 60
+    except ValueError:
+        return float('inf')
+
+
+def format_status(snapshot: GameSnapshot) -> str:
+    if snapshot.status == LIVE and snapshot.clock:
+        period = f'Q{snapshot.period}' if snapshot.period <= 4 else \
+            f'OT{snapshot.period - 4}'
+        return f'{period} {snapshot.clock}'
+    return snapshot.status_text
+
+
+def scores_embed(date: str, games: Dict[str, GameSnapshot]) -> discord.Embed:
+    """Creates the live scores embed: games in progress first, then the
+    ones still to come, then the finished ones.
+    """
+    embed = discord.Embed(title='Live Scores', description=date,
+                          color=0xC9082A)
+    order = {LIVE: 0, SCHEDULED: 1, FINAL: 2}
+    for snapshot in sorted(games.values(),
+                           key=lambda game: (order.get(game.status, 3),
+                                             game.game_id))[:25]:
+        embed.add_field(name=f'{snapshot.away} {snapshot.away_pts} @ '
+                             f'{snapshot.home} {snapshot.home_pts}',
+                        value=format_status(snapshot))
+    if not games:
+        embed.add_field(name='No games', value='There are no games today.')
+    embed.set_footer(text=f'Updated {datetime.now():%H:%M:%S}')
+    return embed
+
+
+class LiveTracker:
+    """Follows the scores of the day's games and keeps one pinned message per
+    subscribed channel up to date.
+
+    The day's scoreboard is polled every scoreboard_interval seconds, and
+    every game in progress gets a poller of its own that polls faster the
+    closer the game gets (see interval). Whenever a poll changes what a
+    viewer would see, the messages are edited, at most once every
+    edit_interval seconds. Commands read the latest snapshots, so the
+    number of upstream requests does not depend on how many people are
+    watching.
+    """
+
+    def __init__(self, upstream: Upstream = UPSTREAM,
+                 scoreboard: Callable[[str], Dict[str, GameSnapshot]] =
+                 fetch_scoreboard,
+                 game: Callable[[str], Optional[GameSnapshot]] = fetch_game,
+                 scoreboard_interval: float = LIVE_SCOREBOARD_INTERVAL,
+                 live_interval: float = LIVE_INTERVAL,
+                 clutch_interval: float = LIVE_CLUTCH_INTERVAL,
+                 break_interval: float = LIVE_BREAK_INTERVAL,
+                 edit_interval: float = LIVE_EDIT_INTERVAL,
+                 now: Callable[[], datetime] = datetime.now) -> None:
+        self.upstream = upstream
+        self.scoreboard = scoreboard
+        self.game = game
+        self.scoreboard_interval = scoreboard_interval
+        self.live_interval = live_interval
+        self.clutch_interval = clutch_interval
+        self.break_interval = break_interval
+        self.edit_interval = edit_interval
+        self.now = now
+        self.date = None
+        self.games = {}
+        self.scoreboard_polls = self.game_polls = self.failures = 0
+        self.changes = self.edits = 0
+        self._pollers = {}
+        self._messages = {}
+        self._dirty = None
+        self._runners = []
+        self._loading = SingleFlight()
+
+    def interval(self, snapshot: GameSnapshot) -> Optional[float]:
+        """Returns how long to wait before polling a game again, or None once
+        it is over.
+        """
+        if snapshot.status == FINAL:
+            return None
+        if snapshot.status != LIVE or not snapshot.clock:
+            # Not started yet, or between periods.
+            return self.break_interval
+        if snapshot.period >= 4 and \
+                clock_minutes(snapshot.clock) <= CLUTCH_MINUTES and \
+                abs(snapshot.home_pts - snapshot.away_pts) <= CLUTCH_MARGIN:
+            return self.clutch_interval
+        return self.live_interval
+
+    def _get_dirty(self) -> asyncio.Event:
+        # Created lazily so it belongs to the loop the bot is running on.
+        if self._dirty is None:
+            self._dirty = asyncio.Event()
+        return self._dirty
+
+    def _replace(self, games: Dict[str, GameSnapshot]) -> None:
+        changed = changed_games(self.games, games)
+        self.games = games
+        if changed:
+            self.changes += len(changed)
+            self._get_dirty().set()
+
+    def _polling(self, game_id: str) -> bool:
+        poller = self._pollers.get(game_id)
+        return poller is not None and not poller.done()
+
+    async def refresh(self) -> Dict[str, GameSnapshot]:
+        """Polls the day's scoreboard and starts a poller for every game that
+        has started. Games that already have a poller keep its snapshot, as
+        the scoreboard can lag behind the game's own summary.
+        """
+        date = game_day(self.now())
+        self.scoreboard_polls += 1
+        snapshots = await self.upstream.call(self.scoreboard, date)
+        games = {game_id: self.games[game_id] if self._polling(game_id)
+                 and game_id in self.games else snapshot
+                 for game_id, snapshot in snapshots.items()}
+        self.date = date
+        self._replace(games)
+        for game_id, snapshot in games.items():
+            if snapshot.status == LIVE and not self._polling(game_id):
+                self._pollers[game_id] = asyncio.ensure_future(
+                    self._poll(game_id))
+        return self.games
+
+    async def _poll(self, game_id: str) -> None:
+        while True:
+            self.game_polls += 1
+            try:
+                snapshot = await self.upstream.call(self.game, game_id)
+            except Exception as error:
+                self.failures += 1
+                print(f'Polling game {game_id} failed: {error!r}')
+                snapshot = self.games.get(game_id)
+            else:
+                if snapshot is not None and game_id in self.games:
+                    self._replace({**self.games, game_id: snapshot})
+            wait = self.interval(snapshot) if snapshot is not None else None
+            if wait is None:
+                return
+            await asyncio.sleep(wait)
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as error:
+                self.failures += 1
+                print(f'Polling the scoreboard failed: {error!r}')
+            await asyncio.sleep(self.scoreboard_interval)
+
+    def embed(self) -> discord.Embed:
+        return scores_embed(self.date or game_day(self.now()), self.games)
+
+    async def _push_forever(self) -> None:
+        dirty = self._get_dirty()
+        while True:
+            await dirty.wait()
+            dirty.clear()
+            if self._messages:
+                embed = self.embed()
+                for channel_id, message in list(self._messages.items()):
+                    try:
+                        await message.edit(embed=embed)
+                    except discord.NotFound:
+                        self._messages.pop(channel_id, None)
+                    except discord.HTTPException as error:
+                        print(f'Updating the scores in channel {channel_id} '
+                              f'failed: {error!r}')
+                    else:
+                        self.edits += 1
+            await asyncio.sleep(self.edit_interval)
+
+    def start(self) -> None:
+        """Starts polling and pushing if that is not already running."""
+        if not self._runners or any(runner.done()
+                                    for runner in self._runners):
+            for runner in self._runners:
+                runner.cancel()
+            self._runners = [asyncio.ensure_future(self._refresh_forever()),
+                             asyncio.ensure_future(self._push_forever())]
+
+    def stop(self) -> None:
+        for task in self._runners + list(self._pollers.values()):
+            task.cancel()
+        self._runners, self._pollers = [], {}
+
+    async def scores(self) -> discord.Embed:
+        """Returns the live scores embed, starting the tracker first if
+        this is the first time anyone asked.
+        """
+        if self.date is None:
+            await self._loading.do('scoreboard', self.refresh)
+        self.start()
+        return self.embed()
+
+    async def subscribe(self, channel) -> discord.Message:
+        """Posts the live scores in channel and pins them, unless the channel
+        already has them. Returns the message that will be kept up to date.
+        """
+        message = self._messages.get(channel.id)
+        if message is None:
+            message = await channel.send(embed=await self.scores())
+            self._messages[channel.id] = message
+            try:
+                await message.pin()
+            except discord.HTTPException as error:
+                print(f'Could not pin the scores in channel {channel.id}: '
+                      f'{error!r}')
+        return message
+
+    def unsubscribe(self, channel_id: int) -> Optional[discord.Message]:
+        """Stops updating the scores in channel_id and returns their message,
+        or None if the channel was not subscribed.
+        """
+        return self._messages.pop(channel_id, None)
+
+    def stats(self) -> Dict[str, float]:
+        return {'games': len(self.games),
+                'polling': sum(map(self._polling, self._pollers)),
+                'channels': len(self._messages),
+                'scoreboard_polls': self.scoreboard_polls,
+                'game_polls': self.game_polls, 'changes': self.changes,
+                'edits': self.edits, 'failures': self.failures}
@@ -0,0 +1,274 @@
+import bisect
+import heapq
+import os
+import pickle
+import threading
+import unicodedata
+from importlib import metadata
+from typing import Iterable, List, Optional, Set, Tuple
+
+from registry import Player, Registry, Team
+
+SUFFIXES = ('jr', 'sr', 'ii', 'iii', 'iv', 'v')
+# Upper bound on posting entries visited per fuzzy search, which keeps a
+# search well under a millisecond however common the query's trigrams are.
+MAX_POSTINGS = 3000
+LOOKUP_SNAPSHOT = os.getenv('LOOKUP_SNAPSHOT', 'lookup_snapshot.pickle')
+# Bumped whenever the tables change shape, so older snapshots are rebuilt.
+# Snapshots written with another nba_api version are rebuilt as well, since
+# its static player and team lists change between releases.
+SNAPSHOT_VERSION = 2
+
+
+def normalize(name: str) -> str:
+    """Lowercases name and strips accents, periods and extra whitespace, so
+    that 'Luka Dončić' becomes 'luka doncic' and 'Jr.' becomes 'jr'.
+    """
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(char for char in decomposed
+                       if not unicodedata.combining(char))
+    return ' '.join(stripped.lower().replace('.', '').replace(',', '').split())
+
+
+def strip_suffix(name: str) -> str:
+    """Removes a trailing generational suffix from a normalized name."""
+    parts = name.split(' ')
+    if len(parts) > 1 and parts[-1] in SUFFIXES:
+        return ' '.join(parts[:-1])
+    return name
+
+
+def trigrams(name: str) -> Set[str]:
+    """Returns the set of three-character substrings of a normalized name,
+    padded so that the start and end of each word count as well.
+    """
+    padded = '  ' + name + ' '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Inverted index from trigrams to positions in names, used to rank names
+    by similarity to a possibly misspelled query without comparing the query
+    against every name.
+    """
+
+    def __init__(self, names: List[str]) -> None:
+        self.names = names
+        self._sizes = []
+        self._postings = {}
+        for i, name in enumerate(names):
+            grams = trigrams(name)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(i)
+        self._sorted = sorted((name, i) for i, name in enumerate(names))
+
+    def search(self, query: str, limit: int = 5,
+               max_postings: int = MAX_POSTINGS) -> List[Tuple[float, int]]:
+        """Returns up to limit (score, position) pairs for the names most
+        similar to query, best first. The score is the Dice coefficient of
+        the two trigram sets, between 0 and 1.
+        """
+        grams = trigrams(query)
+        counts = {}
+        visited = 0
+        # Rare trigrams first: they discriminate best and cost the least.
+        for gram in sorted(grams, key=lambda g: len(self._postings.get(g, ()))):
+            postings = self._postings.get(gram, ())
+            if counts and visited + len(postings) > max_postings:
+                break
+            visited += len(postings)
+            for i in postings:
+                counts[i] = counts.get(i, 0) + 1
+        scored = [(2 * counts[i] / (len(grams) + self._sizes[i]), i)
+                  for i in counts]
+        return heapq.nlargest(limit, scored)
+
+    def prefix(self, query: str, limit: int = 5) -> List[int]:
+        """Returns the positions of up to limit names starting with query."""
+        start = bisect.bisect_left(self._sorted, (query, -1))
+        found = []
+        for name, i in self._sorted[start:start + limit]:
+            if not name.startswith(query):
+                break
+            found.append(i)
+        return found
+
+
+class PlayerIndex:
+    """Normalized lookup tables over players from the Registry, built once
+    so that finding a player is a dict lookup.
+    """
+
+    def __init__(self, lst: Iterable[Player]) -> None:
+        self.by_id = {}
+        self.by_full_name = {}
+        self.by_first_name = {}
+        self.by_last_name = {}
+        self._players = []
+        fallback = {}
+
+        for nba_player in lst:
+            self.by_id[nba_player.id] = nba_player
+            full_name = normalize(nba_player.first_name + ' ' +
+                                  nba_player.last_name)
+            # Later entries win, as they did in the old linear scan.
+            self.by_full_name[full_name] = nba_player
+            self._players.append((full_name, nba_player))
+            fallback.setdefault(strip_suffix(full_name), nba_player)
+            self.by_first_name.setdefault(
+                normalize(nba_player.first_name), []).append(nba_player)
+            self.by_last_name.setdefault(
+                strip_suffix(normalize(nba_player.last_name)),
+                []).append(nba_player)
+
+        # Lets 'gary trent' find 'Gary Trent Jr.' unless an exact match exists.
+        for name in fallback:
+            self.by_full_name.setdefault(name, fallback[name])
+        self.fuzzy = TrigramIndex([name for name, _ in self._players])
+
+    def find(self, first_name: str, last_name: str) -> Optional[Player]:
+        """Returns the player called first_name last_name, or None."""
+        full_name = normalize(first_name + ' ' + last_name)
+        nba_player = self.by_full_name.get(full_name)
+        if nba_player is None:
+            nba_player = self.by_full_name.get(strip_suffix(full_name))
+        return nba_player
+
+    def search(self, query: str,
+               limit: int = 5) -> List[Tuple[float, Player]]:
+        """Returns up to limit (score, player) pairs for the players whose
+        names best match query, best first. Names that start with query score
+        1.0; the rest are ranked by trigram similarity.
+        """
+        name = normalize(query)
+        ranked = [(1.0, i) for i in self.fuzzy.prefix(name, limit)]
+        seen = {i for _, i in ranked}
+        for score, i in self.fuzzy.search(name, limit):
+            if i not in seen and len(ranked) < limit:
+                ranked.append((score, i))
+        return [(score, self._players[i][1]) for score, i in ranked]
+
+    def with_last_name(self, last_name: str) -> List[Player]:
+        return self.by_last_name.get(strip_suffix(normalize(last_name)), [])
+
+
+class TeamIndex:
+    """Normalized lookup table over teams from the Registry, keyed by full
+    name, abbreviation, nickname and city.
+    """
+
+    def __init__(self, lst: List[Team]) -> None:
+        self.by_id = {}
+        self.by_abbreviation = {}
+        self.by_name = {}
+
+        for nba_team in lst:
+            self.by_id[nba_team.id] = nba_team
+            self.by_abbreviation[nba_team.abbreviation] = nba_team
+            self.by_name[normalize(nba_team.full_name)] = nba_team
+            self.by_name[normalize(nba_team.abbreviation)] = nba_team
+        for nba_team in lst:
+            # Cities can be shared (Los Angeles), so the first team keeps it.
+            self.by_name.setdefault(normalize(nba_team.nickname), nba_team)
+            self.by_name.setdefault(normalize(nba_team.city), nba_team)
+
+    def find(self, name: str) -> Optional[Team]:
+        """Returns the team matching name, or None."""
+        return self.by_name.get(normalize(name))
+
+    def full_name(self, abbreviation: str) -> Optional[str]:
+        nba_team = self.by_abbreviation.get(abbreviation)
+        return nba_team.full_name if nba_team else None
+
+
+class Lookups:
+    """The Registry of the players and teams given by the nba_api and their
+    indexes, built on first use rather than at import. If snapshot names a file
+    written by save with the same nba_api version, the tables are loaded from
+    it instead of being rebuilt.
+    """
+
+    def __init__(self, snapshot: Optional[str] = LOOKUP_SNAPSHOT) -> None:
+        self.snapshot = snapshot
+        self._tables = None
+        self._lock = threading.Lock()
+
+    def load(self) -> dict:
+        """Builds or loads the tables if that has not happened yet. Callers
+        on other threads wait for the first one instead of building too.
+        """
+        if self._tables is None:
+            with self._lock:
+                if self._tables is None:
+                    self._tables = self._load()
+        return self._tables
+
+    def _load(self) -> dict:
+        tables = None
+        if self.snapshot is not None and os.path.exists(self.snapshot):
+            try:
+                with open(self.snapshot, 'rb') as file:
+                    tables = pickle.load(file)
+            except Exception as error:
+                print(f'Reading {self.snapshot} failed: {error!r}')
+        if not isinstance(tables, dict) or \
+                tables.get('version') != SNAPSHOT_VERSION or \
+                tables.get('nba_api') != metadata.version('nba_api'):
+            tables = self._build()
+        return tables
+
+    @staticmethod
+    def _build() -> dict:
+        from nba_api.stats.static import players, teams
+
+        registry = Registry(players.get_players(), teams.get_teams())
+        return {'version': SNAPSHOT_VERSION,
+                'nba_api': metadata.version('nba_api'), 'registry': registry,
+                'active_player_index': PlayerIndex(registry.active_players),
+                'player_index': PlayerIndex(registry.players),
+                'team_index': TeamIndex(registry.teams)}
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Writes the tables to path, or to snapshot if path is None."""
+        path = path or self.snapshot
+        with open(path + '.tmp', 'wb') as file:
+            pickle.dump(self._build(), file, pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+
+    @property
+    def registry(self) -> Registry:
+        return self.load()['registry']
+
+    @property
+    def active_players(self) -> List[Player]:
+        return self.registry.active_players
+
+    @property
+    def players(self) -> List[Player]:
+        return self.registry.players
+
+    @property
+    def teams(self) -> List[Team]:
+        return self.registry.teams
+
+    @property
+    def active_player_index(self) -> PlayerIndex:
+        return self.load()['active_player_index']
+
+    @property
+    def player_index(self) -> PlayerIndex:
+        return self.load()['player_index']
+
+    @property
+    def team_index(self) -> TeamIndex:
+        return self.load()['team_index']
+
+
+if __name__ == '__main__':
+    # Builds the snapshot ahead of a deploy. Imported by name so the pickle
+    # refers to lookup.PlayerIndex rather than __main__.PlayerIndex.
+    import lookup
+
+    lookup.Lookups().save()
+    print(f'Wrote {lookup.LOOKUP_SNAPSHOT}')
@@ -0,0 +1,212 @@
+import bisect
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+METRICS_PORT = os.getenv('METRICS_PORT')
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+# Upper bounds in seconds, from 1ms to about 65s in steps of sqrt(2), which
+# keeps quantile estimates within about 10%.
+LATENCY_BUCKETS = tuple(round(0.001 * 2 ** (i / 2), 6) for i in range(33))
+RECENT_CALLS = 100
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Counts observations into fixed buckets, the way Prometheus does.
+    Observing is a bisect and two additions, so it can stay on in
+    production; quantiles are estimated from the buckets.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Returns an estimate of the q quantile, interpolating linearly
+        inside the bucket it falls in. 0 if nothing was observed.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+def params_hash(kwargs: Dict[str, Any]) -> str:
+    """Returns a short stable hash of the parameters of an upstream call,
+    so calls can be told apart without logging the parameters themselves.
+    """
+    text = repr(sorted((key, str(value)) for key, value in kwargs.items()
+                       if key != 'timeout'))
+    return hashlib.blake2b(text.encode(), digest_size=4).hexdigest()
+
+
+def response_size(result: Any) -> Optional[int]:
+    """Returns how many bytes an nba_api endpoint received, or None if
+    result is not an endpoint.
+    """
+    response = getattr(result, 'nba_response', None)
+    return len(response.get_response()) if response is not None else None
+
+
+class Metrics:
+    """Latency histograms and counters keyed by name and labels, plus
+    collectors: callables returning a flat dict of numbers, such as the
+    stats() of a cache, that are read whenever the metrics are rendered.
+    """
+
+    def __init__(self) -> None:
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+        self.recent = deque(maxlen=RECENT_CALLS)
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, str]) -> Tuple[str, Labels]:
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def record_call(self, endpoint: str, kwargs: Dict[str, Any],
+                    seconds: float, size: Optional[int],
+                    outcome: str) -> None:
+        """Records one upstream request: its latency by endpoint and outcome,
+        the bytes received, and an entry in the recent calls log.
+        """
+        self.observe('nba_upstream_request_seconds', seconds,
+                     endpoint=endpoint, outcome=outcome)
+        if size is not None:
+            self.inc('nba_upstream_response_bytes_total', size,
+                     endpoint=endpoint)
+        self.recent.append((time.time(), endpoint, params_hash(kwargs),
+                            round(seconds, 4), size, outcome))
+
+    def register(self, name: str, collector: Callable[[], Dict]) -> None:
+        self._collectors[name] = collector
+
+    def histograms(self, name: str) -> List[Tuple[Dict[str, str], Histogram]]:
+        """Returns the labels and histogram of every series called name."""
+        with self._lock:
+            return [(dict(labels), histogram) for (series, labels), histogram
+                    in self._histograms.items() if series == name]
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        for name in sorted({name for (name, _), _ in histograms}):
+            lines.append(f'# TYPE {name} histogram')
+            for (series, labels), histogram in histograms:
+                if series != name:
+                    continue
+                bounds = [f'{bound:g}' for bound in histogram.buckets]
+                cumulative = 0
+                for bound, count in zip(bounds + ['+Inf'], histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket'
+                                 f'{format_labels(labels, le=bound)} '
+                                 f'{cumulative}')
+                lines.append(f'{name}_sum{format_labels(labels)} '
+                             f'{histogram.sum:.6f}')
+                lines.append(f'{name}_count{format_labels(labels)} '
+                             f'{histogram.count}')
+        for name in sorted({name for (name, _), _ in counters}):
+            lines.append(f'# TYPE {name} counter')
+            lines.extend(f'{name}{format_labels(labels)} {value}'
+                         for (series, labels), value in counters
+                         if series == name)
+        for collector_name, collector in sorted(self._collectors.items()):
+            for key, value in flatten(collector()).items():
+                if isinstance(value, (int, float)):
+                    lines.append(f'nba_{collector_name}_{key} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels: Labels, **extra: str) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}'
+
+
+def flatten(stats: Dict[str, Any], prefix: str = '') -> Dict[str, Any]:
+    """Flattens nested stats() dicts, e.g. {'memory': {'hits': 1}} to
+    {'memory_hits': 1}.
+    """
+    flat = {}
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{prefix}{key}_'))
+        else:
+            flat[prefix + key] = value
+    return flat
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def serve(metrics: 'Metrics', port: int,
+          host: str = METRICS_HOST) -> ThreadingHTTPServer:
+    """Serves metrics.render() over HTTP on host:port from a daemon thread,
+    for Prometheus or curl to scrape.
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.metrics = metrics
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+METRICS = Metrics()
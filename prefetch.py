@@ -0,0 +1,157 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+from games import GameStore, season_for_date, season_string
+from upstream import (GUARD, UPSTREAM, UPSTREAM_TIMEOUT, TokenBucket,
+                      Upstream)
+
+PREFETCH_INTERVAL = float(os.getenv('PREFETCH_INTERVAL', '600'))
+PREFETCH_CONCURRENCY = int(os.getenv('PREFETCH_CONCURRENCY', '2'))
+# Players per second. Each player costs up to three upstream requests, so
+# this leaves most of UPSTREAM_RATE to commands.
+PREFETCH_RATE = float(os.getenv('PREFETCH_RATE', '0.5'))
+# A player's log does not change again until their next game, which is at
+# least a day away, so logs fetched after a game can be kept this long.
+PREFETCH_TTL = float(os.getenv('PREFETCH_TTL', str(6 * 3600)))
+
+
+def fetch_roster(team_id: int, year: int) -> List[int]:
+    """Returns the ids of the players on team_id's roster in the season
+    starting in year.
+    """
+    from nba_api.stats.endpoints import commonteamroster
+
+    df = GUARD.fetch(commonteamroster.CommonTeamRoster, team_id=team_id,
+                     season=season_string(year),
+                     timeout=UPSTREAM_TIMEOUT).get_data_frames()[0]
+    return df['PLAYER_ID'].tolist()
+
+
+class Prefetcher:
+    """Warms the caches for the players of every team that played on the
+    latest game date of the current season, so the queries that follow a
+    game night do not each pay for a cold fetch.
+
+    warm(player_id, year) fetches and caches the player's regular season
+    log, team and picture for the season starting in year; it is run
+    through the upstream executor, at most concurrency players at a time and
+    rate players per second. Every game is only prefetched once.
+
+    claim is called on every cache hit, so the prefetcher can tell how many
+    of the players it warmed were asked for afterwards.
+    """
+
+    def __init__(self, game_store: GameStore,
+                 warm: Callable[[int, int], Any],
+                 upstream: Upstream = UPSTREAM,
+                 interval: float = PREFETCH_INTERVAL,
+                 concurrency: int = PREFETCH_CONCURRENCY,
+                 rate: float = PREFETCH_RATE, ttl: float = PREFETCH_TTL,
+                 roster: Callable[[int, int], List[int]] = fetch_roster) -> None:
+        self.game_store = game_store
+        self.warm = warm
+        self.upstream = upstream
+        self.interval = interval
+        self.concurrency = concurrency
+        self.ttl = ttl
+        self.roster = roster
+        self.bucket = TokenBucket(rate, burst=concurrency)
+        self.runs = self.games = self.players = self.failures = 0
+        self.useful = 0
+        self.last_run_seconds = 0.0
+        self._done = set()
+        self._warmed = {}
+        self._runner = None
+
+    async def _take(self) -> None:
+        wait = self.bucket.try_acquire()
+        while wait:
+            await asyncio.sleep(wait)
+            wait = self.bucket.try_acquire()
+
+    async def _warm(self, player_id: int, year: int,
+                    semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            await self._take()
+            try:
+                await self.upstream.call(self.warm, player_id, year)
+            except Exception as error:
+                self.failures += 1
+                print(f'Prefetching player {player_id} failed: {error!r}')
+            else:
+                self.players += 1
+                self._warmed[(player_id, str(year), 'Regular')] = \
+                    time.monotonic()
+
+    async def prefetch(self, year: int) -> int:
+        """Warms the players of the teams in the games of the latest date of
+        the season starting in year that were not prefetched yet. Returns
+        how many players were warmed.
+        """
+        start = time.monotonic()
+        season_games = await self.game_store.get(year)
+        if season_games.last_date is None:
+            return 0
+        games = season_games.games_on(season_games.last_date)
+        games = games[~games['GAME_ID'].isin(self._done)]
+        teams = set(games['TEAM_ID_HOME']) | set(games['TEAM_ID_AWAY'])
+        players = set()
+        for team_id in teams:
+            await self._take()
+            players.update(await self.upstream.call(self.roster, team_id,
+                                                    year))
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        before = self.players
+        await asyncio.gather(*[self._warm(player_id, year, semaphore)
+                               for player_id in players])
+        self._done.update(games['GAME_ID'])
+        self.runs += 1
+        self.games += len(games)
+        self.last_run_seconds = time.monotonic() - start
+        return self.players - before
+
+    def claim(self, player_id: int, year: str, season_type: str) -> bool:
+        """Records that a cached season_type log of player_id in year was
+        read. Returns True if it was prefetched and this is the first read,
+        i.e. a miss the prefetch saved. Only regular season logs are
+        prefetched.
+        """
+        warmed = self._warmed.pop((player_id, year, season_type), None)
+        if warmed is None or time.monotonic() - warmed > self.ttl:
+            return False
+        self.useful += 1
+        return True
+
+    def hit_rates(self, hits: int, misses: int) -> Tuple[float, float]:
+        """Returns the hit rate of a cache with the given counts, and what it
+        would have been without prefetching.
+        """
+        total = max(1, hits + misses)
+        return hits / total, (hits - self.useful) / total
+
+    async def _prefetch_forever(self) -> None:
+        while True:
+            year = season_for_date(datetime.now())
+            try:
+                await self.prefetch(year)
+            except Exception as error:
+                print(f'Prefetching the {season_string(year)} rosters '
+                      f'failed: {error!r}')
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Starts the background prefetch task if it is not already
+        running.
+        """
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.ensure_future(self._prefetch_forever())
+
+    def stats(self) -> Dict[str, float]:
+        return {'runs': self.runs, 'games': self.games,
+                'players': self.players, 'useful': self.useful,
+                'failures': self.failures,
+                'last_run_seconds': self.last_run_seconds}
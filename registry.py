@@ -0,0 +1,104 @@
+import random
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from team_colors import TEAM_TO_COLORS
+
+LOGO_URL = 'https://a.espncdn.com/i/teamlogos/nba/500/{}.png'
+DEFAULT_COLOR = 0x738ADB
+
+
+class Player:
+    """One player from the nba_api's static list. Slotted, so it takes a
+    fraction of the memory of the dict it is built from.
+    """
+    __slots__ = ('id', 'full_name', 'first_name', 'last_name', 'is_active')
+
+    def __init__(self, id: int, full_name: str, first_name: str,
+                 last_name: str, is_active: bool) -> None:
+        self.id = id
+        self.full_name = full_name
+        self.first_name = first_name
+        self.last_name = last_name
+        self.is_active = is_active
+
+    def __repr__(self) -> str:
+        return f'Player({self.id}, {self.full_name!r})'
+
+
+class Team:
+    """One team from the nba_api's static list, joined with its color and
+    logo.
+    """
+    __slots__ = ('id', 'abbreviation', 'full_name', 'nickname', 'city',
+                 'color', 'logo')
+
+    def __init__(self, id: int, abbreviation: str, full_name: str,
+                 nickname: str, city: str, color: int, logo: str) -> None:
+        self.id = id
+        self.abbreviation = abbreviation
+        self.full_name = full_name
+        self.nickname = nickname
+        self.city = city
+        self.color = color
+        self.logo = logo
+
+    def __repr__(self) -> str:
+        return f'Team({self.id}, {self.abbreviation!r})'
+
+
+class Registry:
+    """Every player and team as records, keyed by their integer ids. The
+    positions of the active players are kept in a packed array, so a random
+    active player is drawn in constant time.
+    """
+
+    def __init__(self, players: Iterable[dict], teams: Iterable[dict]) -> None:
+        self.players = [Player(nba_player['id'], nba_player['full_name'],
+                               nba_player['first_name'],
+                               nba_player['last_name'],
+                               nba_player['is_active'])
+                        for nba_player in players]
+        self.teams = [Team(nba_team['id'], nba_team['abbreviation'],
+                           nba_team['full_name'], nba_team['nickname'],
+                           nba_team['city'],
+                           TEAM_TO_COLORS.get(nba_team['abbreviation'],
+                                              DEFAULT_COLOR),
+                           LOGO_URL.format(nba_team['abbreviation']))
+                      for nba_team in teams]
+        self._active = array('I', [i for i, nba_player
+                                   in enumerate(self.players)
+                                   if nba_player.is_active])
+        self._players = {nba_player.id: nba_player
+                         for nba_player in self.players}
+        self._teams = {nba_team.id: nba_team for nba_team in self.teams}
+        self._abbreviations = {nba_team.abbreviation: nba_team
+                               for nba_team in self.teams}
+
+    @property
+    def active_players(self) -> List[Player]:
+        return [self.players[i] for i in self._active]
+
+    def player(self, player_id: int) -> Optional[Player]:
+        return self._players.get(player_id)
+
+    def team(self, team_id: int) -> Optional[Team]:
+        return self._teams.get(team_id)
+
+    def team_by_abbreviation(self, abbreviation: str) -> Team:
+        """Returns the team abbreviated as in a MATCHUP, e.g. 'LAL'. Teams
+        that no longer exist (e.g. 'SEA') get a generic record named after
+        the abbreviation.
+        """
+        nba_team = self._abbreviations.get(abbreviation)
+        if nba_team is None:
+            nba_team = Team(0, abbreviation, abbreviation, abbreviation, '',
+                            DEFAULT_COLOR, '')
+        return nba_team
+
+    def random_active(self, rng: random.Random = random) -> Player:
+        return self.players[rng.choice(self._active)]
+
+    def stats(self) -> Dict[str, int]:
+        return {'players': len(self.players), 'active': len(self._active),
+                'teams': len(self.teams)}
@@ -0,0 +1,195 @@
+"""Runs NBABot as several processes, each connected to Discord with its own
+shards, sharing one cache process.
+
+Usage: python shards.py
+
+Every worker (a Heroku dyno) runs SHARD_COUNT / WORKER_COUNT of the shards
+across SHARD_PROCESSES processes, by default one: every process loads its
+own copy of the lookups, leaders and pandas, so add processes only where
+the dyno has the memory and cores for them. A single process keeps its
+caches in memory. Several processes of a worker share the game log, player
+team and picture caches, and the stats.nba.com rate limit, through a cache
+process they talk to over a Unix socket. The cache process reads the
+pictures from IMAGE_CACHE_PATH when it starts, and only the first bot
+process writes them back. The warehouse needs no process of its own, as its
+files are memory-mapped and so already shared. To scale out, set
+WORKER_COUNT and scale the worker to match, e.g. heroku ps:scale worker=3.
+"""
+from dotenv import load_dotenv
+
+# Before the imports below, which read their configuration when imported.
+load_dotenv()
+
+import functools
+import multiprocessing
+import os
+import sys
+from multiprocessing.connection import wait
+from multiprocessing.managers import BaseManager
+from typing import Dict, List, Optional
+
+from cache import CACHE_SIZE, TTLCache
+from images import IMAGE_CACHE_PATH, load_urls
+from metrics import METRICS_PORT
+from upstream import UPSTREAM_BURST, UPSTREAM_RATE, TokenBucket
+
+# None uses one shard per process on every worker.
+SHARD_COUNT = os.getenv('SHARD_COUNT')
+WORKER_COUNT = int(os.getenv('WORKER_COUNT', '1'))
+SHARD_PROCESSES = int(os.getenv('SHARD_PROCESSES', '1'))
+SHARED_CACHE_SIZE = int(os.getenv('SHARED_CACHE_SIZE',
+                                  str(CACHE_SIZE * 4)))
+CACHE_METHODS = ('get', 'get_stale', 'set', 'clear', 'stats', '__len__')
+PICTURE_METHODS = ('get', 'copy', '__contains__', '__setitem__', '__len__')
+
+_SHARED = {}
+
+
+def shard_for_guild(guild_id: int, shard_count: int) -> int:
+    """Returns the shard Discord sends guild_id's events to."""
+    return (guild_id >> 22) % shard_count
+
+
+def worker_index() -> int:
+    """Returns the index of this worker, from 0: Heroku names dynos
+    worker.1, worker.2 and so on. Elsewhere, WORKER_INDEX is used.
+    """
+    dyno = os.getenv('DYNO', '')
+    if dyno.startswith('worker.'):
+        return int(dyno[len('worker.'):]) - 1
+    return int(os.getenv('WORKER_INDEX', '0'))
+
+
+def split_shards(shard_ids: List[int], parts: int) -> List[List[int]]:
+    """Deals shard_ids out to at most parts processes."""
+    return [shard_ids[i::parts] for i in range(min(parts, len(shard_ids)))]
+
+
+def create_shared(size: int, rate: float, burst: int,
+                  pictures_path: Optional[str]) -> None:
+    """Creates the shared caches and rate limit. Runs in the cache
+    process.
+    """
+    _SHARED.update(game_logs=TTLCache(size), player_teams=TTLCache(size),
+                   bucket=TokenBucket(rate, burst),
+                   pictures=load_urls(pictures_path) if pictures_path
+                   else {})
+
+
+def shared(name: str):
+    return _SHARED[name]
+
+
+class CacheManager(BaseManager):
+    """Serves the objects made by create_shared from the cache process.
+    Every other process gets proxies to them, whose method calls are sent
+    over the manager's socket; arguments and results are pickled.
+    """
+
+
+CacheManager.register('game_logs', functools.partial(shared, 'game_logs'),
+                      exposed=CACHE_METHODS)
+CacheManager.register('player_teams',
+                      functools.partial(shared, 'player_teams'),
+                      exposed=CACHE_METHODS)
+CacheManager.register('bucket', functools.partial(shared, 'bucket'),
+                      exposed=('try_acquire',))
+CacheManager.register('pictures', functools.partial(shared, 'pictures'),
+                      exposed=PICTURE_METHODS)
+
+
+def start_cache_process(size: int = SHARED_CACHE_SIZE,
+                        rate: float = UPSTREAM_RATE / WORKER_COUNT,
+                        burst: int = UPSTREAM_BURST,
+                        pictures_path: Optional[str] = IMAGE_CACHE_PATH
+                        ) -> CacheManager:
+    """Starts the cache process on an unused Unix socket. Processes started
+    from this one afterwards can connect to manager.address. The rate limit
+    of stats.nba.com is split evenly between the workers.
+    """
+    manager = CacheManager()
+    manager.start(create_shared, (size, rate, burst, pictures_path))
+    return manager
+
+
+class SharedBucket(TokenBucket):
+    """A TokenBucket whose tokens are taken from the bucket in the cache
+    process, so all processes of a worker share one rate limit. Waiting for
+    a token still happens in the calling thread.
+    """
+
+    def __init__(self, remote) -> None:
+        self.remote = remote
+
+    def try_acquire(self) -> float:
+        return self.remote.try_acquire()
+
+
+def connect(address) -> Dict[str, object]:
+    """Connects to the cache process at address and returns proxies to the
+    shared objects by the names NBABot.share_caches takes.
+    """
+    manager = CacheManager(address)
+    manager.connect()
+    return {'game_logs': manager.game_logs(),
+            'player_teams': manager.player_teams(),
+            'bucket': SharedBucket(manager.bucket()),
+            'pictures': manager.pictures()}
+
+
+def run_shards(address, shard_ids: List[int], shard_count: int,
+               primary: bool, metrics_port: Optional[int]) -> None:
+    """Runs the bot for shard_ids in this process, with the caches of the
+    cache process at address.
+    """
+    import NBABot
+
+    NBABot.share_caches(**connect(address), primary=primary)
+    NBABot.main(shard_ids, shard_count, primary, metrics_port)
+
+
+def run_local(shard_ids: List[int], shard_count: int) -> None:
+    """Runs the bot for shard_ids in this process alone, with its own
+    in-process caches. Only the rate limit is split between the workers.
+    """
+    import NBABot
+
+    NBABot.GUARD.bucket = TokenBucket(UPSTREAM_RATE / WORKER_COUNT,
+                                      UPSTREAM_BURST)
+    NBABot.main(shard_ids, shard_count)
+
+
+def main() -> None:
+    """Starts the cache process and this worker's bot processes, and exits
+    with an error as soon as any of them does, so that the worker is
+    restarted as a whole. A worker with a single process runs the bot
+    itself, without a cache process.
+    """
+    shard_count = int(SHARD_COUNT) if SHARD_COUNT else \
+        WORKER_COUNT * SHARD_PROCESSES
+    index = worker_index()
+    groups = split_shards(list(range(index, shard_count, WORKER_COUNT)),
+                          SHARD_PROCESSES)
+    if len(groups) == 1:
+        print(f'Worker {index} is running shards {groups} of {shard_count}')
+        run_local(groups[0], shard_count)
+        return
+    manager = start_cache_process()
+    processes = [multiprocessing.Process(
+        target=run_shards, name=f'shards-{"-".join(map(str, shard_ids))}',
+        args=(manager.address, shard_ids, shard_count, i == 0,
+              int(METRICS_PORT) + i if METRICS_PORT else None))
+        for i, shard_ids in enumerate(groups)]
+    for process in processes:
+        process.start()
+    print(f'Worker {index} is running shards {groups} of {shard_count}')
+
+    wait([process.sentinel for process in processes])
+    for process in processes:
+        process.terminate()
+    manager.shutdown()
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import os
+import time
+from typing import Tuple
+
+from pandas import DataFrame
+
+from upstream import (GUARD, UPSTREAM, UPSTREAM_TIMEOUT, SingleFlight,
+                      Upstream, fetch_or_stale)
+
+STANDINGS_REFRESH_INTERVAL = float(os.getenv('STANDINGS_REFRESH_INTERVAL',
+                                             '900'))
+
+
+def render_conference(conf: DataFrame) -> str:
+    """Converts a conference data frame to a readable string."""
+    return ''.join(f'{rank}. {team}\n'
+                   for rank, team in zip(conf['RANK'], conf['TEAM']))
+
+
+def fetch_conferences() -> Tuple[str, str]:
+    """Returns the east and west standings as readable strings, from a single
+    PlayoffPicture request.
+    """
+    from nba_api.stats.endpoints import playoffpicture
+
+    frames = GUARD.fetch(playoffpicture.PlayoffPicture,
+                         timeout=UPSTREAM_TIMEOUT).get_data_frames()
+    return render_conference(frames[2]), render_conference(frames[3])
+
+
+class StandingsService:
+    """Keeps the rendered conference standings for refresh_interval seconds.
+
+    When the snapshot is stale, the first caller starts a refresh and
+    everyone else waits on that same request. If the refresh fails, the
+    failure is printed and the previous snapshot is served until the next
+    scheduled refresh, refresh_interval seconds later.
+    """
+
+    def __init__(self, upstream: Upstream = UPSTREAM,
+                 refresh_interval: float = STANDINGS_REFRESH_INTERVAL) -> None:
+        self.upstream = upstream
+        self.refresh_interval = refresh_interval
+        self.fetches = 0
+        self._snapshot = None
+        self._fetched_at = 0.0
+        self._flight = SingleFlight()
+
+    async def get(self) -> Tuple[str, str]:
+        """Returns the (east, west) standings."""
+        if self._snapshot is not None and \
+                time.monotonic() - self._fetched_at < self.refresh_interval:
+            return self._snapshot
+        return await self._flight.do('standings', self._fetch)
+
+    async def _fetch(self) -> Tuple[str, str]:
+        self.fetches += 1
+        try:
+            snapshot, error = await self.upstream.call(
+                fetch_or_stale, fetch_conferences, lambda: self._snapshot,
+                'PlayoffPicture')
+        except Exception as error:
+            print(f'Refreshing the standings failed: {error!r}')
+            raise
+        if error is not None:
+            print(f'Refreshing the standings failed, serving the previous '
+                  f'snapshot: {error!r}')
+        self._snapshot = snapshot
+        self._fetched_at = time.monotonic()
+        return snapshot
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+# The bot's modules sit at the top of the repository rather than in a
+# package, so make them importable however pytest is started.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeContext:
+    """Stands in for a command's discord Context, recording what is sent:
+    the embed if there is one, otherwise the message.
+    """
+
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def send(self, content=None, embed=None) -> None:
+        self.sent.append(embed if embed is not None else content)
+
+
+@pytest.fixture
+def ctx() -> FakeContext:
+    return FakeContext()
+
+
+class FakeMessage:
+    """A sent message that records every embed it is edited to."""
+
+    def __init__(self, embed) -> None:
+        self.edits = [embed]
+
+    async def edit(self, embed=None) -> None:
+        self.edits.append(embed)
+
+    async def pin(self) -> None:
+        pass
+
+
+class FakeChannel:
+    """A channel that keeps the last message sent to it."""
+    id = 1
+
+    async def send(self, content=None, embed=None) -> FakeMessage:
+        self.message = FakeMessage(embed)
+        return self.message
+
+
+@pytest.fixture
+def channel() -> FakeChannel:
+    return FakeChannel()
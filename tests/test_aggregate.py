@@ -0,0 +1,54 @@
+import numpy as np
+from pandas import DataFrame
+
+from aggregate import (FULL_STATS, aggregate, aggregate_by, aggregate_logs,
+                       player_statistics)
+
+LOG = DataFrame({'PLAYER_ID': [1, 2, 1, 1, 2],
+                 'PTS': [25, 7, 31, 18, 12], 'MIN': [36, 12, 40, 33, 20],
+                 'FGM': [9, 3, 12, 7, 5], 'FGA': [20, 7, 22, 16, 9],
+                 'FG3M': [2, 1, 3, 1, 0], 'FG3A': [6, 3, 7, 5, 1],
+                 'FTM': [5, 0, 4, 3, 2], 'FTA': [6, 0, 5, 4, 3],
+                 'AST': [8, 1, 11, 6, 2], 'REB': [7, 3, 9, 10, 5],
+                 'STL': [1, 0, 2, 1, 1], 'BLK': [1, 1, 0, 2, 0],
+                 'TOV': [3, 1, 4, 2, 1]})
+
+
+def avg_values(df) -> dict:
+    """The per-column loop player statistics were computed with before the
+    aggregation engine.
+    """
+    statistics = {}
+    for stat_name in ['PTS', 'MIN', 'FG_PCT', 'FT_PCT', 'AST', 'REB', 'STL',
+                      'BLK']:
+        if stat_name.endswith('PCT'):
+            percent = df[stat_name[0:2] + 'M'].sum() / \
+                df[stat_name[0:2] + 'A'].sum()
+            value = str(round(percent * 100, 1)) + '%'
+        else:
+            value = str(round(df[stat_name].mean(), 1))
+        statistics[stat_name] = value
+    return statistics
+
+
+def test_player_statistics_match_the_legacy_averages():
+    for df in (LOG, LOG[LOG['PLAYER_ID'] == 2]):
+        statistics = player_statistics(df)
+        assert statistics.pop('GP') == str(len(df))
+        assert statistics == avg_values(df)
+
+
+def test_grouped_stats_match_each_group_on_its_own():
+    keys, games, values = aggregate_by(LOG, 'PLAYER_ID', FULL_STATS)
+    assert keys.tolist() == [1, 2] and games.tolist() == [3, 2]
+    for key, row in zip(keys, values):
+        np.testing.assert_allclose(
+            row, aggregate(LOG[LOG['PLAYER_ID'] == key], FULL_STATS))
+    pts_36 = FULL_STATS.labels.index('PTS_36')
+    assert values[1, pts_36] == 19 / 32 * 36
+
+
+def test_empty_logs_have_no_stats():
+    games, values = aggregate_logs([LOG, LOG[:0]])
+    assert games.tolist() == [5, 0]
+    assert np.isnan(values[1]).all() and not np.isnan(values[0]).any()
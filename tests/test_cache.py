@@ -0,0 +1,13 @@
+from pandas import DataFrame
+
+from cache import DiskCache
+
+
+def test_disk_cache_leaves_only_the_saved_file(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    key = (2544, '2019-20', 'Regular Season')
+    cache.set(key, DataFrame({'PTS': [25, 30]}))
+    cache.set(key, DataFrame({'PTS': [40]}))
+    assert cache.get(key)['PTS'].tolist() == [40]
+    assert [path.name for path in tmp_path.iterdir()] == [
+        '2544_2019-20_Regular Season.feather']
@@ -0,0 +1,93 @@
+import asyncio
+from types import SimpleNamespace
+
+from pandas import DataFrame
+
+import NBABot
+from leaders import Leaderboard
+from lookup import PlayerIndex
+from registry import DEFAULT_COLOR, Player, Registry
+from upstream import Upstream
+
+FREE_AGENT = Player(1, 'Free Agent', 'Free', 'Agent', True)
+
+
+def test_pull_of_a_player_without_a_team(ctx, monkeypatch):
+    registry = SimpleNamespace(random_active=lambda: FREE_AGENT)
+    monkeypatch.setattr(NBABot, 'LOOKUPS', SimpleNamespace(registry=registry))
+    monkeypatch.setattr(NBABot, 'load_player_dataframe',
+                        lambda *args: DataFrame({'MATCHUP': []}))
+    monkeypatch.setattr(NBABot, 'season_helper', lambda *args: None)
+    asyncio.run(NBABot.pull.callback(ctx))
+    assert ctx.sent == ['Free Agent did not play this season.']
+
+
+def test_split_comparison_at_commas_and_vs():
+    assert NBABot.split_comparison(
+        ('lebron', 'james', '2019,', 'kevin', 'durant', 'vs', 'luka',
+         'doncic')) == [('lebron', 'james', '2019'), ('kevin', 'durant'),
+                        ('luka', 'doncic')]
+    assert NBABot.split_comparison(('lebron', 'james,kevin', 'durant')) == [
+        ('lebron', 'james'), ('kevin', 'durant')]
+    assert NBABot.split_comparison(('vs.', 'lebron', 'james', ',')) == [
+        ('lebron', 'james')]
+
+
+ACTIVE = PlayerIndex([Player(1629718, 'Kobe Brown', 'Kobe', 'Brown', True),
+                      Player(2544, 'LeBron James', 'LeBron', 'James', True),
+                      Player(1628384, 'Sion James', 'Sion', 'James', True)])
+
+
+def test_a_different_player_is_only_suggested():
+    nba_player, suggestions, fuzzy = NBABot.resolve_player('kobe', 'bryant',
+                                                           ACTIVE)
+    assert nba_player is None and not fuzzy
+    assert suggestions[0].full_name == 'Kobe Brown'
+
+
+def test_a_misspelled_name_is_resolved_and_named():
+    nba_player, suggestions, fuzzy = NBABot.resolve_player('lebrn', 'james',
+                                                           ACTIVE)
+    assert nba_player.full_name == 'LeBron James' and fuzzy
+    assert NBABot.resolve_player('lebron', 'james', ACTIVE)[2] is False
+    assert NBABot.fuzzy_text(nba_player) == \
+        'No exact match, showing LeBron James.'
+
+
+def test_career_embeds_without_a_picture_are_complete(monkeypatch):
+    log = DataFrame([dict.fromkeys(
+        ('PTS', 'MIN', 'FGM', 'FGA', 'FG3M', 'FG3A', 'FTM', 'FTA', 'OREB',
+         'DREB', 'REB', 'AST', 'STL', 'BLK', 'TOV', 'PF', 'PLUS_MINUS'), 1)])
+    monkeypatch.setattr(NBABot, 'UPSTREAM', Upstream(1, 1))
+    monkeypatch.setattr(NBABot, 'load_player_log',
+                        lambda *args: (log, False))
+    monkeypatch.setattr(NBABot, 'find_picture', lambda *args: None)
+    embed, complete = asyncio.run(NBABot.career_embed(ACTIVE.find(
+        'lebron', 'james'), 'Regular Season'))
+    assert 'thumbnail' not in embed.to_dict() and complete
+
+
+def test_a_season_with_a_defunct_team(monkeypatch):
+    registry = Registry([], [{'id': 1610612747, 'abbreviation': 'LAL',
+                              'full_name': 'Los Angeles Lakers',
+                              'nickname': 'Lakers', 'city': 'Los Angeles'}])
+    monkeypatch.setattr(NBABot, 'LOOKUPS', SimpleNamespace(registry=registry))
+    ray_allen = Player(951, 'Ray Allen', 'Ray', 'Allen', False)
+    nba_team = NBABot.season_helper(ray_allen, '2005', DataFrame(
+        {'MATCHUP': ['SEA @ LAL', 'SEA vs. LAL']}))
+    assert (nba_team.full_name, nba_team.color) == ('SEA', DEFAULT_COLOR)
+    assert NBABot.season_helper(ray_allen, '2005', DataFrame(
+        {'MATCHUP': ['LAL vs. SEA']})).nickname == 'Lakers'
+    assert NBABot.season_helper(ray_allen, '2005',
+                                DataFrame({'MATCHUP': []})) is None
+
+
+def test_leaders_before_anyone_qualifies(ctx, monkeypatch):
+    board = Leaderboard(min_games=10)
+
+    async def get(year):
+        return board
+
+    monkeypatch.setattr(NBABot, 'LEADERS', SimpleNamespace(get=get))
+    asyncio.run(NBABot.leaders.callback(ctx, 'pts_36'))
+    assert ctx.sent == ['No qualified players in PTS_36 yet.']
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+from pandas import DataFrame
+
+import draft
+import NBABot
+from draft import DraftTable, load_draft_table
+
+HISTORY = DataFrame({'SEASON': ['2003', '2003'], 'ROUND_NUMBER': [1, 1],
+                     'OVERALL_PICK': [2, 1], 'TEAM_ID': [1, 2],
+                     'PERSON_ID': [2549, 2544],
+                     'PLAYER_NAME': ['Darko Milicic', 'LeBron James']})
+
+
+def test_a_corrupt_table_is_fetched_again(tmp_path, monkeypatch):
+    path = tmp_path / 'draft_history.pickle'
+    path.write_bytes(b'not a pickle')
+    fetches = []
+
+    def fetch_draft_history():
+        fetches.append(1)
+        return HISTORY
+
+    monkeypatch.setattr(draft, 'fetch_draft_history', fetch_draft_history)
+    table = load_draft_table(str(path))
+    assert table.pick(2003, 1).PLAYER_NAME == 'LeBron James'
+    # The fetched table replaced the corrupt file.
+    assert len(load_draft_table(str(path))) == 2
+    assert len(fetches) == 1
+
+
+class FakeDraftStore:
+    async def get(self) -> DraftTable:
+        return DraftTable(HISTORY)
+
+
+@pytest.mark.parametrize('years', ['1-2-3', '2010-2000', '-2003'])
+def test_draftteam_rejects_invalid_years(years, ctx, monkeypatch):
+    monkeypatch.setattr(NBABot, 'DRAFT', FakeDraftStore())
+    asyncio.run(NBABot.draftteam.callback(ctx, 'Cavaliers', years))
+    assert ctx.sent == ['Please enter one year or a range of years such as '
+                        '1990-1999.']
@@ -0,0 +1,29 @@
+import asyncio
+
+import discord
+
+from embeds import EmbedCache
+
+
+def render_twice(complete: bool) -> int:
+    cache, builds = EmbedCache(), []
+
+    async def build():
+        builds.append(1)
+        return discord.Embed(title='Career Stats'), complete
+
+    async def run() -> None:
+        for _ in range(2):
+            embed = await cache.render(('career', 2544), None, 60, build)
+            assert embed.title == 'Career Stats'
+
+    asyncio.run(run())
+    return len(builds)
+
+
+def test_complete_embeds_are_built_once():
+    assert render_twice(complete=True) == 1
+
+
+def test_degraded_embeds_are_built_again():
+    assert render_twice(complete=False) == 2
@@ -0,0 +1,113 @@
+from datetime import datetime
+
+import pytest
+import requests
+from nba_api.stats.endpoints import commonplayerinfo, playergamelog
+from nba_api.stats.library.http import NBAStatsHTTP
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+
+import cache
+import fixtures
+import NBABot
+import warehouse
+from cache import DiskCache, GameLogCache, TTLCache
+from games import season_for_date
+from registry import Player
+from upstream import CircuitBreaker, Guard, TokenBucket
+
+LEBRON = Player(2544, 'LeBron James', 'LeBron', 'James', True)
+
+
+class FakeResponse:
+    def __init__(self, url: str, text: str) -> None:
+        self.url = url
+        self.status_code = 200
+        self.text = text
+
+
+class FailingSession:
+    """Stands in for the requests.Session nba_api sends requests with.
+    Answers with body until fail is set, then raises ConnectionError.
+    """
+
+    def __init__(self, body: str) -> None:
+        self.body = body
+        self.fail = False
+        self.calls = 0
+
+    def get(self, url: str, **kwargs) -> FakeResponse:
+        self.calls += 1
+        if self.fail:
+            raise requests.ConnectionError('stats.nba.com is down')
+        return FakeResponse(url, self.body)
+
+
+def game_log() -> DataFrame:
+    return DataFrame({'SEASON_ID': ['22019'] * 2, 'Player_ID': [2544] * 2,
+                      'Game_ID': ['0021900002', '0021900001'],
+                      'GAME_DATE': ['OCT 24, 2019', 'OCT 22, 2019'],
+                      'MATCHUP': ['LAL vs. UTA', 'LAL @ LAC'],
+                      'WL': ['W', 'L'], 'MIN': [37, 36], 'PTS': [32, 18]})
+
+
+@pytest.fixture
+def guarded(monkeypatch):
+    """Points the bot at a FailingSession through a Guard that opens its
+    circuit after two failures, with no rate limit or backoff, and at empty
+    caches whose current season entries expire at once.
+    """
+    session = FailingSession(fixtures.endpoint_body(
+        playergamelog.PlayerGameLog, {'PlayerGameLog': game_log()}))
+    guard = Guard(TokenBucket(1e9), CircuitBreaker(threshold=2, cooldown=60),
+                  retries=1, backoff_base=0)
+    game_logs = GameLogCache(TTLCache(), DiskCache(None))
+    monkeypatch.setattr(NBAStatsHTTP, '_session', session)
+    monkeypatch.setattr(NBABot, 'GUARD', guard)
+    monkeypatch.setattr(NBABot, 'GAME_LOG_CACHE', game_logs)
+    monkeypatch.setattr(NBABot, 'PLAYER_TEAMS', TTLCache())
+    monkeypatch.setattr(NBABot, 'WAREHOUSE', warehouse.Warehouse(None))
+    monkeypatch.setattr(cache, 'CURRENT_SEASON_TTL', 0)
+    return session, guard, game_logs
+
+
+def test_expired_game_log_is_served_when_the_session_fails(guarded):
+    session, guard, game_logs = guarded
+    year = str(season_for_date(datetime.now()))
+    fresh = NBABot.load_player_dataframe(LEBRON, year, 'Regular')
+    assert list(fresh['PTS']) == [32, 18]
+
+    session.fail = True
+    stale = NBABot.load_player_dataframe(LEBRON, year, 'Regular')
+    assert_frame_equal(stale, fresh)
+    assert session.calls == 3
+    assert guard.breaker.state == 'open'
+
+    # The open circuit refuses the request, and the log is served again.
+    again = NBABot.load_player_dataframe(LEBRON, year, 'Regular')
+    assert_frame_equal(again, fresh)
+    assert session.calls == 3
+    assert game_logs.memory.stale_hits == 2
+
+
+def test_failure_is_raised_without_a_cached_game_log(guarded):
+    session, _, _ = guarded
+    session.fail = True
+    with pytest.raises(requests.ConnectionError):
+        NBABot.load_player_dataframe(
+            LEBRON, str(season_for_date(datetime.now())), 'Regular')
+
+
+def test_expired_player_team_is_served_when_the_session_fails(guarded):
+    session, _, _ = guarded
+    session.body = fixtures.endpoint_body(
+        commonplayerinfo.CommonPlayerInfo,
+        {'CommonPlayerInfo': DataFrame({
+            'PERSON_ID': [2544], 'TEAM_ABBREVIATION': ['LAL'],
+            'TEAM_CITY': ['Los Angeles'], 'TEAM_NAME': ['Lakers']})},
+        order=['CommonPlayerInfo'])
+    assert NBABot.fetch_player_team(2544) == ('LAL', 'Los Angeles Lakers')
+
+    session.fail = True
+    assert NBABot.fetch_player_team(2544, refresh=True) == \
+        ('LAL', 'Los Angeles Lakers')
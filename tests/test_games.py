@@ -0,0 +1,57 @@
+import asyncio
+from datetime import datetime
+
+from pandas import DataFrame
+
+import games
+from games import GameStore, pair_games, season_for_date
+from upstream import Upstream
+
+COLUMNS = ['SEASON_ID', 'GAME_ID', 'GAME_DATE', 'TEAM_ID', 'MATCHUP', 'PTS']
+
+
+def team_rows(*rows) -> DataFrame:
+    return DataFrame(list(rows), columns=COLUMNS)
+
+
+OPENING_NIGHT = team_rows(
+    ('22020', '0022000001', '2020-12-22', 1, 'BKN @ GSW', 125),
+    ('22020', '0022000001', '2020-12-22', 2, 'GSW vs. BKN', 99))
+
+
+def test_refresh_fetches_the_whole_season_when_it_was_loaded_empty(
+        monkeypatch):
+    calls = []
+
+    def fetch_season_games(year, date_from=None):
+        calls.append(date_from)
+        return OPENING_NIGHT if len(calls) > 1 else team_rows()
+
+    monkeypatch.setattr(games, 'fetch_season_games', fetch_season_games)
+    store = GameStore(Upstream(1, 1))
+
+    async def run():
+        assert len((await store.get(2020)).games) == 0
+        return await store.refresh(2020)
+
+    season_games = asyncio.run(run())
+    assert calls == [None, None]
+    assert season_games.last_date == '2020-12-22'
+    assert season_games.games['GAME_ID'].tolist() == ['0022000001']
+
+
+def test_seasons_start_in_october():
+    assert season_for_date(datetime(2020, 9, 30)) == 2019
+    assert season_for_date(datetime(2020, 10, 1)) == 2020
+    assert season_for_date(datetime(2021, 6, 15)) == 2020
+
+
+def test_pair_games_joins_home_and_away_rows():
+    df = team_rows(
+        ('22019', '0021900002', '2019-10-23', 3, 'LAL @ LAC', 102),
+        ('22019', '0021900001', '2019-10-22', 1, 'NOP @ TOR', 122),
+        ('22019', '0021900001', '2019-10-22', 2, 'TOR vs. NOP', 130))
+    games = pair_games(df)
+    assert games[['GAME_ID', 'TEAM_ID_HOME', 'TEAM_ID_AWAY', 'PTS_HOME',
+                  'PTS_AWAY']].values.tolist() == [
+        ['0021900001', 2, 1, 130, 122]]
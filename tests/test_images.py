@@ -0,0 +1,107 @@
+import pytest
+import requests
+
+import images
+from fixtures import FixtureResponse
+from images import NO_IMAGE, ImageCache, scrape_image
+from upstream import CircuitBreaker, Guard, TokenBucket
+
+PICTURE = 'https://example.com/2544.png'
+PAGE = (b'<html><head><title>LeBron James</title><meta property="og:image" '
+        b'content="' + PICTURE.encode() + b'"></head><body>')
+
+
+class PageSession:
+    """Answers every request with page, or raises error if it is set."""
+
+    def __init__(self, page: bytes = PAGE, error: Exception = None) -> None:
+        self.page = page
+        self.error = error
+        self.requests = 0
+
+    def get(self, url: str, **kwargs) -> FixtureResponse:
+        self.requests += 1
+        if self.error is not None:
+            raise self.error
+        return FixtureResponse(self.page, 200, url)
+
+
+@pytest.fixture(autouse=True)
+def guard(monkeypatch):
+    monkeypatch.setattr(images, 'GUARD', Guard(TokenBucket(1e9, burst=100),
+                                               CircuitBreaker(), retries=0))
+
+
+def test_pictures_are_scraped_once():
+    session = PageSession()
+    cache = ImageCache(None, session=session)
+    assert cache.url('player', 2544) == PICTURE
+    assert cache.url('player', 2544) == PICTURE
+    assert session.requests == 1
+
+
+def test_a_failed_scrape_is_no_image():
+    session = PageSession(error=requests.ConnectionError('down'))
+    cache = ImageCache(None, session=session)
+    assert cache.url('player', 2544) == NO_IMAGE
+    session.error = None
+    assert cache.url('player', 2544) == PICTURE
+
+
+def test_pages_without_a_picture_are_scraped_again_after_the_ttl():
+    session = PageSession(b'<html><head></head><body>')
+    cache = ImageCache(None, session=session)
+    assert cache.url('player', 1) == NO_IMAGE
+    assert cache.url('player', 1) == NO_IMAGE
+    assert session.requests == 1
+
+    cache.no_image_ttl = 0
+    cache._no_image.clear()
+    for _ in range(2):
+        assert cache.url('player', 1) == NO_IMAGE
+    assert session.requests == 3
+
+
+class ChunkedPage(FixtureResponse):
+    """A page streamed in chunks of chunk_size bytes, whatever size is
+    asked for, recording how many were read.
+    """
+
+    def __init__(self, content: bytes, chunk_size: int) -> None:
+        super().__init__(content, 200, '')
+        self.chunk_size = chunk_size
+        self.chunks = 0
+
+    def iter_content(self, chunk_size: int = 1):
+        for chunk in super().iter_content(self.chunk_size):
+            self.chunks += 1
+            yield chunk
+
+
+class ChunkedSession:
+    def __init__(self, page: ChunkedPage) -> None:
+        self.page = page
+
+    def get(self, url: str, **kwargs) -> ChunkedPage:
+        return self.page
+
+
+def test_scraping_stops_at_the_end_of_the_head():
+    # The closing tag is split across two chunks, and the body after it
+    # would take many more.
+    page = ChunkedPage(PAGE + b'x' * 10000, chunk_size=len(PAGE) - 10)
+    assert scrape_image(ChunkedSession(page), 'player', 2544) == PICTURE
+    assert page.chunks == 2
+
+
+def test_a_head_without_a_picture_is_no_image():
+    page = ChunkedPage(b'<html><head><meta property="og:title" '
+                       b'content="LeBron"></head><body>', chunk_size=16)
+    assert scrape_image(ChunkedSession(page), 'player', 2544) == NO_IMAGE
+
+
+def test_an_unterminated_head_is_parsed_as_far_as_it_goes():
+    page = ChunkedPage(PAGE.replace(b'</head><body>', b''), chunk_size=7)
+    assert scrape_image(ChunkedSession(page), 'player', 2544) == PICTURE
+    truncated = ChunkedPage(PAGE[:PAGE.index(b'content') + 20], chunk_size=7)
+    assert scrape_image(ChunkedSession(truncated), 'player', 1) == NO_IMAGE
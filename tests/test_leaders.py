@@ -0,0 +1,96 @@
+import numpy as np
+from pandas import DataFrame, concat
+
+from aggregate import aggregate_by
+from leaders import Leaderboard
+
+COLUMNS = ('PTS', 'MIN', 'FGM', 'FGA', 'FG3M', 'FG3A', 'FTM', 'FTA', 'AST',
+           'REB', 'STL', 'BLK')
+
+
+def game_log(players, first_game: int = 0) -> DataFrame:
+    """Returns one row per (player_id, name, games, stats) entry and game,
+    stats being a dict of per-game values for COLUMNS, zero by default.
+    """
+    rows = []
+    for player_id, name, games, stats in players:
+        for game in range(first_game, first_game + games):
+            row = dict.fromkeys(COLUMNS, 0)
+            row.update(stats, GAME_ID=str(game), PLAYER_ID=player_id,
+                       PLAYER_NAME=name, GAME_DATE='2020-01-01')
+            rows.append(row)
+    return DataFrame(rows)
+
+
+def test_percentages_need_the_prorated_attempts():
+    board = Leaderboard(min_games=1)
+    board.update(game_log([(1, 'Volume', 41, {'FGM': 5, 'FGA': 10}),
+                           (2, 'Perfect', 41, {'FGM': 1, 'FGA': 1})]))
+    # Half the season has been played, so 150 attempts qualify.
+    assert [name for _, name, _ in board.leaders('FG_PCT', 5)] == ['Volume']
+
+    board.update(game_log([(2, 'Perfect', 41, {'FGM': 7, 'FGA': 7})], 41))
+    assert [name for _, name, _ in board.leaders('FG_PCT', 5)] == [
+        'Perfect', 'Volume']
+
+
+def test_players_fall_out_when_the_qualifier_rises():
+    board = Leaderboard(min_games=1)
+    board.update(game_log([(1, 'Starter', 10, {'FGM': 2, 'FGA': 4})]))
+    assert len(board.leaders('FG_PCT', 5)) == 1
+
+    board.update(game_log([(2, 'Iron Man', 82, {'FGM': 1, 'FGA': 10})]))
+    assert [name for _, name, _ in board.leaders('FG_PCT', 5)] == [
+        'Iron Man']
+
+
+def test_turnovers_are_not_ranked():
+    assert 'TOV' not in Leaderboard().stat_set.labels
+
+
+def test_updates_match_a_full_recompute():
+    rng = np.random.default_rng(0)
+    players = [(player_id, f'Player {player_id}', 20,
+                {'PTS': int(rng.integers(0, 30)), 'AST': int(rng.integers(10)),
+                 'MIN': 30})
+               for player_id in range(30)]
+    season = game_log(players)
+    night = game_log([(player_id, name, 1, {'PTS': int(rng.integers(60)),
+                                            'MIN': 30})
+                      for player_id, name, _, _ in players[:10]], 20)
+    board = Leaderboard(k=5, min_games=1)
+    board.update(season)
+    assert board.update(night) == len(night)
+    assert board.update(night) == 0
+
+    ids, _, values = aggregate_by(concat([season, night]), 'PLAYER_ID',
+                                  board.stat_set)
+    for label in ('PTS', 'AST'):
+        column = values[:, board.stat_set.labels.index(label)]
+        expected = sorted(column, reverse=True)[:5]
+        assert [value for _, _, value in board.leaders(label, 5)] == \
+            expected
+
+
+def test_leaders_that_get_worse_are_replaced():
+    board = Leaderboard(k=1, min_games=1)
+    board.update(game_log([(1, 'Hot', 1, {'PTS': 40}),
+                           (2, 'Steady', 1, {'PTS': 20})]))
+    assert board.leaders('PTS', 1)[0][1] == 'Hot'
+    board.update(game_log([(1, 'Hot', 3, {'PTS': 0})], 1))
+    assert board.leaders('PTS', 1)[0][1] == 'Steady'
+
+
+def test_players_with_too_few_games_are_not_ranked():
+    board = Leaderboard(min_games=2)
+    board.update(game_log([(1, 'Rookie', 1, {'PTS': 50})]))
+    assert board.leaders('PTS', 5) == []
+
+
+def test_per_36_stats_need_the_prorated_minutes():
+    board = Leaderboard(min_games=1, min_minutes=1000)
+    board.update(game_log([(1, 'Starter', 41, {'PTS': 20, 'MIN': 36}),
+                           (2, 'Garbage Time', 41, {'PTS': 4, 'MIN': 2})]))
+    # Half the season has been played, so 500 minutes qualify.
+    assert [name for _, name, _ in board.leaders('PTS_36', 5)] == ['Starter']
+    assert len(board.leaders('PTS', 5)) == 2
@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime
+
+from pandas import DataFrame
+
+from live import (FINAL, LIVE, SCHEDULED, GameSnapshot, LiveTracker,
+                  changed_games, parse_snapshots)
+from upstream import Upstream
+
+GAME_ID = '0021900901'
+
+
+def snapshot(status: int = LIVE, period: int = 2, clock: str = '6:00',
+             home_pts: int = 50, away_pts: int = 48) -> GameSnapshot:
+    text = {SCHEDULED: '7:30 pm ET', LIVE: f'Q{period}', FINAL: 'Final'}
+    return GameSnapshot(GAME_ID, status, text[status], period, clock, 'LAL',
+                        'LAC', home_pts, away_pts)
+
+
+def test_parse_snapshots_gives_unstarted_games_no_points():
+    header = DataFrame({'GAME_ID': [GAME_ID], 'GAME_STATUS_ID': [SCHEDULED],
+                        'GAME_STATUS_TEXT': ['7:30 pm ET '],
+                        'LIVE_PERIOD': [0], 'LIVE_PC_TIME': [None],
+                        'HOME_TEAM_ID': [1], 'VISITOR_TEAM_ID': [2]})
+    line_score = DataFrame({'GAME_ID': [GAME_ID] * 2, 'TEAM_ID': [1, 2],
+                            'TEAM_ABBREVIATION': ['LAL', 'LAC'],
+                            'PTS': [None, None]})
+    assert parse_snapshots(header, line_score) == {
+        GAME_ID: snapshot(SCHEDULED, 0, '', 0, 0)}
+
+
+def test_changed_games_include_added_removed_and_updated_games():
+    old = {'1': snapshot()._replace(game_id='1'),
+           '2': snapshot()._replace(game_id='2')}
+    new = {'1': snapshot()._replace(game_id='1'),
+           '2': snapshot(home_pts=52)._replace(game_id='2'),
+           '3': snapshot()._replace(game_id='3')}
+    assert sorted(changed_games(old, new)) == ['2', '3']
+    assert changed_games(new, {}) != []
+    assert changed_games(new, dict(new)) == []
+
+
+def test_interval_follows_the_state_of_the_game():
+    tracker = LiveTracker(live_interval=30, clutch_interval=10,
+                          break_interval=120)
+    assert tracker.interval(snapshot(SCHEDULED, 0, '')) == 120
+    assert tracker.interval(snapshot(clock='')) == 120
+    assert tracker.interval(snapshot()) == 30
+    assert tracker.interval(snapshot(period=4, clock='4:32')) == 10
+    assert tracker.interval(snapshot(period=4, clock='38.2',
+                                     home_pts=100, away_pts=80)) == 30
+    assert tracker.interval(snapshot(period=5, clock='1:00')) == 10
+    assert tracker.interval(snapshot(FINAL)) is None
+
+
+def test_score_changes_are_pushed_to_subscribed_channels(channel):
+    # The game's own summary is replayed one poll at a time until it ends.
+    replay = [snapshot(period=4, clock='2:00', home_pts=100, away_pts=98),
+              snapshot(period=4, clock='0:30', home_pts=102, away_pts=98),
+              snapshot(FINAL, 4, '', 102, 101)]
+    tracker = LiveTracker(
+        Upstream(2, 2), scoreboard=lambda date: {GAME_ID: snapshot()},
+        game=lambda game_id: replay.pop(0), scoreboard_interval=60,
+        live_interval=0.01, clutch_interval=0.01, break_interval=0.01,
+        edit_interval=0.01, now=lambda: datetime(2020, 3, 10, 20))
+
+    async def run() -> None:
+        await tracker.subscribe(channel)
+        await asyncio.sleep(0.5)
+        tracker.stop()
+
+    asyncio.run(run())
+    assert replay == []
+    assert tracker.game_polls == 3
+    scores = [embed.fields[0].name for embed in channel.message.edits]
+    assert scores[0] == 'LAC 48 @ LAL 50'
+    assert scores[-1] == 'LAC 101 @ LAL 102'
+    assert channel.message.edits[-1].fields[0].value == 'Final'
+    assert tracker.stats()['edits'] == len(channel.message.edits) - 1
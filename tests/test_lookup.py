@@ -0,0 +1,83 @@
+import pickle
+import threading
+import time
+
+from lookup import (SNAPSHOT_VERSION, Lookups, PlayerIndex, TeamIndex,
+                    TrigramIndex)
+from registry import Player, Team
+
+NAMES = ['lebron james', 'luka doncic', 'kevin durant', 'kevin love',
+         'kawhi leonard']
+
+
+def test_snapshots_of_another_nba_api_version_are_rebuilt(tmp_path):
+    path = tmp_path / 'lookup_snapshot.pickle'
+    path.write_bytes(pickle.dumps({'version': SNAPSHOT_VERSION,
+                                   'nba_api': '0.0.1', 'registry': None}))
+    assert Lookups(str(path)).registry is not None
+
+
+def test_concurrent_loads_build_once(monkeypatch):
+    builds = []
+
+    def build() -> dict:
+        builds.append(1)
+        time.sleep(0.05)
+        return {'registry': 'registry'}
+
+    lookups = Lookups(None)
+    monkeypatch.setattr(lookups, '_build', build)
+    threads = [threading.Thread(target=lookups.load) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert builds == [1]
+    assert lookups.registry == 'registry'
+
+
+def test_player_index_normalizes_names_and_suffixes():
+    index = PlayerIndex([
+        Player(1, 'Gary Trent Jr.', 'Gary', 'Trent Jr.', True),
+        Player(2, 'Luka Dončić', 'Luka', 'Dončić', True)])
+    assert index.find('gary', 'trent').id == 1
+    assert index.find('Gary', 'Trent Jr.').id == 1
+    assert index.find('LUKA', 'doncic').id == 2
+    assert index.find('luka', 'james') is None
+    assert [p.id for p in index.with_last_name('trent')] == [1]
+
+
+def test_team_index_finds_names_abbreviations_and_cities():
+    teams = [Team(1, 'LAC', 'LA Clippers', 'Clippers', 'Los Angeles', 0, ''),
+             Team(2, 'LAL', 'Los Angeles Lakers', 'Lakers', 'Los Angeles', 0,
+                  '')]
+    index = TeamIndex(teams)
+    assert index.find('lakers').id == 2
+    assert index.find('lal').id == 2
+    # A shared city goes to the first team that has it.
+    assert index.find('Los Angeles').id == 1
+    assert index.full_name('LAC') == 'LA Clippers'
+
+
+def test_trigram_index_ranks_misspelled_names():
+    index = TrigramIndex(NAMES)
+    score, position = index.search('lebrn james', limit=1)[0]
+    assert NAMES[position] == 'lebron james' and 0 < score < 1
+    assert index.search('lebron james', limit=1) == [(1.0, 0)]
+    assert [NAMES[i] for _, i in index.search('kevn', limit=2)] == [
+        'kevin love', 'kevin durant']
+
+
+def test_trigram_index_finds_prefixes_in_order():
+    index = TrigramIndex(NAMES)
+    assert [NAMES[i] for i in index.prefix('kev')] == ['kevin durant',
+                                                      'kevin love']
+    assert index.prefix('kev', limit=1) == [2]
+    assert index.prefix('zion') == []
+
+
+def test_trigram_index_caps_the_postings_it_visits():
+    index = TrigramIndex(['aaa'] * 100 + ['aab'])
+    # The common trigrams would visit 100 more names, so they are skipped.
+    assert [i for _, i in index.search('aab', 200, max_postings=10)] == [100]
+    assert len(index.search('aab', 200)) == 101
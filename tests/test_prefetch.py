@@ -0,0 +1,53 @@
+import asyncio
+from types import SimpleNamespace
+
+from pandas import DataFrame
+
+from prefetch import Prefetcher
+from upstream import Upstream
+
+GAMES = DataFrame({'GAME_ID': ['0021900001'], 'TEAM_ID_HOME': [1],
+                   'TEAM_ID_AWAY': [2]})
+ROSTERS = {1: [2544, 203076], 2: [201142, 2544]}
+
+
+class FakeGameStore:
+    async def get(self, year: int) -> SimpleNamespace:
+        return SimpleNamespace(last_date='2019-10-22',
+                               games_on=lambda date: GAMES)
+
+
+def prefetcher(warmed: list, ttl: float = 60) -> Prefetcher:
+    return Prefetcher(FakeGameStore(),
+                      lambda player_id, year: warmed.append(player_id),
+                      Upstream(1, 1), rate=1e9, ttl=ttl,
+                      roster=lambda team_id, year: ROSTERS[team_id])
+
+
+def test_players_and_games_are_prefetched_once():
+    warmed = []
+    prefetch = prefetcher(warmed)
+
+    async def run():
+        return [await prefetch.prefetch(2019) for _ in range(2)]
+
+    assert asyncio.run(run()) == [3, 0]
+    assert sorted(warmed) == [2544, 201142, 203076]
+
+
+def test_only_the_first_read_of_a_prefetched_log_is_claimed():
+    prefetch = prefetcher([])
+    asyncio.run(prefetch.prefetch(2019))
+    assert prefetch.claim(2544, '2019', 'Regular')
+    assert not prefetch.claim(2544, '2019', 'Regular')
+    assert not prefetch.claim(203076, '2019', 'Playoffs')
+    assert not prefetch.claim(1, '2019', 'Regular')
+    assert prefetch.useful == 1
+    assert prefetch.hit_rates(3, 1) == (0.75, 0.5)
+
+
+def test_logs_read_after_the_ttl_are_not_claimed():
+    prefetch = prefetcher([], ttl=-1)
+    asyncio.run(prefetch.prefetch(2019))
+    assert not prefetch.claim(2544, '2019', 'Regular')
+    assert prefetch.useful == 0
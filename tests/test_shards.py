@@ -0,0 +1,33 @@
+import NBABot
+import shards
+
+
+def test_a_single_process_runs_without_the_cache_process(monkeypatch):
+    runs = []
+    monkeypatch.setattr(shards, 'SHARD_PROCESSES', 1)
+    monkeypatch.setattr(shards, 'WORKER_COUNT', 2)
+    monkeypatch.setattr(shards, 'SHARD_COUNT', None)
+    monkeypatch.setattr(shards, 'start_cache_process', None)
+    monkeypatch.setattr(NBABot.GUARD, 'bucket', NBABot.GUARD.bucket)
+    monkeypatch.setattr(NBABot, 'main', lambda *args: runs.append(args))
+    memory = NBABot.GAME_LOG_CACHE.memory
+    shards.main()
+    assert runs == [([0], 2)]
+    assert NBABot.GAME_LOG_CACHE.memory is memory
+    assert NBABot.GUARD.bucket.rate == shards.UPSTREAM_RATE / 2
+
+
+def test_processes_share_the_caches_of_the_cache_process():
+    manager = shards.start_cache_process(16, 100, 1, None)
+    try:
+        first = shards.connect(manager.address)
+        second = shards.connect(manager.address)
+        first['game_logs'].set((2544, '2019-20'), 'log')
+        first['pictures']['player/2544'] = 'picture'
+        assert second['game_logs'].get((2544, '2019-20')) == 'log'
+        assert second['pictures'].get('player/2544') == 'picture'
+        # The single token of the burst is shared too.
+        assert first['bucket'].try_acquire() == 0
+        assert second['bucket'].try_acquire() > 0
+    finally:
+        manager.shutdown()
@@ -0,0 +1,39 @@
+import asyncio
+
+from upstream import SingleFlight
+
+
+def test_single_flight_shares_one_call_between_concurrent_callers():
+    flight, calls = SingleFlight(), []
+
+    async def fetch(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def run():
+        together = await asyncio.gather(*[flight.do('key', fetch, i)
+                                          for i in range(5)])
+        return together, await flight.do('key', fetch, 5)
+
+    together, later = asyncio.run(run())
+    assert together == [0] * 5 and later == 5
+    assert calls == [0, 5]
+    assert flight.stats() == {'calls': 2, 'coalesced': 4, 'in_flight': 0}
+
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError('down')
+
+    async def run():
+        return await asyncio.gather(flight.do('key', fail),
+                                    flight.do('key', fail),
+                                    return_exceptions=True)
+
+    errors = asyncio.run(run())
+    assert [type(error) for error in errors] == [ValueError, ValueError]
+    assert flight.calls == 1
@@ -0,0 +1,31 @@
+import asyncio
+
+import requests
+
+import standings
+from standings import StandingsService
+from upstream import Upstream
+
+
+def test_a_failed_refresh_serves_the_snapshot_until_the_next_one(
+        monkeypatch, capsys):
+    calls = []
+
+    def fetch_conferences():
+        calls.append(1)
+        if len(calls) > 1:
+            raise requests.ConnectionError('stats.nba.com is down')
+        return '1. Bucks\n', '1. Lakers\n'
+
+    monkeypatch.setattr(standings, 'fetch_conferences', fetch_conferences)
+    service = StandingsService(Upstream(1, 1), refresh_interval=60)
+
+    async def run():
+        first = await service.get()
+        service._fetched_at -= 60
+        return first, [await service.get() for _ in range(3)]
+
+    first, later = asyncio.run(run())
+    assert later == [first] * 3
+    assert len(calls) == 2
+    assert 'Refreshing the standings failed' in capsys.readouterr().out
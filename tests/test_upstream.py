@@ -0,0 +1,89 @@
+import time
+
+import pytest
+import requests
+
+from upstream import (CircuitBreaker, CircuitOpenError, DeadlineExceeded,
+                      Guard, TokenBucket)
+
+
+def test_circuit_opens_after_threshold_failures():
+    breaker = CircuitBreaker(threshold=3, cooldown=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow() and breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open' and breaker.opens == 1
+    assert not breaker.allow()
+
+
+def test_circuit_lets_one_trial_through_after_the_cooldown():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow() and breaker.state == 'half-open'
+    assert not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == 'open' and breaker.opens == 1
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.failures == 0
+
+
+def test_token_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate=100, burst=3)
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0] * 3
+    wait = bucket.try_acquire()
+    assert 0 < wait <= 0.01
+    assert bucket.acquire() > 0
+
+
+def test_token_bucket_refuses_to_wait_past_the_limit():
+    bucket = TokenBucket(rate=1, burst=1)
+    bucket.acquire()
+    with pytest.raises(DeadlineExceeded):
+        bucket.acquire(limit=0.1)
+
+
+def trial_guard() -> Guard:
+    """Returns a Guard whose circuit is open and ready for a trial."""
+    guard = Guard(TokenBucket(1e9, burst=100),
+                  CircuitBreaker(threshold=1, cooldown=0.01), retries=0)
+
+    def down():
+        raise requests.ConnectionError('stats.nba.com is down')
+
+    with pytest.raises(requests.ConnectionError):
+        guard.fetch(down)
+    assert guard.breaker.state == 'open'
+    time.sleep(0.02)
+    return guard
+
+
+def test_a_trial_rejected_as_invalid_closes_the_circuit():
+    guard = trial_guard()
+
+    def invalid():
+        raise ValueError('no such player')
+
+    with pytest.raises(ValueError):
+        guard.fetch(invalid)
+    assert guard.breaker.state == 'closed'
+    assert guard.fetch(lambda: 'log') == 'log'
+
+
+def test_a_trial_out_of_time_reopens_the_circuit():
+    guard = trial_guard()
+    guard.deadline = 0
+    with pytest.raises(DeadlineExceeded):
+        guard.fetch(lambda: 'log')
+    assert guard.breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        guard.fetch(lambda: 'log')
+
+    time.sleep(0.02)
+    guard.deadline = 5
+    assert guard.fetch(lambda: 'log') == 'log'
+    assert guard.breaker.state == 'closed'
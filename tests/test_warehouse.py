@@ -0,0 +1,38 @@
+from pandas import DataFrame
+
+import warehouse
+from warehouse import Warehouse, parse_seasons
+
+LEAGUE_LOG = DataFrame({
+    'PLAYER_ID': [2544, 201142, 2544, 201142],
+    'PLAYER_NAME': ['LeBron James', 'Kevin Durant'] * 2,
+    'GAME_ID': ['0021900001', '0021900001', '0021900002', '0021900002'],
+    'GAME_DATE': ['2019-10-22', '2019-10-22', '2019-10-24', '2019-10-24'],
+    'PTS': [18, 29, 25, 31]})
+
+
+def test_ingested_seasons_are_read_back_by_player(monkeypatch, tmp_path):
+    monkeypatch.setattr(warehouse, 'fetch_player_games',
+                        lambda year, season_type: LEAGUE_LOG)
+    store = Warehouse(str(tmp_path))
+    assert store.ingest(2019, 'Regular') == 4
+
+    log = store.player_log(2544, '2019', 'Regular')
+    assert log['Game_ID'].tolist() == ['0021900002', '0021900001']
+    assert log['PTS'].tolist() == [25, 18]
+    assert len(store.player_log(1, '2019', 'Regular')) == 0
+    assert store.player_log(2544, '2019', 'Regular', max_age=-1) is None
+    assert len(store.partition(2019, 'Regular').players()) == 4
+
+
+def test_seasons_that_were_not_ingested_are_misses(tmp_path):
+    store = Warehouse(str(tmp_path))
+    assert store.player_log(2544, '2018', 'Regular') is None
+    assert store.player_log(2544, 'ALL', 'Regular') is None
+    assert store.player_log(2544, '2019', 'Pre Season') is None
+    assert store.stats()['misses'] == 1
+
+
+def test_parse_seasons():
+    assert parse_seasons('2019') == (2019,)
+    assert parse_seasons('2015-2017') == (2015, 2016, 2017)
@@ -0,0 +1,377 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, \
+    Tuple
+
+import requests
+
+from metrics import METRICS, response_size
+
+UPSTREAM_WORKERS = int(os.getenv('UPSTREAM_WORKERS', '8'))
+UPSTREAM_CONCURRENCY = int(os.getenv('UPSTREAM_CONCURRENCY', '4'))
+# UPSTREAM_TIMEOUT bounds a single request and UPSTREAM_DEADLINE a fetch
+# with all its retries. Upstream.call waits UPSTREAM_GRACE seconds longer
+# than that, so a fetch gives up before its caller does.
+UPSTREAM_TIMEOUT = float(os.getenv('UPSTREAM_TIMEOUT', '30'))
+UPSTREAM_DEADLINE = float(os.getenv('UPSTREAM_DEADLINE', '45'))
+UPSTREAM_GRACE = float(os.getenv('UPSTREAM_GRACE', '5'))
+UPSTREAM_RATE = float(os.getenv('UPSTREAM_RATE', '4'))
+UPSTREAM_BURST = int(os.getenv('UPSTREAM_BURST', '8'))
+UPSTREAM_RETRIES = int(os.getenv('UPSTREAM_RETRIES', '3'))
+BACKOFF_BASE, BACKOFF_CAP = 0.5, 8.0
+BREAKER_THRESHOLD = int(os.getenv('BREAKER_THRESHOLD', '5'))
+BREAKER_COOLDOWN = float(os.getenv('BREAKER_COOLDOWN', '60'))
+
+_job = threading.local()
+
+
+def job_deadline() -> float:
+    """Returns the time.monotonic() by which the Upstream.call job running
+    in this thread has to finish, or infinity outside of one.
+    """
+    deadline = getattr(_job, 'deadline', None)
+    return float('inf') if deadline is None else deadline
+
+
+class DeadlineExceeded(requests.Timeout):
+    """Raised when a fetch runs out of time before it could be made."""
+
+
+class Upstream:
+    """Runs blocking nba_api and scraping calls on a thread pool so that the
+    discord.py event loop never waits on stats.nba.com.
+
+    At most max_concurrent calls are in flight at once, and each call is
+    cancelled from the caller's side after timeout seconds. Guard.fetch
+    gives up grace seconds before that, so a worker does not go on retrying
+    for a caller that has stopped waiting.
+    """
+
+    def __init__(self, max_workers: int = UPSTREAM_WORKERS,
+                 max_concurrent: int = UPSTREAM_CONCURRENCY,
+                 timeout: float = UPSTREAM_DEADLINE + UPSTREAM_GRACE,
+                 grace: float = UPSTREAM_GRACE) -> None:
+        self.timeout = timeout
+        self.grace = grace
+        self._max_concurrent = max_concurrent
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='upstream')
+        self._semaphore = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it belongs to the loop the bot is running on.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrent)
+        return self._semaphore
+
+    async def call(self, func: Callable, *args,
+                   timeout: Optional[float] = None, **kwargs) -> Any:
+        """Runs func(*args, **kwargs) on the pool and returns its result.
+        Raises asyncio.TimeoutError if it takes longer than timeout.
+        """
+        loop = asyncio.get_event_loop()
+        queued = time.perf_counter()
+        timeout = timeout or self.timeout
+        semaphore = self._get_semaphore()
+        await semaphore.acquire()
+        deadline = time.monotonic() + timeout - min(self.grace, timeout / 2)
+
+        def run() -> Any:
+            # Time spent waiting for the semaphore and a free worker.
+            METRICS.observe('nba_upstream_wait_seconds',
+                            time.perf_counter() - queued)
+            _job.deadline = deadline
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _job.deadline = None
+
+        def release(_) -> None:
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                pass  # The loop has been closed.
+
+        try:
+            future = self._executor.submit(run)
+        except BaseException:
+            semaphore.release()
+            raise
+        # Released when the job ends rather than when the caller stops
+        # waiting, so a job that outlives its timeout still counts towards
+        # max_concurrent.
+        future.add_done_callback(release)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key: while one is in flight,
+    later callers wait for its result instead of starting their own.
+    """
+
+    def __init__(self) -> None:
+        self.calls = self.coalesced = 0
+        self._inflight = {}
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable],
+                 *args, **kwargs) -> Any:
+        """Returns the result of awaiting func(*args, **kwargs), sharing it
+        with every other caller that asks for key before it finishes.
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.ensure_future(func(*args, **kwargs))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shielded so one caller being cancelled does not cancel the others.
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, int]:
+        return {'calls': self.calls, 'coalesced': self.coalesced,
+                'in_flight': len(self._inflight)}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling stats.nba.com while the circuit is open."""
+
+
+class TokenBucket:
+    """Allows rate calls per second on average, with bursts of up to burst
+    calls. Thread-safe; acquire blocks the calling worker thread.
+    """
+
+    def __init__(self, rate: float = UPSTREAM_RATE,
+                 burst: int = UPSTREAM_BURST) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Takes a token if one is available and returns 0. Otherwise returns
+        how many seconds until one will be.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens +
+                               (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, limit: float = float('inf')) -> float:
+        """Takes a token, waiting for one if necessary. Returns how long it
+        waited in seconds. Raises DeadlineExceeded rather than wait longer
+        than limit seconds.
+        """
+        waited = 0.0
+        wait = self.try_acquire()
+        while wait:
+            if waited + wait > limit:
+                raise DeadlineExceeded('no request could be made in time')
+            time.sleep(wait)
+            waited += wait
+            wait = self.try_acquire()
+        return waited
+
+
+class CircuitBreaker:
+    """Opens after threshold consecutive failures. While open, calls are
+    refused; after cooldown seconds a single trial call is let through, which
+    closes the circuit if it succeeds and reopens it if it fails.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD,
+                 cooldown: float = BREAKER_COOLDOWN) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = self.opens = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        return 'half-open' if self._trial else 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._trial and \
+                    time.monotonic() - self._opened_at >= self.cooldown:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial or (self._opened_at is None and
+                               self.failures >= self.threshold):
+                if not self._trial:
+                    self.opens += 1
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether error looks like throttling or a transient failure, as
+    opposed to a request that can never succeed.
+    """
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    # nba_api does not check the status code, so a throttled or truncated
+    # response shows up as JSON that cannot be decoded.
+    return isinstance(error, (requests.ConnectionError, requests.Timeout,
+                              json.JSONDecodeError))
+
+
+class Guard:
+    """Wraps every request to stats.nba.com with a TokenBucket rate limit,
+    retries with jittered exponential backoff, and a CircuitBreaker. fetch is
+    called from worker threads, inside functions run through Upstream.call.
+    All attempts of a fetch, and the waits between them, fit in deadline
+    seconds and in what is left of the Upstream.call job.
+    """
+
+    def __init__(self, bucket: TokenBucket = None,
+                 breaker: CircuitBreaker = None,
+                 retries: int = UPSTREAM_RETRIES,
+                 backoff_base: float = BACKOFF_BASE,
+                 backoff_cap: float = BACKOFF_CAP,
+                 deadline: float = UPSTREAM_DEADLINE) -> None:
+        self.bucket = bucket if bucket is not None else TokenBucket()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.retries = retries
+        self.deadline = deadline
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.calls = self.retried = self.rejected = self.failed = 0
+
+    def fetch(self, func: Callable, *args, **kwargs) -> Any:
+        """Returns func(*args, **kwargs), retrying transient failures.
+        Raises CircuitOpenError without calling func while the circuit is
+        open, DeadlineExceeded if the deadline passes before an attempt can
+        start, and the last error if every attempt fails or there is no time
+        left to retry. A timeout keyword argument is lowered to the time
+        left. Every attempt is recorded in METRICS under the name of func.
+        """
+        endpoint = getattr(func, '__name__', type(func).__name__)
+        deadline = min(time.monotonic() + self.deadline, job_deadline())
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                self.rejected += 1
+                METRICS.inc('nba_upstream_rejected_total', endpoint=endpoint)
+                raise CircuitOpenError('stats.nba.com is unavailable')
+            # Every attempt the breaker let through settles it, so a failed
+            # half-open trial cannot leave the circuit half-open. A request
+            # the server turned down as invalid still shows it is up, and
+            # running out of time counts as a failure.
+            healthy, delay = False, 0.0
+            try:
+                try:
+                    waited = self.bucket.acquire(deadline - time.monotonic())
+                except DeadlineExceeded:
+                    self.failed += 1
+                    raise
+                if waited:
+                    METRICS.observe('nba_upstream_throttled_seconds', waited)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.failed += 1
+                    raise DeadlineExceeded('no request could be made in time')
+                if 'timeout' in kwargs:
+                    kwargs['timeout'] = min(kwargs['timeout'], remaining)
+                self.calls += 1
+                start = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as error:
+                    METRICS.record_call(endpoint, kwargs,
+                                        time.perf_counter() - start, None,
+                                        type(error).__name__)
+                    if not is_retryable(error):
+                        healthy = True
+                        raise
+                    delay = self.backoff(attempt, error)
+                    if attempt == self.retries or \
+                            time.monotonic() + delay >= deadline:
+                        self.failed += 1
+                        raise
+                    self.retried += 1
+                else:
+                    METRICS.record_call(endpoint, kwargs,
+                                        time.perf_counter() - start,
+                                        response_size(result), 'ok')
+                    healthy = True
+                    return result
+            finally:
+                if healthy:
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+            time.sleep(delay)
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """Returns a random delay of up to backoff_base * 2 ** attempt
+        seconds, or the server's Retry-After if that is longer. The jitter
+        keeps throttled workers from retrying in lockstep.
+        """
+        delay = random.uniform(0, min(self.backoff_cap,
+                                      self.backoff_base * 2 ** attempt))
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('Retry-After') \
+            if response is not None else None
+        if retry_after is not None and retry_after.isnumeric():
+            delay = max(delay, min(self.backoff_cap, float(retry_after)))
+        return delay
+
+    def stats(self) -> Dict[str, Any]:
+        return {'calls': self.calls, 'retried': self.retried,
+                'rejected': self.rejected, 'failed': self.failed,
+                'circuit': self.breaker.state, 'opens': self.breaker.opens}
+
+
+def fetch_or_stale(fetch: Callable[[], Any], stale: Callable[[], Any],
+                   endpoint: str) -> Tuple[Any, Optional[Exception]]:
+    """Returns (fetch(), None). If fetch raises, returns (stale(), error)
+    instead, where stale returns the last copy of the data that fetch would
+    have returned, expired or not, and error is what fetch raised. The error
+    is raised if stale returns None too.
+    """
+    try:
+        return fetch(), None
+    except Exception as error:
+        value = stale()
+        if value is None:
+            raise
+        METRICS.inc('nba_stale_served_total', endpoint=endpoint)
+        return value, error
+
+
+UPSTREAM = Upstream()
+GUARD = Guard()
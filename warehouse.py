@@ -0,0 +1,159 @@
+import importlib.util
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from pandas import DataFrame
+
+from games import api_date, season_string
+from upstream import GUARD, UPSTREAM_TIMEOUT
+
+WAREHOUSE_DIR = os.getenv('WAREHOUSE_DIR', 'warehouse')
+HAS_ARROW = importlib.util.find_spec('pyarrow') is not None
+SEASON_TYPES = {'Regular': 'Regular Season', 'Playoffs': 'Playoffs'}
+# LeagueGameLog's player rows use different names for the columns that
+# PlayerGameLog calls Player_ID and Game_ID.
+PLAYER_GAME_LOG_NAMES = {'PLAYER_ID': 'Player_ID', 'GAME_ID': 'Game_ID'}
+
+
+def fetch_player_games(year: int, season_type: str,
+                       date_from: Optional[str] = None) -> DataFrame:
+    """Returns every player's game log for the season starting in year, as
+    one LeagueGameLog data frame with a row per player per game. date_from
+    is an optional 'YYYY-MM-DD' date to only fetch games on or after.
+    """
+    from nba_api.stats.endpoints import leaguegamelog
+
+    return GUARD.fetch(
+        leaguegamelog.LeagueGameLog,
+        season=season_string(year), player_or_team_abbreviation='P',
+        season_type_all_star=SEASON_TYPES[season_type], direction='DESC',
+        date_from_nullable=api_date(date_from) if date_from else '',
+        timeout=UPSTREAM_TIMEOUT).get_data_frames()[0]
+
+
+class SeasonPartition:
+    """One season and season type of player game logs, stored as an Arrow IPC
+    file sorted by player. The file is memory-mapped rather than read, and
+    the row range of every player is indexed when it is opened, so a
+    player's log is a zero-copy slice.
+    """
+
+    def __init__(self, path: str) -> None:
+        import pyarrow as pa
+
+        self.path = path
+        self.modified = os.path.getmtime(path)
+        self.table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        ids = self.table.column('PLAYER_ID').to_numpy()
+        unique, starts, counts = np.unique(ids, return_index=True,
+                                           return_counts=True)
+        self._ranges = dict(zip(unique.tolist(),
+                                zip(starts.tolist(), counts.tolist())))
+
+    def player(self, player_id: int) -> DataFrame:
+        """Returns player_id's games, latest first, with the same column
+        names as PlayerGameLog. Empty if the player did not play.
+        """
+        start, count = self._ranges.get(player_id, (0, 0))
+        df = self.table.slice(start, count).to_pandas()
+        return df.rename(columns=PLAYER_GAME_LOG_NAMES)
+
+    def players(self) -> DataFrame:
+        """Returns every row in the partition."""
+        return self.table.to_pandas()
+
+
+class Warehouse:
+    """Player game logs for whole seasons, kept on disk under directory as
+    one SeasonPartition per season and season type and filled by ingest.
+    Does nothing if directory is None or pyarrow is not installed.
+    """
+
+    def __init__(self, directory: Optional[str] = WAREHOUSE_DIR) -> None:
+        self.enabled = directory is not None and HAS_ARROW
+        self.directory = directory
+        self.hits = self.misses = 0
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def path(self, year: int, season_type: str) -> str:
+        return os.path.join(self.directory, f'season={season_string(year)}',
+                            f'season_type={season_type}', 'games.arrow')
+
+    def ingest(self, year: int, season_type: str) -> int:
+        """Fetches the season starting in year from the API and stores it,
+        replacing any earlier copy. Returns the number of rows stored.
+        """
+        import pyarrow as pa
+
+        df = fetch_player_games(year, season_type)
+        df = df.sort_values(['PLAYER_ID', 'GAME_DATE'],
+                            ascending=[True, False], kind='mergesort')
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        path = self.path(year, season_type)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never map a partial file.
+        with pa.OSFile(path + '.tmp', 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(path + '.tmp', path)
+        with self._lock:
+            self._partitions.pop((year, season_type), None)
+        return table.num_rows
+
+    def partition(self, year: int,
+                  season_type: str) -> Optional[SeasonPartition]:
+        """Returns the stored partition, or None if it was never ingested."""
+        if not self.enabled:
+            return None
+        key = (year, season_type)
+        with self._lock:
+            partition = self._partitions.get(key)
+            path = self.path(year, season_type)
+            if partition is None or (os.path.exists(path) and
+                                     os.path.getmtime(path) !=
+                                     partition.modified):
+                if not os.path.exists(path):
+                    return None
+                partition = self._partitions[key] = SeasonPartition(path)
+        return partition
+
+    def player_log(self, player_id: int, year: str, season_type: str,
+                   max_age: float = float('inf')) -> Optional[DataFrame]:
+        """Returns player_id's game log for the season starting in year, or
+        None if the warehouse cannot answer: the season was not ingested, or
+        was ingested more than max_age seconds ago.
+        """
+        if not year.isnumeric() or season_type not in SEASON_TYPES:
+            return None
+        partition = self.partition(int(year), season_type)
+        if partition is None or time.time() - partition.modified > max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return partition.player(player_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {'partitions': len(self._partitions), 'hits': self.hits,
+                'misses': self.misses}
+
+
+def parse_seasons(value: str) -> Tuple[int, ...]:
+    """Converts '2019' or a range like '2015-2019' to starting years."""
+    first, _, last = value.partition('-')
+    return tuple(range(int(first), int(last or first) + 1))
+
+
+if __name__ == '__main__':
+    # Usage: python warehouse.py 2015-2019 [Regular|Playoffs]
+    warehouse = Warehouse()
+    season_types = sys.argv[2:] or list(SEASON_TYPES)
+    for season_year in parse_seasons(sys.argv[1]):
+        for nba_season in season_types:
+            rows = warehouse.ingest(season_year, nba_season)
+            print(f'Ingested {rows} rows for {season_string(season_year)} '
+                  f'{nba_season}')